@@ -14,33 +14,72 @@ from pprint import pprint
 
 from structure_builder import *
 from rm_player import Player
+from rm_bundle import ensure_bundle
+from rm_stats import enable_from_environment
+from rm_transcript import record_from_environment
+import text_helpers
 
 WORLDS_DIRECTORY_PATH = "data/worlds/"
 ITEMS_DIRECTORY_PATH = "data/items"
 
 
+# Most wrapped paragraphs to remember before starting over. Room and item text never changes, so the
+# cache only grows with text that includes changing values such as battery levels.
+WRAP_CACHE_SIZE = 2048
+
+
 class FakeStdIO(object):
     """
         A class to override write and readline methods for stdout and stdin respectively.
         This class utilizes a curses window to format text, wrapping it appropriately.
 
+        Output is collected until it is flushed, which Cmd does before reading each command, so a command's
+        text is wrapped one paragraph at a time and drawn with a single refresh.
+
         This technique is demonstrated by AmstrongJ in his own text adventure game:
         Murder in the Park - A Robotic Mystery: https://github.com/ArmstrongJ/robotadventure
     """
     def __init__(self, stdscr):
         self.stdscr = stdscr
+        self.buffer = []
+        self.wrap_cache = {}
 
     def write(self, str):
-        height,width = self.stdscr.getmaxyx()
-        if len(str) >= width:
-            for line in textwrap.wrap(str,width-2):
-                self.stdscr.addstr(line)
-                self.stdscr.addstr("\n")
-        else:
-            self.stdscr.addstr(str)
+        self.buffer.append(str)
+
+    def wrap(self, text, width):
+        """
+        Wraps a paragraph to fit the window, reusing the result if the same text was wrapped at the same width.
+        :param text: A paragraph, without newlines
+        :param width: Width of the window
+        :return: The text to draw
+        """
+        key = (text, width)
+        wrapped = self.wrap_cache.get(key)
+        if wrapped is None:
+            if len(text) >= width:
+                wrapped = "\n".join(textwrap.wrap(text, width - 2)) + "\n"
+            else:
+                wrapped = text
+            if len(self.wrap_cache) >= WRAP_CACHE_SIZE:
+                self.wrap_cache.clear()
+            self.wrap_cache[key] = wrapped
+        return wrapped
+
+    def flush(self):
+        if self.buffer:
+            height, width = self.stdscr.getmaxyx()
+            paragraphs = "".join(self.buffer).split("\n")
+            self.buffer = []
+            # The last piece has no newline yet, such as a prompt
+            for paragraph in paragraphs[:-1]:
+                self.stdscr.addstr(self.wrap(paragraph, width) + "\n")
+            if paragraphs[-1]:
+                self.stdscr.addstr(self.wrap(paragraphs[-1], width))
         self.stdscr.refresh()
 
     def readline(self):
+        self.flush()
         curses.init_pair(1, curses.COLOR_GREEN, curses.COLOR_BLACK)
         self.stdscr.attrset(curses.color_pair(1))
         temp = self.stdscr.getstr()
@@ -51,8 +90,13 @@ class FakeStdIO(object):
 
 
 def main():
-    my_worlds = construct_worlds(WORLDS_DIRECTORY_PATH)
-    my_items = construct_items(ITEMS_DIRECTORY_PATH)
+    # Load all game content from the compiled bundle, rebuilding it if the data directory changed
+    bundle = ensure_bundle()
+    my_worlds = construct_worlds_from_bundle(bundle)
+    my_items = construct_items_from_bundle(bundle)
+    link_content(my_worlds, my_items)
+    text_helpers.use_bundle(bundle)
+    text_helpers.preload_text()
     # print_worlds(my_worlds)
 
     stdscr = curses.initscr()
@@ -66,15 +110,13 @@ def main():
     stdscr.refresh()
 
     io = FakeStdIO(stdscr)
-    sys.stdin = io
-    sys.stdout = io
 
     height, width = stdscr.getmaxyx()
     if (height < 24) or (width < 80):
-        sys.stdout.write('Recommended minimum terminal size for this game is 80x24.\n')
-        sys.stdout.write('Please resize your terminal and restart the game.\n')
-        sys.stdout.write('Press ENTER to exit. Bye!\n')
-        sys.stdin.readline()
+        io.write('Recommended minimum terminal size for this game is 80x24.\n')
+        io.write('Please resize your terminal and restart the game.\n')
+        io.write('Press ENTER to exit. Bye!\n')
+        io.readline()
         curses.nocbreak()
         stdscr.keypad(0)
         curses.echo()
@@ -82,10 +124,14 @@ def main():
         sys.exit()
 
 
+    stats = None
+    recorder = None
     try:
-        command_parser = CommandParser(my_worlds, my_items)
-        command_parser.stdout = io
-        command_parser.stdin = io
+        # All game input and output goes through the curses window
+        command_parser = CommandParser(my_worlds, my_items, stdin=io, stdout=io)
+        command_parser.use_rawinput = False
+        stats = enable_from_environment(command_parser)
+        recorder = record_from_environment(command_parser)
 
         # initializing player state
         command_parser.player.worlds = my_worlds
@@ -97,6 +143,10 @@ def main():
     except KeyboardInterrupt:
         pass
     finally:
+        if stats is not None:
+            stats.export()
+        if recorder is not None:
+            recorder.close()
         curses.nocbreak()
         stdscr.keypad(0)
         curses.echo()
@@ -1,52 +1,146 @@
 #!/usr/bin/env python
 
+from collections import namedtuple, Counter
+
+# Events that can bring about an ending. Commands are reported as COMMAND followed by the command's verb.
+ITEM_MOVED = "item_moved"
+CHARGE_CHANGED = "charge_changed"
+ROOM_ENTERED = "room_entered"
+COMMAND = "command:"
+
+# Location of the items the player is carrying, as counted by EndingTracker. Items in rooms are
+# counted by the key of their world.
+CARRIED = ""
+
+WIN_ROOM = "summer's_cell"
+WIN_ITEM = "win_flag"
+DEATH_ROOM = "prison_entrance"
+RAY_GUN_COMMANDS = frozenset(['use ray gun', 'shoot ray gun', 'fire ray gun'])
+
+# An ending, the events after which it has to be checked, and the function that checks it.
+EndingRule = namedtuple("EndingRule", ["ending", "events", "condition"])
+
+
+class EndingTracker(object):
+    """
+    Decides after each command whether the game has ended, only checking the endings that something the
+    command did could have caused. It also keeps count of how many of each item are in each world, so the
+    checks don't have to search the rooms. The inventory keeps its own counts.
+
+    Commands report what they do with notify, command and move_item. After anything replaces the game
+    state wholesale, such as loading a game, call reset.
+    """
+
+    def __init__(self, rules=None):
+        """
+        Initializes the tracker.
+        :param rules: EndingRules in order of priority, defaults to ENDING_RULES
+        """
+        if rules is None:
+            rules = ENDING_RULES
+        self.rules = rules
+        self.index = {}
+        for position, rule in enumerate(rules):
+            for event in rule.events:
+                self.index.setdefault(event, []).append(position)
+        self.pending = set()
+        self.counts = Counter()
+        self.counted = set()
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets the item counts and has every ending checked after the next command.
+        """
+        self.counts.clear()
+        self.counted.clear()
+        self.pending = set(self.index)
+
+    def notify(self, event):
+        """
+        Records that something happened which could end the game.
+        :param event: One of the event constants
+        """
+        self.pending.add(event)
+
+    def command(self, verb):
+        """
+        Records the verb of the command being run.
+        :param verb: The first word of the command
+        """
+        self.pending.add(COMMAND + verb)
+
+    def move_item(self, item_key, source, destination):
+        """
+        Records an item that has moved. Call this after the move has been made.
+        :param item_key: The key of the item
+        :param source: Key of the world it was in, CARRIED, or None if it didn't exist
+        :param destination: Key of the world it is now in, CARRIED, or None if it is gone
+        """
+        # Places that haven't been counted yet will be counted with the item where it is now
+        if source in self.counted:
+            self.counts[(item_key, source)] -= 1
+        if destination in self.counted:
+            self.counts[(item_key, destination)] += 1
+        self.pending.add(ITEM_MOVED)
+
+    def count(self, parser, item_key, location):
+        """
+        :param parser: The CommandParser of the game
+        :param item_key: The key of the item to count
+        :param location: Key of a world to count the item in its rooms, hidden or not, or CARRIED
+        :return: The number of copies of the item in that location
+        """
+        if location == CARRIED:
+            return parser.player.inventory.count(item_key)
+        if location not in self.counted:
+            for room in parser.worlds[location].rooms.values():
+                self.counts.update((key, location) for key in room.items)
+                self.counts.update((key, location) for key in room.hidden_items)
+            self.counted.add(location)
+        return self.counts[(item_key, location)]
+
+    def check(self, parser):
+        """
+        Checks the endings that could have been caused since the last check.
+        :param parser: The CommandParser of the game
+        :return: The name of the ending the game has reached, or an empty string
+        """
+        if not self.pending:
+            return ''
+        positions = set()
+        for event in self.pending:
+            positions.update(self.index.get(event, ()))
+        self.pending.clear()
+
+        for position in sorted(positions):
+            rule = self.rules[position]
+            if rule.condition(parser):
+                return rule.ending
+        return ''
+
 
 def check_for_ending(parser):
     """
         Check the defined game ending conditions, and call the appropriate ending.
     """
-    if check_win(parser):
-        ending = 'win'
-    elif check_stranded(parser):
-        ending = 'stranded'
-    #elif check_death_gravity_boots(parser):
-    #    ending = 'death'
-    elif check_death_ray_gun(parser):
-        ending = 'death'
-    else:
-        ending = ''
-    return ending
+    for rule in ENDING_RULES:
+        if rule.condition(parser):
+            return rule.ending
+    return ''
 
 
 def check_win(parser):
-    win = False
-    if (parser.player.current_room.name == "Summer's Cell") and ("win_flag" in parser.player.current_room.items):
-        win = True
-    return win
+    room = parser.player.current_room
+    return room.key == WIN_ROOM and WIN_ITEM in room.items
 
 
 def check_stranded(parser):
-    stranded = True
-    if parser.items["portal_gun"].num_uses == 0:      # if portal gun charge done, we might be stranded
-        for key in parser.player.current_world.rooms.keys():
-            room = parser.player.current_world.rooms[key]
-
-            for item_key in room.items:
-                if item_key == 'multiverse_battery':
-                    stranded = False
-                    break
-            for hidden_item_key in room.hidden_items:
-                if hidden_item_key == 'multiverse_battery':
-                    stranded = False
-                    break
-            for item_key in parser.player.inventory:
-                if item_key == 'multiverse_battery':
-                    stranded = False
-                    break
-
-    else:
-        stranded = False
-    return stranded
+    # if portal gun charge done, we might be stranded, unless there's a battery in this world or on us
+    if parser.items["portal_gun"].num_uses != 0:
+        return False
+    return parser.endings.count(parser, "multiverse_battery", parser.player.current_world.key) == 0 and \
+        parser.endings.count(parser, "multiverse_battery", CARRIED) == 0
 
 """
 def check_death_gravity_boots(parser):
@@ -59,8 +153,14 @@ def check_death_gravity_boots(parser):
 """
 
 def check_death_ray_gun(parser):
-    death = False
-    if (parser.lastcmd == 'use ray gun' or parser.lastcmd == 'shoot ray gun'
-            or parser.lastcmd == 'fire ray gun') and parser.current_room.name.lower() == "prison entrance":
-        death = True
-    return death
+    return parser.lastcmd in RAY_GUN_COMMANDS and parser.current_room.key == DEATH_ROOM
+
+
+ENDING_RULES = (
+    EndingRule('win', (ITEM_MOVED, ROOM_ENTERED), check_win),
+    EndingRule('stranded', (CHARGE_CHANGED, ITEM_MOVED, ROOM_ENTERED), check_stranded),
+    #EndingRule('death', (COMMAND + 'use', COMMAND + 'wear', COMMAND + 'equip', COMMAND + 'strap'),
+    #           check_death_gravity_boots),
+    EndingRule('death', tuple(set(COMMAND + command.split()[0] for command in RAY_GUN_COMMANDS)),
+               check_death_ray_gun),
+)
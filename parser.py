@@ -1,24 +1,45 @@
 #!/usr/bin/env python
 
+import os
+import random
+import sys
 import text_helpers
 import gameover
 from cmd import Cmd
 from parser_grammar import *
 from rm_save import *
 from rm_load import *
+from rm_journal import CommandJournal, is_journal
+from rm_catalog import SaveCatalog, SLOT_CORRUPT, record_slot
+from rm_state import capture_state
+from rm_checkpoint import CheckpointHistory
+from rm_dirty import ChangeCounter
+from rm_player import PROCESSOR
 
 SAVE_FILE_DIRECTORY_PATH = "data/savegame"
 
+# Commands that manage the game itself and are never written to a journal
+UNJOURNALED_COMMANDS = {'savegame', 'loadgame', 'journal', 'quit', 'stats', 'undo', 'redo'}
+
+# Commands that move through the checkpoint history rather than adding to it
+HISTORY_COMMANDS = {'undo', 'redo'}
+
 
 class CommandParser(Cmd):
 
-    def __init__(self, worlds_map, items_dictionary):
+    def __init__(self, worlds_map, items_dictionary, stdin=None, stdout=None, seed=None,
+                 save_root=SAVE_FILE_DIRECTORY_PATH):
         """
         Initializes the Command Parser and field variables.
         :param worlds_map: Dictionary with name (string) --> World object pairings
+        :param items_dictionary: Dictionary with name (string) --> Item object pairings
+        :param stdin: File-like object to read player input from, defaults to sys.stdin
+        :param stdout: File-like object all game output is written to, defaults to sys.stdout
+        :param seed: Seed for every random choice the game makes, picked at random if not given
+        :param save_root: Directory this game's save files and journals are kept in
         """
         # Call Base class's init function
-        Cmd.__init__(self)
+        Cmd.__init__(self, stdin=stdin, stdout=stdout)
 
         # Initialize field variables
         self.prompt = '>> '
@@ -27,44 +48,100 @@ class CommandParser(Cmd):
         self.items = items_dictionary
         self.current_world = None
         self.current_room = None
-        self.aliases = { 'see' : 'look',
-                        'examine' : 'look',
-                        'grab' : 'take',
-                        'pick' : 'take',
-                        'port' : 'go',
-                        'portal' : 'go',
-                        'leave' : 'drop' ,
-                        'fix' : 'recharge',
-                        'squanch' : 'use',
-                        'save' : 'savegame',
-                        'load' : 'loadgame',
-                        'exit' : 'quit'}
+        # Directory holding this game's save files, and the name of the one it was last saved to or loaded from
+        self.save_root = save_root
+        self.save_name = None
+        # CommandJournal recording every command, when journaling is turned on
+        self.journal = None
+        # Name of the ending the game finished with, if it has finished
+        self.ending = ''
+        self.aliases = COMMAND_ALIASES
+        # ParsedCommand for the line being run
+        self.parsed = None
+        # Decides which endings need checking after each command
+        self.endings = gameover.EndingTracker()
+        # rm_stats.CommandStats timing this game, when stats are turned on
+        self.stats = None
+        # Checkpoints taken after each command, for undo and redo
+        self.checkpoints = CheckpointHistory()
+        # Numbers the latest change to this game's objects, so checkpoints can tell nothing changed at once
+        self.changes = ChangeCounter()
+        self.track_changes()
+        # Every random choice comes from this game's own generator, so a game can be replayed from its seed
+        if seed is None:
+            seed = random.getrandbits(32)
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+    def precmd(self, line):
+        """
+        Tokenizes the line once, before it is run.
+        :param line: user input
+        """
+        self.parsed = parse_command(line)
+        # The game as it was before the first command is the first thing that can be undone
+        if self.checkpoints.current is None:
+            self.checkpoints.record(self)
+        # An empty line repeats the last command
+        self.endings.command(self.parsed.verb if line.strip() else parse_command(self.lastcmd).verb)
+        return line
+
+    def parse_args(self, args):
+        """
+        Returns the tokenized form of a command's arguments, reusing the tokens of the line being run.
+        :param args: The arguments passed to a do_* method
+        :return: A ParsedCommand
+        """
+        parsed = self.parsed
+        if parsed is not None and (args == parsed.args or args == parsed.noun):
+            return parsed
+        return parse_arguments(args)
 
     def default(self, line):
-        line = check_for_prepositions(line)
-        cmd, cmd_arg = line.split()[0], " ".join(line.split()[1:])
-        key = text_helpers.convert_to_key(cmd_arg)
+        parsed = parse_command(line)
+        cmd, cmd_arg, key = parsed.verb, parsed.noun, parsed.key
         # check if the command is a known alias
         if cmd in self.aliases:
             getattr(self, ('do_' + self.aliases[cmd]))(cmd_arg)
             return
 
         # check if the command can apply to a room feature
-        for feature in self.player.current_room.features:
-            if feature["key"] in cmd_arg or feature["key"] in convert_to_key(cmd_arg):
-                # found feature in room, check for the correct action
-                for action in feature["actions"]:
-                    if cmd in action:
-                        print action[cmd]
-                        return
+        action_text = self.player.current_room.find_action(cmd, cmd_arg)
+        if action_text is not None:
+            print >>self.stdout, action_text
+            return
 
-        # check if the command applies to an item
-        if key in self.player.inventory:
-            if key in self.items.keys():
-                self.items[key].use(self.current_world, self.current_room)
+        # check if the command applies to an item; processors are only used by the portal gun
+        if key in self.player.inventory and key != PROCESSOR:
+            if key in self.items:
+                self.items[key].use(self.current_world, self.current_room, self.stdout, self.rng)
+                self.endings.notify(gameover.CHARGE_CHANGED)
+                self.endings.notify(gameover.ITEM_MOVED)
                 return
 
-        print("This is tiring, Morty. Please, please just tell me something I understand.")
+        if self.stats is not None:
+            self.stats.count_unknown(cmd)
+        print >>self.stdout, "This is tiring, Morty. Please, please just tell me something I understand."
+
+    def set_game(self, worlds, items, player):
+        """
+        Replaces the game's objects, as when a game is loaded or a checkpoint restored.
+        :param worlds: Dictionary with name (string) --> World object pairings
+        :param items: Dictionary with name (string) --> Item object pairings
+        :param player: The Player object of the new game state
+        """
+        self.worlds = worlds
+        self.items = items
+        self.player = player
+        self.current_world = player.current_world
+        self.current_room = player.current_room
+        self.track_changes()
+
+    def track_changes(self):
+        """
+        Has the game's worlds, items and player number their changes in self.changes
+        """
+        self.changes.track(list(self.worlds.values()) + list(self.items.values()) + [self.player])
 
     def sync_location(self):
         """
@@ -82,8 +159,8 @@ class CommandParser(Cmd):
         """
         Runs at the beginning of every game, initializes world with starting location.
         """
-        text_helpers.get_intro()
-        print "Press ENTER to continue..."
+        text_helpers.get_intro(self.stdout)
+        print >>self.stdout, "Press ENTER to continue..."
         self.stdin.readline()
         self.sync_location()
 
@@ -93,31 +170,97 @@ class CommandParser(Cmd):
         :param stop: EOF
         :param line: user input
         """
-        ending = gameover.check_for_ending(self)
+        ending = self.endings.check(self)
         if ending:
-            text_helpers.get_ending(ending)
-            print "Press ENTER to continue..."
+            self.ending = ending
+            text_helpers.get_ending(ending, self.stdout)
+            print >>self.stdout, "Press ENTER to continue..."
             self.stdin.readline()
             stop = True
             return stop
 
         self.sync_location()
 
+        # Only journaled once the engine has caught up with the player, so a snapshot taken after a trip to
+        # another world holds the room the player arrived in. A command that ends the game isn't journaled,
+        # so the journal resumes from just before the ending.
+        self.journal_command(line)
+        self.checkpoint_command(line)
+
+    def read_input(self, prompt):
+        """
+        Asks the player a question and waits for the answer.
+        :param prompt: The question to write out
+        :return: The player's answer, without the trailing newline
+        """
+        self.stdout.write(prompt)
+        self.stdout.flush()
+        return self.stdin.readline().rstrip("\r\n")
+
+    def journal_command(self, line):
+        """
+        Appends the command to the journal, if journaling is turned on.
+        :param line: user input
+        """
+        if self.journal is None:
+            return
+        # An empty line repeats the last command
+        if not line.strip():
+            line = self.lastcmd
+        if not line.strip():
+            return
+        if parse_command(line).command not in UNJOURNALED_COMMANDS:
+            self.journal.record(line, lambda: capture_state(self.worlds, self.items, self.player))
+
+    def checkpoint_command(self, line):
+        """
+        Takes a checkpoint of the game after a command, so the command can be undone.
+        :param line: user input
+        """
+        # An empty line repeats the last command
+        if not line.strip():
+            line = self.lastcmd
+        if parse_command(line).command not in HISTORY_COMMANDS:
+            self.checkpoints.record(self)
+
+    def replay_commands(self, commands):
+        """
+        Runs the given commands without writing anything to the screen, to fast forward a restored game.
+        The player already ran them, so they aren't recorded in the stats again.
+        :param commands: list of command lines
+        """
+        real_stdout = self.stdout
+        self.stdout = open(os.devnull, "w")
+        if self.stats is not None:
+            self.stats.paused = True
+        try:
+            for line in commands:
+                self.onecmd(line)
+                self.sync_location()
+        finally:
+            if self.stats is not None:
+                self.stats.paused = False
+            self.stdout.close()
+            self.stdout = real_stdout
+
     def do_use(self, args):
         """ Calls corresponding use command for the item in question """
-        stripped = check_for_prepositions(args)
-        key = text_helpers.convert_to_key(stripped)
+        key = self.parse_args(args).key
         if key == 'portal_gun' or key == 'processor' or key == 'processors':
-            print 'It\'s a Big Multiverse, Morty. But without more processors, we can only go here:'
+            print >>self.stdout, 'It\'s a Big Multiverse, Morty. But without more processors, we can only go here:'
             for world in self.player.unlocked_worlds:
-                print self.worlds[world].name
+                print >>self.stdout, self.worlds[world].name
         elif key not in self.player.inventory:
-            print "You know, Morty, it might be useful to use that if we actually had it. But alas, we do not. " \
+            print >>self.stdout, "You know, Morty, it might be useful to use that if we actually had it. But alas, we do not. " \
                   "So next time how about you suggest something useful."
-        elif key in self.items.keys():
-            self.items[key].use(self.current_world, self.current_room)
+        elif key in self.items:
+            self.items[key].use(self.current_world, self.current_room, self.stdout, self.rng)
+            # using an item can use up its charge and reveal hidden items
+            self.endings.notify(gameover.CHARGE_CHANGED)
+            self.endings.notify(gameover.ITEM_MOVED)
             if self.items[key].num_uses == 0 and self.items[key].is_rechargeable is False:
                 self.player.remove_from_inventory(key)
+                self.endings.move_item(key, gameover.CARRIED, None)
 
     def is_valid_destination(self, destination):
         """
@@ -125,14 +268,13 @@ class CommandParser(Cmd):
         :param destination: String name of the destination. This will be either a World dictionary key or Room name.
         :return: A Tuple of length 3 (is_valid_destination, is_room, associated key string)
         """
+        key = text_helpers.SYMBOLS.to_key(destination)
         # If the given destination is a room in our current world, return (is_valid, is_room, key)
-        for key in self.current_world.rooms.keys():
-            room_name = self.current_world.rooms[key].name
-            if room_name.lower() == destination.lower():
-                return True, True, key
+        if key in self.current_world.rooms:
+            return True, True, key
 
         # If the destination is a key in our worlds map, return (is_valid, !is_room, key)
-        if text_helpers.convert_to_key(destination) in self.player.unlocked_worlds:
+        if key in self.player.unlocked_worlds:
             return True, False, destination
         # Else, return (!is_valid, !is_room, None)
         else:
@@ -142,13 +284,11 @@ class CommandParser(Cmd):
         """
         Print rooms that the player can navigate to in the current world
         """
-        if len(self.current_world.rooms) > 1:
-            print "You can go to the following rooms from here: "
-            for key in self.current_world.rooms.keys():
-                room = self.current_world.rooms[key]
-                if room.name != self.current_room.name:
-                    print room.name
-            print
+        navigation = self.current_world.navigation
+        if navigation.room_count > 1:
+            print >>self.stdout, "You can go to the following rooms from here: "
+            self.stdout.write(navigation.exits_from(self.current_room.key))
+            print >>self.stdout
 
     def change_world(self):
         """
@@ -156,24 +296,22 @@ class CommandParser(Cmd):
         """
         # print exit text from current room
         if self.current_room is not None:
-            self.current_room.print_exit_description()
+            self.current_room.print_exit_description(self.stdout)
             # changing world, so must have used portal gun successfully, print portal gun message
-            print self.items["portal_gun"].success_message
+            print >>self.stdout, self.items["portal_gun"].success_message
 
         # Update engine's current world to that of the player
         self.current_world = self.player.current_world
 
         # Get the starting room for the new world
-        key = text_helpers.convert_to_key(self.current_world.name)
-        start_name = convert_to_key(self.worlds[key].starting_room)
-        start_room = self.worlds[key].rooms[start_name]
+        start_room = self.current_world.rooms[self.current_world.starting_room_key]
 
         # Update current room of both engine and player to world's starting room
         self.player.current_room = start_room
         self.current_room = start_room
 
-        self.player.current_world.print_description()
-        self.player.current_room.print_description()
+        self.player.current_world.print_description(self.stdout)
+        self.player.current_room.print_description(self.stdout)
         self.list_room_items()
         self.print_rooms_list()
 
@@ -183,13 +321,13 @@ class CommandParser(Cmd):
         """
         # print exit text from current room
         if self.current_room is not None:
-            self.current_room.print_exit_description()
+            self.current_room.print_exit_description(self.stdout)
 
         # Update engine's current room to that of the player.
         self.current_room = self.player.current_room
 
         # Write out descriptions to player
-        self.player.current_room.print_description()
+        self.player.current_room.print_description(self.stdout)
         self.list_room_items()
         self.print_rooms_list()
 
@@ -197,35 +335,24 @@ class CommandParser(Cmd):
         """
         Recharges item using a battery.
         """
-        key = text_helpers.convert_to_key(key)
-        # check if item is in inventory
-        if key not in self.player.inventory:
-            print "What the hell are you talking about, Morty?  We don't have that."
+        key = self.parse_args(key).key
+        # check if item is in inventory. Processors are carried as a count, not as items.
+        if key not in self.player.inventory or key == PROCESSOR:
+            print >>self.stdout, "What the hell are you talking about, Morty?  We don't have that."
         # check if item can be recharged
         elif self.items[key].is_rechargeable is False:
-            print "Great, Morty, we'll just... just do... what?  We can't *urp* recharge that."
+            print >>self.stdout, "Great, Morty, we'll just... just do... what?  We can't *urp* recharge that."
         # check if have battery in inventory
         elif self.is_item_valid("multiverse_battery", self.player.inventory) is False:
-            print "Morty, we need a-a-a power source. " \
+            print >>self.stdout, "Morty, we need a-a-a power source. " \
                   "You can't just go around saying random stuff and hoping it'll do something."
         # success, charge the item, remove the battery
         else:
-            print self.items["multiverse_battery"].get_usable_description() + "%s." % self.items[key].get_name()
+            print >>self.stdout, self.items["multiverse_battery"].get_usable_description() + "%s." % self.items[key].get_name()
             self.items[key].num_uses += 5
             self.player.remove_from_inventory("multiverse_battery")
-
-    def get_room_elements(self, room_elements):
-        """
-        populate array of things in the current room
-        formats strings to prepend article and determine plurality
-        """
-        for element in self.current_room.get_items():
-            fixed_string = format_string_plurality(self.items[element].get_name(), None)
-            room_elements.append(fixed_string)
-        for feature in self.current_room.get_features():
-            fixed_string = format_string_plurality(feature["key"], feature["description"])
-            room_elements.append(fixed_string)
-        return room_elements
+            self.endings.notify(gameover.CHARGE_CHANGED)
+            self.endings.move_item("multiverse_battery", gameover.CARRIED, None)
 
     def get_item_description(self, item):
         """
@@ -236,43 +363,16 @@ class CommandParser(Cmd):
         try:
             self.items[item].description
         except:
-            print "What? What are you saying?"
+            print >>self.stdout, "What? What are you saying?"
         else:
             return self.items[item].description
 
-    def build_sentence(self, elements):
-        """
-        Builds sentence to output to the user appending conjunctions, commas, and helping verbs as needed
-        """
-        sentence = "There"
-        if (len(elements)) == 0:
-                sentence += " is nothing of note here."
-        else:
-            # print first element
-            # determine appropriate verb
-            if elements[0].startswith("some"):
-                sentence += " are "
-            else:
-                sentence += " is "
-            sentence += elements[0]
-            # for all but last element, print with comma
-            for element in elements[1:-1]:
-                sentence += ", "
-                sentence += element
-            if len(elements) > 1:
-                sentence += " and "
-                sentence += elements[-1]
-        print sentence + "."
-
     def list_room_items(self):
         """
-        Collects elements (items and features) from room and their descriptions.
-        Formats the text sentence and outputs it to user.
+        Outputs the sentence listing the elements (items and features) of the current room.
         """
-        room_elements = []
-        room_elements = self.get_room_elements(room_elements)
-        self.build_sentence(room_elements)
-        print
+        print >>self.stdout, self.current_room.get_listing(self.items)
+        print >>self.stdout
 
     def check_portal_gun_charge(self):
         """
@@ -290,7 +390,8 @@ class CommandParser(Cmd):
         Let's get a move on, Morty! Summer most likely doesn't have much time left.
         """
         # split off preposition if there is one
-        stripped = check_for_prepositions(args)
+        parsed = self.parse_args(args)
+        stripped = parsed.noun
 
         if len(stripped) > 0:
             # Determine if the user's desired location is valid
@@ -300,49 +401,48 @@ class CommandParser(Cmd):
             if is_valid is True:
                 if is_room is True:
                     self.player.current_room = self.current_world.rooms[destination]
+                    self.endings.notify(gameover.ROOM_ENTERED)
 
                 else:
                     # check portal gun is in inventory and has sufficent charge
                     if "portal_gun" not in self.player.inventory:
-                        print "W-w-we left the portal gun behind, Mo*URPPP*rty. It seemed like a stupid idea at the time, and now it seems even stupider."
+                        print >>self.stdout, "W-w-we left the portal gun behind, Mo*URPPP*rty. It seemed like a stupid idea at the time, and now it seems even stupider."
                     elif self.check_portal_gun_charge() is True:
-                        new_world = text_helpers.convert_to_key(stripped)
+                        new_world = parsed.key
                         self.player.set_current_world(self.worlds[new_world])
                         self.items["portal_gun"].num_uses -= 1
+                        self.endings.notify(gameover.ROOM_ENTERED)
+                        self.endings.notify(gameover.CHARGE_CHANGED)
                         if self.items["portal_gun"].num_uses <= 2:
-                            print "Woah, be careful. Portal gun's a little low on charge, and I do NOT want to get stranded with you!"
+                            print >>self.stdout, "Woah, be careful. Portal gun's a little low on charge, and I do NOT want to get stranded with you!"
                     # gun is out of juice, return error text
                     else:
-                        print self.items["portal_gun"].get_cannot_use_description()
+                        print >>self.stdout, self.items["portal_gun"].get_cannot_use_description()
 
             # Otherwise, destination was invalid, scold Morty for being useless.
             else:
-                print "What are you blathering about Morty? " \
+                print >>self.stdout, "What are you blathering about Morty? " \
                       "Are you sure that's even a real place? There's no %s around here!" % stripped
         else:
-            print "Yes, but where Morty? You can't just say vague commands and expect me to know what you mean."
+            print >>self.stdout, "Yes, but where Morty? You can't just say vague commands and expect me to know what you mean."
 
     def help_recharge(self):
         """
         Provides the user with witty, yet practical advice for recharging an item.
         """
-        print '\nUsage: recharge [item]\n'
-        print 'Uses batteries to power my engine and charge my phone and stuff.'
+        text_helpers.get_help("recharge", self.stdout)
 
     def help_go(self):
         """
         Provides the user with witty, yet practical advice for going to another place.
         """
-        print '\nUsage: go [to planet|roomName]\n'
-        print 'Let\'s get a move on, Morty! Summer most likely doesn\'t have much time left.'
+        text_helpers.get_help("go", self.stdout)
 
     def help_use(self):
         """
         Provides the user with witty, yet practical advice for using an item.
         """
-        print '\nUsage: use itemName\n'
-        print 'Well Morty, if you have an item in your inventory, you can use it. ' \
-              'Didn\'t think it was too complicated.'
+        text_helpers.get_help("use", self.stdout)
 
     def do_get(self, args):
         """
@@ -351,36 +451,37 @@ class CommandParser(Cmd):
         # TODO: strip arguments to include phrases like "get the current world", make more natural
         # TODO: add additional arguments for inventory?
         if args == 'current world':
-            print self.player.get_current_world()
+            print >>self.stdout, self.player.get_current_world()
 
     def help_get(self):
         """
         Provides the user with witty, yet practical advice for seeing where they are.
         """
-        print '\nUsage: get current world\n'
-        print 'Uh, it seems in our scientific adventures, we lost track of which universe we are in. ' \
-              'Use this command to pinpoint our location in the space time continuum.'
+        text_helpers.get_help("get", self.stdout)
 
     def do_list(self, args):
         """
         A command for checking a player's inventory. The contents will be printed to the screen.
         """
         if args == 'inventory':
-            print "Current Inventory:"
-            for item in self.player.inventory:
-                if item == 'portal_gun':
-                    print "- Portal Gun: Battery Level %d" % self.items[item].num_uses
+            print >>self.stdout, "Current Inventory:"
+            for item, count in self.player.inventory.items():
+                if item == PROCESSOR:
+                    continue
+                elif item == 'portal_gun':
+                    print >>self.stdout, "- Portal Gun: Battery Level %d" % self.items[item].num_uses
+                elif count > 1:
+                    print >>self.stdout, "- %s x%d" % (self.items[item].get_name(), count)
                 else:
-                    print "- %s" % self.items[item].get_name()
+                    print >>self.stdout, "- %s" % self.items[item].get_name()
 
-            print "- Processors: x%s" % self.player.num_chips
+            print >>self.stdout, "- Processors: x%s" % self.player.num_chips
 
     def help_list(self):
         """
         Provides the user with witty, yet practical advice for checking their inventory.
         """
-        print '\nUsage: list inventory\n'
-        print 'WHAT\'S IN THE BOX, MORTY!? Just kidding, what have we gathered so far?'
+        text_helpers.get_help("list", self.stdout)
 
 
     def do_inventory(self, args):
@@ -393,8 +494,7 @@ class CommandParser(Cmd):
         """
         Provides the user with witty, yet practical advice for checking their inventory.
         """
-        print '\nUsage: inventory\n'
-        print 'WHAT\'S IN THE BOX, MORTY!? Just kidding, what have we gathered so far?'
+        text_helpers.get_help("inventory", self.stdout)
 
     def do_hello(self, args):
         """
@@ -404,44 +504,42 @@ class CommandParser(Cmd):
             name = 'Morty'
         else:
             name = args
-        print "Hello, %s. Sometimes it gets lonely traveling the Multiverse..." % name
+        print >>self.stdout, "Hello, %s. Sometimes it gets lonely traveling the Multiverse..." % name
 
     def help_hello(self):
         """
         Provides the user with witty, yet practical advice for saying hello.
         """
-        print '\nUsage: hello [name]\n'
-        print 'Morty sometimes I underestimate how socially inept you are. ' \
-              'Do I really need to tell you how to say hello?'
+        text_helpers.get_help("hello", self.stdout)
 
     def do_look(self, args):
         """
         Prints a description of the item, feature, or room the player designates.
         """
         # strip off preposition
-        stripped_input = check_for_prepositions(args)
+        parsed = self.parse_args(args)
+        stripped_input = parsed.noun
 
         if len(stripped_input) == 0:
-            print "Planet: " + self.current_world.name
-            print "You are in the " + self.current_room.name + "."
-            print
-            print self.current_room.get_entrance_long()
+            print >>self.stdout, "Planet: " + self.current_world.name
+            print >>self.stdout, "You are in the " + self.current_room.name + "."
+            print >>self.stdout
+            print >>self.stdout, self.current_room.get_entrance_long()
             self.print_rooms_list()
             self.list_room_items()
 
         else:
             # iterate through words in string
 
-            # check if valid item in player inventory
-            if self.is_item_valid(stripped_input, self.player.inventory) is True:
-                item = text_helpers.convert_to_key(stripped_input)
-                print self.get_item_description(item)
+            # check if valid item in player inventory. Processors are carried as a count, not as items.
+            item = parsed.key
+            if item in self.player.inventory and item != PROCESSOR:
+                print >>self.stdout, self.get_item_description(item)
                 return
 
             # check if valid item in current room
-            if self.is_item_valid(stripped_input, self.current_room.get_items()) is True:
-                item = text_helpers.convert_to_key(stripped_input)
-                print self.get_item_description(item)
+            if item in self.current_room.get_items():
+                print >>self.stdout, self.get_item_description(item)
                 return
 
             # check if valid feature
@@ -449,79 +547,75 @@ class CommandParser(Cmd):
             for word in stripped_input.split():
                 for feature in room_features:
                     if word == feature["key"]:
-                        print feature["interactive_text"]
+                        print >>self.stdout, feature["interactive_text"]
                         if feature["actions"]:
-                            print ("Hmmm, I wonder what we can do to a " + word + "?")   # give the user a list of actions they can take on a feature.
+                            print >>self.stdout, "Hmmm, I wonder what we can do to a " + word + "?"   # give the user a list of actions they can take on a feature.
                             for action in feature["actions"]:
-                                print "-", str(action.keys())[3:-2]
+                                print >>self.stdout, "-", str(action.keys())[3:-2]
                         return
 
             # check if the feature key is two words (like tiny_rick)
-            stripped_input = check_for_prepositions(args)
-            stripped_input = convert_to_key(stripped_input)
+            stripped_input = parsed.key
             for feature in room_features:
                     if stripped_input == feature["key"]:
-                        print feature["interactive_text"]
+                        print >>self.stdout, feature["interactive_text"]
                         if feature["actions"]:
-                            print ("Hmmm, I wonder what we can do to a " + word + "?")   # give the user a list of actions they can take on a feature.
+                            print >>self.stdout, "Hmmm, I wonder what we can do to a " + word + "?"   # give the user a list of actions they can take on a feature.
                             for action in feature["actions"]:
-                                print "-", str(action.keys())[3:-2]
+                                print >>self.stdout, "-", str(action.keys())[3:-2]
                         return
 
-            print "What... what should I look at? Be specific, Morty."
+            print >>self.stdout, "What... what should I look at? Be specific, Morty."
 
     def is_item_valid(self, questionable_item, list_of_items):
         """
         Checks list to determine if item user is manipulating is in the list.
         """
-        questionable_item = text_helpers.convert_to_key(questionable_item)
-        for item in list_of_items:
-            if questionable_item == item:
-                return True
-        return False
+        return text_helpers.SYMBOLS.to_key(questionable_item) in list_of_items
 
     def help_look(self):
         """
         Provides the user with witty, yet practical advice for how to take items that exist in a room.
         """
-        print '\nUsage: look [at feature|item]\n'
-        print '*facepalm* Morty, se-s-seriously? You don\'t know how to look? You look at things.'
+        text_helpers.get_help("look", self.stdout)
 
     def do_take(self, args):
         """
         Takes an item in a room and puts it in the player's inventory.
         """
         if len(args) == 0:
-            print "What? What should I take, Morty? Give me something to work with."
+            print >>self.stdout, "What? What should I take, Morty? Give me something to work with."
 
         else:
-            args = check_for_prepositions(args)
+            item = self.parse_args(args).key
             # validate item exists, is in current room, etc
             # if so, add to player inventory, remove item from room
-            if self.is_item_valid(args, self.current_room.get_items()) is True:
-                item = text_helpers.convert_to_key(args)
+            if item in self.current_room.get_items():
                 self.current_room.remove_item(item)
+                world_key = self.current_world.key
 
                 if item == 'processor':
-                    print "Added Processor to inventory."
+                    print >>self.stdout, "Added Processor to inventory."
                     self.add_processor_to_portal_gun()
+                    self.endings.move_item(item, world_key, gameover.CARRIED)
 
                 else:
                     self.player.add_to_inventory(item)
-                    print "Added %s to inventory." % self.items[item].get_name()
+                    self.endings.move_item(item, world_key, gameover.CARRIED)
+                    print >>self.stdout, "Added %s to inventory." % self.items[item].get_name()
             else:
-                print "Don't be an idiot, we don't need that."
+                print >>self.stdout, "Don't be an idiot, we don't need that."
 
     def add_processor_to_portal_gun(self):
         """
         Adds processor to portal gun and unlocks new worlds, if eligible.
         """
-        self.player.num_chips += 1
+        self.player.add_to_inventory(PROCESSOR)
         for key in self.worlds.keys():
             current_world = self.worlds[key]
             if self.player.num_chips == current_world.chips_needed:
-                self.player.unlocked_worlds.append(key)
-                print "You've unlocked: %s" % current_world.name
+                self.player.unlock_world(key)
+                print >>self.stdout, "You've unlocked: %s" % current_world.name
 
     def do_drop(self, args):
         """
@@ -530,29 +624,28 @@ class CommandParser(Cmd):
         With args: Validate item is droppable (item exists in player inventory).  Throw error text if it isn't.
         Without args: Error text.
         """
-        args = check_for_prepositions(args)
-        if len(args) == 0:
-             print "What? What should I drop, Morty?"
+        parsed = self.parse_args(args)
+        item = parsed.key
+        if len(parsed.noun) == 0:
+             print >>self.stdout, "What? What should I drop, Morty?"
         else:
             # validate item exists, is in current room, etc
             # if so, add to player inventory, remove item from room
-            if text_helpers.convert_to_key(args) == "processor" or text_helpers.convert_to_key(args) == "processors":
-                print "We can't drop Processors, Morty. They're fused into the Portal Gun. We can drop the Portal Gun, but... that's really stupid."
-            elif self.is_item_valid(args, self.player.inventory) is True:
-                item = text_helpers.convert_to_key(args)
+            if item == "processor" or item == "processors":
+                print >>self.stdout, "We can't drop Processors, Morty. They're fused into the Portal Gun. We can drop the Portal Gun, but... that's really stupid."
+            elif item in self.player.inventory:
                 self.current_room.add_item(item)
                 self.player.remove_from_inventory(item)
-                print "Uh, I guess we can leave the %s here. No idea why you'd want to do that though. Seems like we should be grabbing everything we *urp* can." % self.items[item].get_name()
+                self.endings.move_item(item, gameover.CARRIED, self.current_world.key)
+                print >>self.stdout, "Uh, I guess we can leave the %s here. No idea why you'd want to do that though. Seems like we should be grabbing everything we *urp* can." % self.items[item].get_name()
             else:
-                print "Can't drop that, Morty. No can do, nah-uh, no way!"
+                print >>self.stdout, "Can't drop that, Morty. No can do, nah-uh, no way!"
 
     def help_take(self):
         """
         Provides the user with witty, yet practical advice for how to take items that exist in a room.
         """
-        print '\nUsage: take itemName\n'
-        print 'A lot of my gadgets have been scattered around the universe, Morty. ' \
-              'That\'s what happens when you do a lot of cool shit, instead of collecting stamps like Jerry.'
+        text_helpers.get_help("take", self.stdout)
 
     def do_savegame(self, args):
         """
@@ -560,19 +653,23 @@ class CommandParser(Cmd):
         """
 
         if len(args) == 0:
-            file_name = raw_input("Please enter a file name...")
+            file_name = self.read_input("Please enter a file name...")
         else:
             file_name = args
 
-        savegame(file_name, self.worlds, self.items, self.player)
+        if len(file_name.strip()) == 0:
+            print >>self.stdout, "Can't save a game without a name, Morty."
+            return
+
+        savegame(file_name, self.worlds, self.items, self.player, incremental=(file_name == self.save_name),
+                 save_root=self.save_root)
+        self.save_name = file_name
 
     def help_savegame(self):
         """
         Provides the user with witty, yet practical advice for how to save the current state of the game.
         """
-        print '\nUsage: savegame\n'
-        print 'Preserves the state of our universe into something I can carry in a flashdrive, Morty. ' \
-              'I\'d explain more but I got shit to do.'
+        text_helpers.get_help("savegame", self.stdout)
 
 
     def do_loadgame(self, args):
@@ -581,33 +678,133 @@ class CommandParser(Cmd):
         """
 
         if len(args) == 0:
-            file_name = raw_input("Please enter a file name to load...")
+            file_name = self.read_input("Please enter a file name to load...")
         else:
             file_name = args
 
-        path = SAVE_FILE_DIRECTORY_PATH + "/" + file_name
-        if os.path.isdir(path):
+        path = self.save_root + "/" + file_name
+        if len(file_name.strip()) > 0 and SaveCatalog(self.save_root).verify(file_name) == SLOT_CORRUPT:
+            print >>self.stdout, "Morty, somebody's been messing with that save file since we saved it. I'm not loading that *urp* garbage."
+        elif len(file_name.strip()) > 0 and os.path.isdir(path):
 
-            response = raw_input("Are you sure you want to abandon the current game and load this game? Say yes "
-                                 "to confirm and anything else to abandon action.")
+            response = self.read_input("Are you sure you want to abandon the current game and load this game? Say yes "
+                                      "to confirm and anything else to abandon action.")
 
             if response.lower() == "yes":
-                loadgame(path, self)
+                if self.journal is not None:
+                    self.journal.close()
+                    self.journal = None
+                if is_journal(path):
+                    loadjournal(path, self)
+                    self.save_name = None
+                else:
+                    loadgame(path, self)
+                    self.save_name = file_name
+                # There's no undoing our way back into the abandoned game
+                self.checkpoints.clear()
                 self.do_look("")
         else:
-            print "A save file under that name does not exist. Here are the current save files:"
-            list = get_save_files()
+            print >>self.stdout, "A save file under that name does not exist. Here are the current save files:"
+            list = get_save_files(self.save_root)
             for save_file in list:
                 if save_file != ".DS_Store":
-                    print save_file
+                    print >>self.stdout, save_file
 
     def help_loadgame(self):
         """
         Provides the user with witty, yet practical advice for how to load a game file.
         """
-        print '\nUsage: load fileName\n'
-        print 'We go back into that parallel universe we preserved. ' \
-              'Hopefully in this one we can actually save Sarah, or whatever her name is.'
+        text_helpers.get_help("loadgame", self.stdout)
+
+    def do_journal(self, args):
+        """
+        Starts recording every command to a journaled save file, which is kept up to date automatically.
+        """
+        if len(args) == 0:
+            file_name = self.read_input("Please enter a file name...")
+        else:
+            file_name = args
+
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+        if file_name == "off":
+            print >>self.stdout, "Fine, Morty, we'll stop keeping a journal. Hope nothing *urp* goes wrong."
+            return
+        if len(file_name.strip()) == 0:
+            print >>self.stdout, "Can't keep a journal without a name, Morty."
+            return
+
+        self.journal = CommandJournal(self.save_root + "/" + file_name, on_snapshot=record_slot)
+        self.journal.start(capture_state(self.worlds, self.items, self.player))
+        print >>self.stdout, "Alright Morty, every move we make gets written down in %s from now on." % file_name
+
+    def help_journal(self):
+        """
+        Provides the user with witty, yet practical advice for how to keep a journal of the game.
+        """
+        text_helpers.get_help("journal", self.stdout)
+
+    def do_undo(self, args):
+        """
+        Puts the game back to how it was before the last command that changed anything.
+        """
+        if not self.checkpoints.can_undo():
+            print >>self.stdout, "There's nothing to undo, Morty. We haven't *urp* done anything yet."
+            return
+        self.checkpoints.undo(self)
+        self.restart_journal()
+        print >>self.stdout, "Alright, Morty, let's just pretend that never happened."
+        self.do_look("")
+
+    def help_undo(self):
+        """
+        Provides the user with witty, yet practical advice for how to undo a command.
+        """
+        text_helpers.get_help("undo", self.stdout)
+
+    def do_redo(self, args):
+        """
+        Does again what the last undo took back.
+        """
+        if not self.checkpoints.can_redo():
+            print >>self.stdout, "Redo what, Morty? You can't un-undo something you never undid."
+            return
+        self.checkpoints.redo(self)
+        self.restart_journal()
+        print >>self.stdout, "Fine, Morty, we'll do it again. Make up your *urp* mind."
+        self.do_look("")
+
+    def help_redo(self):
+        """
+        Provides the user with witty, yet practical advice for how to redo a command.
+        """
+        text_helpers.get_help("redo", self.stdout)
+
+    def restart_journal(self):
+        """
+        Writes a journal snapshot of the game, if journaling is turned on. Undo and redo aren't journaled,
+        since replaying them would need the checkpoints, so the journal starts over from where they left us.
+        """
+        if self.journal is not None:
+            self.journal.write_snapshot(capture_state(self.worlds, self.items, self.player))
+
+    def do_stats(self, args):
+        """
+        Shows how long each kind of command has taken this game, if stats are turned on.
+        """
+        if self.stats is None:
+            print >>self.stdout, "Nobody's keeping score, Morty. Start the game with RM_STATS set to a file name " \
+                  "and I'll time everything."
+        else:
+            text_helpers.write_lines(self.stats.summary_lines(), self.stdout)
+
+    def help_stats(self):
+        """
+        Provides the user with witty, yet practical advice for checking the game's stats.
+        """
+        text_helpers.get_help("stats", self.stdout)
 
     def do_quit(self, args):
         """
@@ -615,13 +812,11 @@ class CommandParser(Cmd):
 
         I always knew you were a quitter M-M-Morty. I bet you have some lame excuse like homework or something.
         """
-        print "Quitting."
+        print >>self.stdout, "Quitting."
         raise SystemExit
 
     def help_quit(self):
         """
         Provides the user with witty, yet practical advice for how to use quit.
         """
-        print '\nusage: quit\n'
-        print 'I always knew you were a quitter M-M-Morty. I bet you have some lame excuse ' \
-              'like homework or something.'
+        text_helpers.get_help("quit", self.stdout)
@@ -1,5 +1,8 @@
 #!/usr/bin/env python
 
+from collections import namedtuple, OrderedDict
+from text_helpers import SYMBOLS
+
 # List of prepositions that will be parsed from user input
 SPLIT_OUT_WORDS = {'to', 'at', 'about', 'on', 'onto', 'above', 'into', 'around', 'with', 'in', 'by', 'the', 'an', 'a', 'up'}
 
@@ -12,6 +15,112 @@ CONJUNCTIONS = {'and'}
 # List of proper nouns
 PROPER_NOUNS = { 'jerry', 'rick', 'morty', 'beth', 'summer', 'tiny_rick' }
 
+# Alternate verbs the player may use, mapped to the command they stand for
+COMMAND_ALIASES = { 'see' : 'look',
+                    'examine' : 'look',
+                    'grab' : 'take',
+                    'pick' : 'take',
+                    'port' : 'go',
+                    'portal' : 'go',
+                    'leave' : 'drop' ,
+                    'fix' : 'recharge',
+                    'squanch' : 'use',
+                    'save' : 'savegame',
+                    'load' : 'loadgame',
+                    'exit' : 'quit'}
+
+# Number of distinct inputs remembered by the tokenizer
+TOKEN_CACHE_SIZE = 1024
+
+# The tokenized form of one line of input.
+#   line:    the raw input
+#   verb:    the first word, as typed
+#   command: the verb with aliases resolved
+#   args:    everything after the verb, as typed
+#   noun:    args with prepositions and articles stripped
+#   key:     noun in key format, as used by the items and worlds dictionaries
+ParsedCommand = namedtuple("ParsedCommand", ["line", "verb", "command", "args", "noun", "key"])
+
+
+class LRUCache(object):
+    """
+    A dictionary that holds at most maxsize entries, dropping the least recently used one when full.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        """
+        :return: The cached value, or None
+        """
+        value = self.entries.pop(key, None)
+        if value is not None:
+            self.entries[key] = value
+        return value
+
+    def put(self, key, value):
+        self.entries.pop(key, None)
+        self.entries[key] = value
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+
+_command_cache = LRUCache(TOKEN_CACHE_SIZE)
+_arguments_cache = LRUCache(TOKEN_CACHE_SIZE)
+# The SYMBOLS version the cached keys were resolved with
+_cached_symbols_version = SYMBOLS.version
+
+
+def check_caches():
+    """
+    Empties the token caches if names have been added to SYMBOLS since their keys were resolved, so a
+    line parsed before its name was known doesn't keep the key it was given then.
+    """
+    global _cached_symbols_version
+    if _cached_symbols_version != SYMBOLS.version:
+        _command_cache.clear()
+        _arguments_cache.clear()
+        _cached_symbols_version = SYMBOLS.version
+
+
+def parse_command(line):
+    """
+    Splits a line of input into its verb and noun phrase. Results are cached, since players repeat
+    the same commands constantly.
+    :param line: The raw input
+    :return: A ParsedCommand
+    """
+    check_caches()
+    parsed = _command_cache.get(line)
+    if parsed is None:
+        words = line.split()
+        verb = words[0] if words else ""
+        args = line.strip()[len(verb):].strip()
+        noun = check_for_prepositions(args)
+        parsed = ParsedCommand(line, verb, COMMAND_ALIASES.get(verb, verb), args, noun, SYMBOLS.to_key(noun))
+        _command_cache.put(line, parsed)
+    return parsed
+
+
+def parse_arguments(args):
+    """
+    Tokenizes the arguments given to a command, for commands that are run without a full line of input.
+    :param args: The arguments, as typed
+    :return: A ParsedCommand with an empty verb
+    """
+    check_caches()
+    parsed = _arguments_cache.get(args)
+    if parsed is None:
+        noun = check_for_prepositions(args)
+        parsed = ParsedCommand(args, "", "", args, noun, SYMBOLS.to_key(noun))
+        _arguments_cache.put(args, parsed)
+    return parsed
+
 # TODO: expand to also strip out articles of incoming strings
 def check_for_prepositions(string):
     """
@@ -67,6 +176,29 @@ def format_string_plurality(key, description):
         return add_article(description, False)
 
 
+def build_sentence(elements):
+    """
+    Builds sentence to output to the user appending conjunctions, commas, and helping verbs as needed
+    :param elements: list of noun phrases, as returned by format_string_plurality
+    :return: The sentence, e.g. "There is a couch, a television and some plates."
+    """
+    sentence = "There"
+    if (len(elements)) == 0:
+        sentence += " is nothing of note here"
+    else:
+        # determine appropriate verb from the first element
+        if elements[0].startswith("some"):
+            sentence += " are "
+        else:
+            sentence += " is "
+        sentence += elements[0]
+        # for all but last element, print with comma
+        if len(elements) > 1:
+            sentence += "".join(", " + element for element in elements[1:-1])
+            sentence += " and " + elements[-1]
+    return sentence + "."
+
+
 def add_article(string, plural):
     """
     Prepends appropriate article to a feature or item
@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+from rm_bundle import ensure_bundle
+from rm_journal import CommandJournal
+from rm_load import loadgame, loadjournal
+from rm_save import savegame
+from rm_session import create_session, load_templates
+from rm_state import capture_state
+from rm_world import count_resident
+from structure_builder import construct_world_templates, construct_world_templates_from_bundle, \
+    construct_item_templates, construct_item_templates_from_bundle, instantiate_worlds, instantiate_items, \
+    link_content
+from text_helpers import TextStore
+
+WALKTHROUGHS_DIRECTORY_PATH = "data/walkthroughs"
+WORLDS_DIRECTORY_PATH = "data/worlds/"
+ITEMS_DIRECTORY_PATH = "data/items"
+RESULTS_FILE_PATH = "benchmark_results.json"
+THRESHOLDS_FILE_PATH = "benchmark_thresholds.json"
+
+# Save file written by the save/load benchmark, in a temporary save directory
+BENCHMARK_SAVE_NAME = "_benchmark"
+
+
+class BenchmarkError(Exception):
+    """
+    Raised when a walkthrough doesn't play out the way it is scripted to.
+    """
+    pass
+
+
+def load_walkthrough(file_path):
+    """
+    Reads a walkthrough: one command per line, with "#" comment lines. A "# ending: <name>" comment
+    names the ending the walkthrough must finish with.
+
+    :param file_path: path to the walkthrough file
+    :return: A dictionary with the walkthrough's name, expected ending and list of commands
+    """
+    walkthrough = {"name": os.path.splitext(os.path.basename(file_path))[0], "ending": "", "commands": []}
+    with open(file_path) as walkthrough_file:
+        for line in walkthrough_file:
+            line = line.rstrip("\r\n")
+            if line.startswith("#"):
+                if line[1:].strip().startswith("ending:"):
+                    walkthrough["ending"] = line.split(":", 1)[1].strip()
+            elif line.strip():
+                walkthrough["commands"].append(line)
+    return walkthrough
+
+
+def load_walkthroughs(directory_path=WALKTHROUGHS_DIRECTORY_PATH):
+    """
+    :param directory_path: directory holding the walkthrough files
+    :return: A list of walkthrough dictionaries, sorted by name
+    """
+    return [load_walkthrough(os.path.join(directory_path, file_name))
+            for file_name in sorted(os.listdir(directory_path)) if file_name.endswith(".txt")]
+
+
+def play_walkthrough(templates, walkthrough, latencies=None):
+    """
+    Plays a walkthrough in a new headless session.
+
+    :param templates: Tuple returned by rm_session.load_templates
+    :param walkthrough: A walkthrough dictionary
+    :param latencies: list to append the time taken by each command to, in seconds
+    :return: The finished GameSession
+    """
+    session = create_session(templates)
+    session.start(show_intro=False)
+    for command in walkthrough["commands"]:
+        start = timeit.default_timer()
+        session.execute(command)
+        if latencies is not None:
+            latencies.append(timeit.default_timer() - start)
+
+    if session.parser.ending != walkthrough["ending"]:
+        raise BenchmarkError("Walkthrough %s finished with ending '%s' instead of '%s'"
+                             % (walkthrough["name"], session.parser.ending, walkthrough["ending"]))
+    return session
+
+
+def check_journal_restore(templates, walkthrough):
+    """
+    Journals a walkthrough (minus its final command) with a snapshot after every command, and restores the
+    journal into a new session after every trip to another world, where the engine catches up with the
+    player last. Raises BenchmarkError if a restored game differs from the one that was journaled.
+
+    :param templates: Tuple returned by rm_session.load_templates
+    :param walkthrough: A walkthrough dictionary
+    """
+    journal_root = tempfile.mkdtemp()
+    try:
+        journal_path = os.path.join(journal_root, "journal")
+        session = create_session(templates)
+        session.start(show_intro=False)
+        parser = session.parser
+        parser.journal = CommandJournal(journal_path, snapshot_interval=1, sync=False)
+        parser.journal.start(capture_state(parser.worlds, parser.items, parser.player))
+
+        for command in walkthrough["commands"][:-1]:
+            world = parser.current_world
+            session.execute(command)
+            if parser.current_world is world:
+                continue
+
+            restored = create_session(templates)
+            restored.start(show_intro=False)
+            try:
+                loadjournal(journal_path, restored.parser)
+            except (KeyError, ValueError) as error:
+                raise BenchmarkError("Walkthrough %s: the journal can't be restored after '%s' (%r)"
+                                     % (walkthrough["name"], command, error))
+            restored.parser.journal.close()
+            if capture_state(restored.parser.worlds, restored.parser.items, restored.parser.player) != \
+                    capture_state(parser.worlds, parser.items, parser.player):
+                raise BenchmarkError("Walkthrough %s: the journal restored after '%s' differs from the game"
+                                     % (walkthrough["name"], command))
+        parser.journal.close()
+    finally:
+        shutil.rmtree(journal_root, True)
+
+
+def percentile(sorted_values, fraction):
+    """
+    :param sorted_values: a sorted, non-empty list of numbers
+    :param fraction: the percentile to find, between 0 and 1
+    :return: The value at the given percentile (nearest rank)
+    """
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def time_startup(repeat):
+    """
+    Times starting a game: building the content, linking it, reading all its text and creating the game's
+    worlds and items, the same steps from both sources. The fastest of several runs is kept.
+    :param repeat: number of runs
+    :return: A Tuple of length 2 (seconds to start from the data directories, seconds to start from the bundle)
+    """
+    directory_times = []
+    bundle_times = []
+    for i in range(repeat):
+        start = timeit.default_timer()
+        world_templates = construct_world_templates(WORLDS_DIRECTORY_PATH)
+        item_templates = construct_item_templates(ITEMS_DIRECTORY_PATH)
+        link_content(world_templates, item_templates)
+        TextStore().preload()
+        instantiate_worlds(world_templates)
+        instantiate_items(item_templates)
+        directory_times.append(timeit.default_timer() - start)
+
+        start = timeit.default_timer()
+        bundle = ensure_bundle()
+        world_templates = construct_world_templates_from_bundle(bundle)
+        item_templates = construct_item_templates_from_bundle(bundle)
+        link_content(world_templates, item_templates)
+        TextStore(bundle).preload()
+        instantiate_worlds(world_templates)
+        instantiate_items(item_templates)
+        bundle_times.append(timeit.default_timer() - start)
+    return min(directory_times), min(bundle_times)
+
+
+def time_save_load(templates, walkthrough, repeat):
+    """
+    Times a full save and a load of a game that has played through a walkthrough (minus its final command),
+    keeping the fastest of several runs. The game is saved to a temporary directory that is removed afterwards,
+    so the player's own save files and catalog are never touched.
+
+    :param templates: Tuple returned by rm_session.load_templates
+    :param walkthrough: A walkthrough dictionary
+    :param repeat: number of runs
+    :return: A Tuple of length 2 (seconds to save, seconds to load)
+    """
+    partial = dict(walkthrough, commands=walkthrough["commands"][:-1], ending="")
+    session = play_walkthrough(templates, partial)
+    parser = session.parser
+    save_root = tempfile.mkdtemp()
+    save_path = os.path.join(save_root, BENCHMARK_SAVE_NAME)
+
+    save_times = []
+    load_times = []
+    try:
+        for i in range(repeat):
+            shutil.rmtree(save_path, True)
+            start = timeit.default_timer()
+            savegame(BENCHMARK_SAVE_NAME, parser.worlds, parser.items, parser.player, save_root=save_root)
+            save_times.append(timeit.default_timer() - start)
+
+            loaded = create_session(templates)
+            start = timeit.default_timer()
+            loadgame(save_path, loaded.parser)
+            load_times.append(timeit.default_timer() - start)
+    finally:
+        shutil.rmtree(save_root, True)
+    return min(save_times), min(load_times)
+
+
+def run_benchmarks(iterations=20, walkthroughs=None):
+    """
+    Runs every benchmark.
+    :param iterations: number of times each walkthrough is played
+    :param walkthroughs: list of walkthrough dictionaries, loaded from the walkthroughs directory if not given
+    :return: A dictionary of metric name --> value
+    """
+    if walkthroughs is None:
+        walkthroughs = load_walkthroughs()
+    templates = load_templates(ensure_bundle())
+
+    startup_directory, startup_bundle = time_startup(max(1, iterations // 4))
+
+    latencies = []
+    start = timeit.default_timer()
+    for i in range(iterations):
+        for walkthrough in walkthroughs:
+            play_walkthrough(templates, walkthrough, latencies)
+    elapsed = timeit.default_timer() - start
+    latencies.sort()
+
+    win = [walkthrough for walkthrough in walkthroughs if walkthrough["ending"] == "win"]
+    check_journal_restore(templates, (win or walkthroughs)[0])
+    save_time, load_time = time_save_load(templates, (win or walkthroughs)[0], max(1, iterations // 4))
+
+    # Worlds are built lazily, so a finished game should only have built the rooms it went through
+    finished = play_walkthrough(templates, (win or walkthroughs)[0])
+    resident_worlds, resident_rooms = count_resident(finished.parser.worlds)
+
+    return {"walkthroughs": [walkthrough["name"] for walkthrough in walkthroughs],
+            "iterations": iterations,
+            "commands": len(latencies),
+            "startup_directory_ms": startup_directory * 1000.0,
+            "startup_bundle_ms": startup_bundle * 1000.0,
+            "commands_per_second": len(latencies) / elapsed,
+            "command_p50_ms": percentile(latencies, 0.50) * 1000.0,
+            "command_p99_ms": percentile(latencies, 0.99) * 1000.0,
+            "save_ms": save_time * 1000.0,
+            "load_ms": load_time * 1000.0,
+            "save_load_round_trip_ms": (save_time + load_time) * 1000.0,
+            "resident_worlds": resident_worlds,
+            "resident_rooms": resident_rooms}
+
+
+def check_thresholds(results, thresholds, baseline=None):
+    """
+    Compares benchmark results against the configured limits.
+
+    Each metric in thresholds["metrics"] may set an absolute "max" or "min", and a "max_regression" fraction
+    that is allowed relative to the baseline results. Set "higher_is_better" for throughput metrics.
+
+    :param results: A dictionary returned by run_benchmarks
+    :param thresholds: The decoded thresholds file
+    :param baseline: An earlier results dictionary to compare against, if any
+    :return: A list of strings describing each failed threshold
+    """
+    failures = []
+    for metric, limits in sorted(thresholds.get("metrics", {}).items()):
+        if metric not in results:
+            continue
+        value = results[metric]
+        higher_is_better = limits.get("higher_is_better", False)
+
+        if "max" in limits and value > limits["max"]:
+            failures.append("%s = %.3f is above the limit of %.3f" % (metric, value, limits["max"]))
+        if "min" in limits and value < limits["min"]:
+            failures.append("%s = %.3f is below the limit of %.3f" % (metric, value, limits["min"]))
+
+        if baseline is not None and metric in baseline and "max_regression" in limits and baseline[metric] > 0:
+            change = (value - baseline[metric]) / float(baseline[metric])
+            if higher_is_better:
+                change = -change
+            if change > limits["max_regression"]:
+                failures.append("%s = %.3f regressed %.0f%% from the baseline of %.3f (allowed %.0f%%)"
+                                % (metric, value, change * 100, baseline[metric], limits["max_regression"] * 100))
+    return failures
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark scripted playthroughs of the shipped game content.")
+    arg_parser.add_argument("--iterations", type=int, default=20, help="times to play each walkthrough")
+    arg_parser.add_argument("--output", default=RESULTS_FILE_PATH, help="where to write the results")
+    arg_parser.add_argument("--thresholds", default=THRESHOLDS_FILE_PATH, help="thresholds configuration file")
+    arg_parser.add_argument("--update-baseline", action="store_true",
+                            help="store these results as the new baseline instead of checking for regressions")
+    arguments = arg_parser.parse_args()
+
+    results = run_benchmarks(arguments.iterations)
+    with open(arguments.output, "w") as results_file:
+        json.dump(results, results_file, sort_keys=True, indent=4, separators=(',', ': '))
+
+    for metric in sorted(results):
+        if isinstance(results[metric], float):
+            print "%-28s %12.3f" % (metric, results[metric])
+        elif isinstance(results[metric], int) and metric != "iterations":
+            print "%-28s %12d" % (metric, results[metric])
+
+    thresholds = {}
+    if os.path.isfile(arguments.thresholds):
+        with open(arguments.thresholds) as thresholds_file:
+            thresholds = json.load(thresholds_file)
+
+    baseline = None
+    baseline_path = thresholds.get("baseline")
+    if baseline_path and arguments.update_baseline:
+        shutil.copyfile(arguments.output, baseline_path)
+        print "Baseline updated: %s" % baseline_path
+    elif baseline_path and os.path.isfile(baseline_path):
+        with open(baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    failures = check_thresholds(results, thresholds, baseline)
+    for failure in failures:
+        print "REGRESSION: " + failure
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+DATA_DIRECTORY_PATH = "data"
+BUNDLE_FILE_PATH = "data/content.bundle"
+
+# Content directories (relative to the data directory) that are packed into the bundle
+BUNDLE_SOURCE_DIRECTORIES = ["worlds", "items", "text"]
+
+BUNDLE_MAGIC = "RMBUNDLE"
+BUNDLE_VERSION = 2
+
+# magic, format version, length of the JSON header that follows
+BUNDLE_PREAMBLE = struct.Struct(">8sII")
+
+
+class BundleError(Exception):
+    """
+    Raised when a content bundle is missing, truncated, or was written by an incompatible version.
+    """
+    pass
+
+
+class ContentBundle(object):
+    """
+    A read-only view of every content file in the game, loaded from a single bundle file.
+
+    Entries are addressed by their path relative to the data directory, e.g. "worlds/earth/earth.json".
+    """
+
+    def __init__(self, header, payload):
+        """
+        Initializes the bundle.
+        :param header: The decoded bundle header holding the offset table and source manifest
+        :param payload: A string (or mmap) holding the packed contents of every entry
+        """
+        self.version = header["version"]
+        self.content_hash = header["hash"]
+        self.entries = header["entries"]
+        self.sources = header["sources"]
+        self.source_directories = header["directories"]
+        self.payload = payload
+
+        # Index every directory once so listing a directory doesn't scan the whole offset table
+        self.directories = {}
+        for entry_path in self.entries:
+            parts = entry_path.split("/")
+            for depth in range(1, len(parts)):
+                self.directories.setdefault("/".join(parts[:depth]), set()).add(parts[depth])
+
+    def has_entry(self, entry_path):
+        return entry_path in self.entries
+
+    def read(self, entry_path):
+        """
+        :param entry_path: Path of the entry relative to the data directory
+        :return: The raw contents of the entry as a string
+        """
+        offset, length = self.entries[entry_path]
+        return self.payload[offset:offset + length]
+
+    def load_json(self, entry_path):
+        """
+        :param entry_path: Path of the entry relative to the data directory
+        :return: The decoded JSON contents of the entry
+        """
+        return json.loads(self.read(entry_path))
+
+    def list_directory(self, directory_path):
+        """
+        Lists the names directly inside the given bundle directory, the same way os.listdir would.
+        :param directory_path: Path of the directory relative to the data directory, e.g. "worlds"
+        :return: A sorted list of file and directory names
+        """
+        return sorted(self.directories.get(directory_path.rstrip("/"), ()))
+
+
+def list_sources(data_path=DATA_DIRECTORY_PATH):
+    """
+    Walks the content directories and collects every file that belongs in the bundle.
+    :param data_path: The data directory holding the worlds, items and text directories
+    :return: A Tuple of length 2 (sorted list of file paths, sorted list of directory paths), both relative
+    to the data directory
+    """
+    source_files = []
+    source_directories = []
+    for directory in BUNDLE_SOURCE_DIRECTORIES:
+        for root, dir_names, file_names in os.walk(os.path.join(data_path, directory)):
+            dir_names[:] = [d for d in dir_names if not d.startswith(".")]
+            source_directories.append(os.path.relpath(root, data_path).replace(os.sep, "/"))
+            for file_name in file_names:
+                if not file_name.startswith("."):
+                    full_path = os.path.join(root, file_name)
+                    source_files.append(os.path.relpath(full_path, data_path).replace(os.sep, "/"))
+    return sorted(source_files), sorted(source_directories)
+
+
+def compile_bundle(data_path=DATA_DIRECTORY_PATH, bundle_path=BUNDLE_FILE_PATH):
+    """
+    Packs every world, room, item and text file into a single versioned bundle file.
+
+    :param data_path: The data directory holding the worlds, items and text directories
+    :param bundle_path: Where the bundle should be written
+    :return: The newly compiled ContentBundle
+    """
+    chunks = []
+    entries = {}
+    sources = {}
+    offset = 0
+    payload_hash = hashlib.sha1()
+    source_files, source_directories = list_sources(data_path)
+
+    for entry_path in source_files:
+        full_path = os.path.join(data_path, entry_path)
+        with open(full_path, "rb") as source_file:
+            content = source_file.read()
+        stat = os.stat(full_path)
+
+        entries[entry_path] = [offset, len(content)]
+        sources[entry_path] = [stat.st_mtime, stat.st_size, hashlib.sha1(content).hexdigest()]
+        payload_hash.update(entry_path)
+        payload_hash.update(content)
+        chunks.append(content)
+        offset += len(content)
+
+    directories = dict((directory_path, os.stat(os.path.join(data_path, directory_path)).st_mtime)
+                       for directory_path in source_directories)
+
+    header = {"version": BUNDLE_VERSION, "hash": payload_hash.hexdigest(), "entries": entries, "sources": sources,
+              "directories": directories}
+    header_content = json.dumps(header, sort_keys=True, separators=(',', ':'))
+    payload = "".join(chunks)
+
+    # Write to a temporary file first so a crash never leaves a half-written bundle behind
+    temp_path = bundle_path + ".tmp"
+    with open(temp_path, "wb") as bundle_file:
+        bundle_file.write(BUNDLE_PREAMBLE.pack(BUNDLE_MAGIC, BUNDLE_VERSION, len(header_content)))
+        bundle_file.write(header_content)
+        bundle_file.write(payload)
+    os.rename(temp_path, bundle_path)
+
+    return ContentBundle(header, payload)
+
+
+def load_bundle(bundle_path=BUNDLE_FILE_PATH, use_mmap=False):
+    """
+    Loads a bundle with a single read, or maps it into memory.
+
+    :param bundle_path: Path to the bundle file
+    :param use_mmap: Map the file instead of reading it into a string
+    :return: The loaded ContentBundle
+    """
+    if not os.path.isfile(bundle_path):
+        raise BundleError("No content bundle at %s" % bundle_path)
+
+    with open(bundle_path, "rb") as bundle_file:
+        if use_mmap:
+            data = mmap.mmap(bundle_file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            data = bundle_file.read()
+
+    if len(data) < BUNDLE_PREAMBLE.size:
+        raise BundleError("Content bundle %s is truncated" % bundle_path)
+    magic, version, header_length = BUNDLE_PREAMBLE.unpack(data[:BUNDLE_PREAMBLE.size])
+    if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+        raise BundleError("Content bundle %s has an unsupported format" % bundle_path)
+
+    header_end = BUNDLE_PREAMBLE.size + header_length
+    try:
+        header = json.loads(data[BUNDLE_PREAMBLE.size:header_end])
+    except ValueError:
+        raise BundleError("Content bundle %s has a corrupt header" % bundle_path)
+
+    if use_mmap:
+        payload = buffer(data, header_end)
+    else:
+        payload = data[header_end:]
+    return ContentBundle(header, payload)
+
+
+def is_bundle_stale(bundle, data_path=DATA_DIRECTORY_PATH):
+    """
+    Determines whether the content changed since the bundle was compiled.
+
+    Adding, removing or renaming a file changes the mtime of its directory, so those are caught by one stat
+    per content directory, without walking them. Every file recorded in the bundle is then stat'ed to catch
+    files edited in place, and only those whose mtime changed but whose size didn't are re-hashed, so
+    touching a file without editing it does not force a rebuild.
+
+    :param bundle: The previously compiled ContentBundle
+    :param data_path: The data directory holding the worlds, items and text directories
+    :return: True if the bundle needs to be recompiled
+    """
+    for directory_path, mtime in bundle.source_directories.items():
+        try:
+            if os.stat(os.path.join(data_path, directory_path)).st_mtime != mtime:
+                return True
+        except OSError:
+            return True
+
+    for entry_path, (mtime, size, digest) in bundle.sources.items():
+        full_path = os.path.join(data_path, entry_path)
+        try:
+            stat = os.stat(full_path)
+        except OSError:
+            return True
+        if stat.st_size != size:
+            return True
+        if stat.st_mtime != mtime:
+            with open(full_path, "rb") as source_file:
+                if hashlib.sha1(source_file.read()).hexdigest() != digest:
+                    return True
+    return False
+
+
+def ensure_bundle(bundle_path=BUNDLE_FILE_PATH, data_path=DATA_DIRECTORY_PATH, use_mmap=False):
+    """
+    Loads the content bundle, compiling it first if it is missing, unreadable, or out of date.
+
+    :param bundle_path: Path to the bundle file
+    :param data_path: The data directory holding the worlds, items and text directories
+    :param use_mmap: Map the file instead of reading it into a string
+    :return: An up to date ContentBundle
+    """
+    try:
+        bundle = load_bundle(bundle_path, use_mmap)
+    except BundleError:
+        return compile_bundle(data_path, bundle_path)
+
+    if is_bundle_stale(bundle, data_path):
+        return compile_bundle(data_path, bundle_path)
+    return bundle
+
+
+if __name__ == '__main__':
+    compiled = compile_bundle()
+    print "Compiled %d files into %s (%s)" % (len(compiled.entries), BUNDLE_FILE_PATH, compiled.content_hash)
@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+
+import hashlib
+import json
+import os
+import time
+
+from rm_journal import JOURNAL_FILE_NAME, SNAPSHOT_FILE_NAME
+
+CATALOG_FILE_NAME = "catalog.json"
+CATALOG_VERSION = 1
+
+PLAYER_FILE_NAME = "player.json"
+PORTAL_GUN_FILE_PATH = "items/portal_gun.json"
+
+# Results of SaveCatalog.verify
+SLOT_OK = "ok"
+SLOT_MISSING = "missing"
+SLOT_CORRUPT = "corrupt"
+SLOT_UNKNOWN = "unknown"
+
+
+def fingerprint(file_path):
+    """
+    :param file_path: A file in a save slot
+    :return: A short hash of the file's contents
+    """
+    with open(file_path, "rb") as slot_file:
+        return hashlib.sha1(slot_file.read()).hexdigest()[:16]
+
+
+def slot_size(slot_path):
+    """
+    :param slot_path: A save slot directory
+    :return: Total size in bytes of the slot's files, leaving out a journal's log, which grows with every command
+    """
+    size = 0
+    for directory, directory_names, file_names in os.walk(slot_path):
+        for file_name in file_names:
+            if file_name != JOURNAL_FILE_NAME:
+                size += os.path.getsize(os.path.join(directory, file_name))
+    return size
+
+
+def describe_slot(slot_path, saved=None, size=None):
+    """
+    Reads what the catalog records about a save slot from its player and portal gun files, or from its
+    snapshot if it is a journal, without building the game.
+
+    :param slot_path: A save slot directory
+    :param saved: When the slot was saved, defaults to when its key file was last written
+    :param size: Total size in bytes of the slot's files, if known, so the slot doesn't have to be walked
+    :return: A catalog entry dictionary
+    :raises IOError, ValueError, KeyError: if the slot is missing or its files are damaged
+    """
+    snapshot_path = os.path.join(slot_path, SNAPSHOT_FILE_NAME)
+    if os.path.isfile(snapshot_path):
+        key_file_path = snapshot_path
+        with open(snapshot_path) as snapshot_file:
+            state = json.load(snapshot_file)["state"]
+        kind = "journal"
+        player = state["player"]
+        portal_gun_charge = state["items"]["portal_gun"]
+    else:
+        key_file_path = os.path.join(slot_path, PLAYER_FILE_NAME)
+        with open(key_file_path) as player_file:
+            player = json.load(player_file)
+        with open(os.path.join(slot_path, PORTAL_GUN_FILE_PATH)) as portal_gun_file:
+            portal_gun_charge = json.load(portal_gun_file)["num_uses"]
+        kind = "save"
+
+    if saved is None:
+        saved = os.path.getmtime(key_file_path)
+    if size is None:
+        size = slot_size(slot_path)
+    return {"name": os.path.basename(slot_path),
+            "kind": kind,
+            "saved": saved,
+            "world": player["current_world"],
+            "room": player["current_room"],
+            "num_chips": player["num_chips"],
+            "portal_gun_charge": portal_gun_charge,
+            "size": size,
+            "key_file": os.path.basename(key_file_path),
+            "fingerprint": fingerprint(key_file_path)}
+
+
+class SaveCatalog(object):
+    """
+    An index of the save slots in a save directory, kept in a single small file, so saves can be listed,
+    sorted and filtered without loading any of them.
+
+    Each entry records when the slot was saved, where the player was, how many processors they had, the
+    portal gun's charge and the slot's size, plus a fingerprint of its key file (the player or snapshot
+    file that was read) so a damaged slot can be found without loading it. savegame and journal snapshots
+    keep the entries up to date.
+    """
+
+    def __init__(self, directory_path):
+        """
+        Initializes the catalog.
+        :param directory_path: The save directory, e.g. "data/savegame"
+        """
+        self.directory_path = directory_path
+        self.path = os.path.join(directory_path, CATALOG_FILE_NAME)
+        self.slots = None
+        # True once the entries have been read from the slots themselves rather than the catalog file
+        self.rebuilt = False
+
+    def load(self):
+        """
+        Reads the catalog file, rebuilding it from the save directory if it is missing or unreadable.
+        :return: The dictionary of slot name --> entry
+        """
+        if self.slots is None:
+            try:
+                with open(self.path) as catalog_file:
+                    catalog = json.load(catalog_file)
+                if catalog.get("version") != CATALOG_VERSION:
+                    raise ValueError("catalog version %r" % catalog.get("version"))
+                self.slots = catalog["slots"]
+            except (IOError, ValueError, KeyError):
+                self.rebuild()
+        return self.slots
+
+    def write(self):
+        """
+        Atomically replaces the catalog file.
+        """
+        if not os.path.exists(self.directory_path):
+            os.makedirs(self.directory_path)
+        with open(self.path + ".tmp", "w") as catalog_file:
+            json.dump({"version": CATALOG_VERSION, "slots": self.slots}, catalog_file,
+                      sort_keys=True, separators=(',', ':'))
+        os.rename(self.path + ".tmp", self.path)
+
+    def rebuild(self):
+        """
+        Catalogs every readable slot in the save directory from scratch. Nothing is written if the save
+        directory doesn't exist yet, so listing or loading saves never creates one.
+        """
+        self.slots = {}
+        self.rebuilt = True
+        if not os.path.isdir(self.directory_path):
+            return
+        for name in os.listdir(self.directory_path):
+            slot_path = os.path.join(self.directory_path, name)
+            if os.path.isdir(slot_path):
+                try:
+                    self.slots[name] = describe_slot(slot_path)
+                except (IOError, OSError, ValueError, KeyError):
+                    pass
+        self.write()
+
+    def update(self, name, size_change=None, size=None):
+        """
+        Records the current contents of a slot, after it has been saved.
+
+        The slot's size is worked out from its previous entry and size_change, or taken from size, and the
+        slot is only walked to add up its files if neither is known.
+
+        :param name: The name of the slot
+        :param size_change: The number of bytes the slot grew by since its entry was recorded, if known
+        :param size: The total size in bytes of the slot's files, if known
+        """
+        slots = self.load()
+        if size is None and size_change is not None and name in slots:
+            # A catalog rebuilt just now has already measured the slot as it is
+            size = slots[name]["size"] if self.rebuilt else slots[name]["size"] + size_change
+        slots[name] = describe_slot(os.path.join(self.directory_path, name), time.time(), size)
+        self.write()
+
+    def remove(self, name):
+        """
+        Forgets a slot.
+        :param name: The name of the slot
+        """
+        if self.load().pop(name, None) is not None:
+            self.write()
+
+    def add_new_slots(self):
+        """
+        Rebuilds the catalog if the save directory holds slots it doesn't know about, such as saves written
+        before the catalog existed or copied into the directory by hand, so listings include them.
+        :return: The dictionary of slot name --> entry
+        """
+        slots = self.load()
+        if not self.rebuilt and os.path.isdir(self.directory_path) and \
+                any(name not in slots and os.path.isdir(os.path.join(self.directory_path, name))
+                    for name in os.listdir(self.directory_path)):
+            self.rebuild()
+        return self.slots
+
+    def entries(self, sort_by="name", reverse=False, **filters):
+        """
+        Lists the catalog entries, including any slots added to the save directory behind its back.
+        :param sort_by: The entry field to sort by, e.g. "saved" or "num_chips"
+        :param reverse: Sort in descending order
+        :param filters: Entry fields and the values they must have, e.g. world="pluto"
+        :return: A list of entry dictionaries
+        """
+        entries = [entry for entry in self.add_new_slots().values()
+                   if all(entry.get(field) == value for field, value in filters.items())]
+        return sorted(entries, key=lambda entry: entry[sort_by], reverse=reverse)
+
+    def names(self):
+        """
+        :return: A sorted list of the names of the slots, including any added to the save directory behind
+            the catalog's back
+        """
+        return sorted(self.add_new_slots())
+
+    def verify(self, name):
+        """
+        Checks a slot against its catalog entry without loading it.
+        :param name: The name of the slot
+        :return: SLOT_OK, SLOT_MISSING if its directory is gone, SLOT_CORRUPT if its files no longer match
+            the entry, or SLOT_UNKNOWN if it isn't cataloged
+        """
+        entry = self.load().get(name)
+        if entry is None:
+            return SLOT_UNKNOWN
+        slot_path = os.path.join(self.directory_path, name)
+        if not os.path.isdir(slot_path):
+            return SLOT_MISSING
+        # Entries written before key files were recorded always fingerprinted a snapshot or player file
+        key_file_name = entry.get("key_file") or \
+            (SNAPSHOT_FILE_NAME if entry["kind"] == "journal" else PLAYER_FILE_NAME)
+        try:
+            if fingerprint(os.path.join(slot_path, key_file_name)) != entry["fingerprint"] or \
+                    slot_size(slot_path) != entry["size"]:
+                return SLOT_CORRUPT
+        except (IOError, OSError):
+            return SLOT_CORRUPT
+        return SLOT_OK
+
+
+def record_slot(slot_path, size_change=None, size=None):
+    """
+    Updates the catalog of the save directory holding the given slot.
+    :param slot_path: A save slot directory that has just been written
+    :param size_change: The number of bytes the slot grew by, if known (see SaveCatalog.update)
+    :param size: The total size in bytes of the slot's files, if known
+    """
+    directory_path, name = os.path.split(os.path.normpath(slot_path))
+    SaveCatalog(directory_path).update(name, size_change, size)
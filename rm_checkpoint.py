@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+
+from collections import deque, namedtuple
+
+from rm_dirty import next_change
+from rm_player import Player
+from structure_builder import instantiate_like
+
+# Number of commands that can be undone
+DEFAULT_UNDO_LIMIT = 100
+
+# The saved state of one room, world and player. Lists are stored as tuples, so a state is never changed
+# once taken and can be shared between checkpoints.
+RoomState = namedtuple("RoomState", ["items", "hidden_items", "is_visited"])
+# rooms is a dictionary of room key --> RoomState, or None if the world's rooms were never built
+WorldState = namedtuple("WorldState", ["is_visited", "rooms"])
+# inventory holds (item key, count) pairs, processors included, in the order the items were picked up
+PlayerState = namedtuple("PlayerState", ["current_world", "current_room", "inventory", "unlocked_worlds"])
+
+
+class Checkpoint(object):
+    """
+    An in-memory copy of everything that can change during play, for undo and for tools that branch play
+    from a state.
+
+    A checkpoint taken from an earlier one shares every part of it that hasn't changed since: unchanged
+    rooms, worlds and items are the very same objects, so a checkpoint costs only what changed. Only the
+    objects rm_dirty numbered a change to after the earlier checkpoint was taken are looked at (a world
+    hears of its rooms' changes), and if the game's ChangeCounter shows nothing changed at all,
+    take_checkpoint returns the earlier checkpoint itself.
+    """
+
+    __slots__ = ("change", "worlds", "items", "player")
+
+    def __init__(self, change, worlds, items, player):
+        """
+        Initializes the Checkpoint.
+        :param change: The rm_dirty.next_change number taken just before the checkpoint
+        :param worlds: Dictionary of world key --> WorldState
+        :param items: Dictionary of item key --> number of uses left
+        :param player: PlayerState
+        """
+        self.change = change
+        self.worlds = worlds
+        self.items = items
+        self.player = player
+
+
+def share(value, previous):
+    """
+    :param value: A newly taken state
+    :param previous: The same state from an earlier checkpoint, or None
+    :return: previous if it is equal to value, so it is stored once, otherwise value
+    """
+    if previous is not None and previous == value:
+        return previous
+    return value
+
+
+def take_world_state(world_obj, previous, since):
+    """
+    :param world_obj: A World object
+    :param previous: The WorldState of the world in an earlier checkpoint, or None
+    :param since: The change number of that checkpoint
+    :return: A WorldState, sharing previous or its rooms where nothing changed
+    """
+    previous_rooms = previous.rooms if previous is not None else None
+    rooms = None
+    if world_obj.has_loaded_rooms():
+        if previous_rooms is None:
+            rooms = dict((key, RoomState(tuple(room.items), tuple(room.hidden_items), room.is_visited))
+                         for key, room in world_obj.rooms.items())
+        else:
+            rooms = previous_rooms
+            for key, room in world_obj.rooms.items():
+                if room.changed_since(since):
+                    room_state = share(RoomState(tuple(room.items), tuple(room.hidden_items), room.is_visited),
+                                       previous_rooms[key])
+                    if room_state is not previous_rooms[key]:
+                        # A world always has the same rooms, so the dictionary is only copied once a room differs
+                        if rooms is previous_rooms:
+                            rooms = dict(previous_rooms)
+                        rooms[key] = room_state
+
+    if previous is not None and previous.rooms is rooms and previous.is_visited == world_obj.is_visited:
+        return previous
+    return WorldState(world_obj.is_visited, rooms)
+
+
+def take_checkpoint(worlds, items, player, previous=None, changes=None):
+    """
+    Copies the mutable state of a game.
+
+    :param worlds: the dictionary of key-->world objects used in game
+    :param items: the dictionary of key-->item objects used in game
+    :param player: the player object showing the current state of the game
+    :param previous: An earlier Checkpoint of the same game to share unchanged state with, if any
+    :param changes: The game's rm_dirty.ChangeCounter, to return previous at once if nothing has changed
+    :return: A Checkpoint, or previous itself if nothing has changed since it was taken
+    """
+    if previous is not None and changes is not None and not changes.changed_since(previous.change):
+        return previous
+
+    change = next_change()
+    if previous is None:
+        since = change
+        previous_worlds = {}
+    else:
+        since = previous.change
+        previous_worlds = previous.worlds
+
+    world_states = dict()
+    worlds_changed = previous is None
+    for key, world_obj in worlds.items():
+        world_state = previous_worlds.get(key)
+        if world_state is None or world_obj.changed_since(since) or world_obj.room_changed_since(since):
+            world_state = take_world_state(world_obj, world_state, since)
+            worlds_changed = worlds_changed or world_state is not previous_worlds.get(key)
+        world_states[key] = world_state
+
+    if previous is not None and not any(item.changed_since(since) for item in items.values()):
+        item_states = previous.items
+    else:
+        item_states = share(dict((key, item.num_uses) for key, item in items.items()),
+                            previous.items if previous is not None else None)
+
+    if previous is not None and not player.changed_since(since):
+        player_state = previous.player
+    else:
+        player_state = share(PlayerState(player.current_world.key, player.current_room.key,
+                                         tuple(player.inventory.items()), tuple(player.unlocked_worlds)),
+                             previous.player if previous is not None else None)
+
+    if previous is not None:
+        if not worlds_changed:
+            world_states = previous.worlds
+            if item_states is previous.items and player_state is previous.player:
+                return previous
+    return Checkpoint(change, world_states, item_states, player_state)
+
+
+def restore_checkpoint(checkpoint, command_parser):
+    """
+    Puts a game back into the state of a checkpoint. Fresh game objects are built from the templates of the
+    parser's current ones, so a checkpoint can be restored into any game sharing the same content.
+
+    :param checkpoint: A Checkpoint from take_checkpoint
+    :param command_parser: Command Parser instance being run
+    """
+    worlds, items = instantiate_like(command_parser.worlds, command_parser.items)
+
+    for key, world_state in checkpoint.worlds.items():
+        world_obj = worlds[key]
+        world_obj.is_visited = world_state.is_visited
+        if world_state.rooms is not None:
+            for room_key, room_state in world_state.rooms.items():
+                room = world_obj.rooms[room_key]
+                room.items = list(room_state.items)
+                room.hidden_items = list(room_state.hidden_items)
+                room.is_visited = room_state.is_visited
+
+    for key, num_uses in checkpoint.items.items():
+        items[key].num_uses = num_uses
+
+    player_state = checkpoint.player
+    player = Player()
+    player.current_world = worlds[player_state.current_world]
+    player.current_room = player.current_world.rooms[player_state.current_room]
+    player.inventory = [key for key, count in player_state.inventory for i in range(count)]
+    player.unlocked_worlds = list(player_state.unlocked_worlds)
+
+    command_parser.set_game(worlds, items, player)
+    command_parser.endings.reset()
+    # The new objects don't match any save file, so the next save has to write everything
+    command_parser.save_name = None
+
+
+class CheckpointHistory(object):
+    """
+    The checkpoints behind the undo and redo commands: one taken after every command that changed the game,
+    up to a limit, plus the ones undone since the last such command.
+    """
+
+    def __init__(self, limit=DEFAULT_UNDO_LIMIT):
+        """
+        Initializes the history.
+        :param limit: Number of checkpoints to keep for undo, or 0 to take none
+        """
+        self.current = None
+        self.undo_stack = deque(maxlen=limit)
+        self.redo_stack = []
+
+    def clear(self):
+        """
+        Forgets every checkpoint, for when a different game is loaded.
+        """
+        self.current = None
+        self.undo_stack.clear()
+        del self.redo_stack[:]
+
+    def record(self, command_parser):
+        """
+        Takes a checkpoint of the game after a command, keeping the one before it for undo if anything changed.
+        :param command_parser: Command Parser instance being run
+        """
+        if self.undo_stack.maxlen == 0:
+            return
+        checkpoint = take_checkpoint(command_parser.worlds, command_parser.items, command_parser.player,
+                                     self.current, command_parser.changes)
+        if checkpoint is self.current:
+            return
+        if self.current is not None:
+            self.undo_stack.append(self.current)
+            del self.redo_stack[:]
+        self.current = checkpoint
+
+    def can_undo(self):
+        """
+        :return: True if there is a checkpoint to go back to
+        """
+        return len(self.undo_stack) > 0
+
+    def can_redo(self):
+        """
+        :return: True if an undo can be taken back
+        """
+        return len(self.redo_stack) > 0
+
+    def undo(self, command_parser):
+        """
+        Restores the game to before the last command that changed it.
+        :param command_parser: Command Parser instance being run
+        """
+        self.redo_stack.append(self.current)
+        self.current = self.undo_stack.pop()
+        restore_checkpoint(self.current, command_parser)
+
+    def redo(self, command_parser):
+        """
+        Restores the game to how it was before the last undo.
+        :param command_parser: Command Parser instance being run
+        """
+        self.undo_stack.append(self.current)
+        self.current = self.redo_stack.pop()
+        restore_checkpoint(self.current, command_parser)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+import argparse
+import itertools
+import socket
+import sys
+
+from rm_server import DEFAULT_HOST, DEFAULT_PORT, PROMPT, ANSWER_PROMPT
+
+
+class GameClient(object):
+    """
+    A simple blocking client for the game server, used to play or to drive scripted games.
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.sock = socket.create_connection((host, port))
+        self.pending = ""
+        # The prompt the server last asked with: PROMPT for a command, ANSWER_PROMPT for an answer
+        self.prompt = PROMPT
+
+    def read_response(self):
+        """
+        Reads output until the server asks for the next command (or an answer) or closes the connection.
+        :return: A Tuple of length 2 (list of output lines, True if the game is still running)
+        """
+        while not (self.pending.endswith(PROMPT) or self.pending.endswith(ANSWER_PROMPT)):
+            data = self.sock.recv(4096)
+            if not data:
+                lines = self.pending.splitlines()
+                self.pending = ""
+                return lines, False
+            self.pending += data
+        self.prompt = PROMPT if self.pending.endswith(PROMPT) else ANSWER_PROMPT
+        lines = self.pending[:-len(self.prompt)].splitlines()
+        self.pending = ""
+        return lines, True
+
+    def send_command(self, command):
+        """
+        Runs a command on the server.
+        :param command: The command to send
+        :return: A Tuple of length 2 (list of output lines, True if the game is still running)
+        """
+        self.sock.sendall(command + "\n")
+        return self.read_response()
+
+    def close(self):
+        self.sock.close()
+
+
+def play(client, commands, echo=False):
+    """
+    Sends commands to the server and writes the responses to stdout.
+    :param client: A connected GameClient
+    :param commands: An iterable of command lines
+    :param echo: Write each command before its response, for scripted games
+    """
+    commands = iter(commands)
+    lines, running = client.read_response()
+    while True:
+        for line in lines:
+            print line
+        if not running:
+            return
+        if not echo:
+            sys.stdout.write(client.prompt)
+            sys.stdout.flush()
+        command = next(commands, None)
+        if command is None:
+            return
+        command = command.rstrip("\r\n")
+        if echo:
+            print client.prompt + command
+        lines, running = client.send_command(command)
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Play on a running game server.")
+    arg_parser.add_argument("--host", default=DEFAULT_HOST)
+    arg_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    arg_parser.add_argument("--name", help="player name to answer the server's first question with")
+    arg_parser.add_argument("script", nargs="?", help="file with one command per line to send instead of stdin")
+    arguments = arg_parser.parse_args()
+
+    # The server asks for the player's name before the game starts
+    name_lines = [arguments.name] if arguments.name else []
+    game_client = GameClient(arguments.host, arguments.port)
+    try:
+        if arguments.script:
+            with open(arguments.script) as script_file:
+                play(game_client, itertools.chain(name_lines, script_file), echo=True)
+        else:
+            play(game_client, itertools.chain(name_lines, iter(sys.stdin.readline, "")))
+    finally:
+        game_client.close()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+# The number of the latest change to any tracked object
+_last_change = [0]
+
+
+def next_change():
+    """
+    :return: A number greater than that of every change made so far, and smaller than any made from now on
+    """
+    _last_change[0] += 1
+    return _last_change[0]
+
+
+class ChangeCounter(object):
+    """
+    Remembers the number of the latest change to any of one game's objects, so whether anything in that game
+    changed since some earlier moment can be told without looking at its objects, whatever other games in
+    the same process are doing.
+    """
+
+    __slots__ = ("last",)
+
+    def __init__(self):
+        self.last = next_change()
+
+    def track(self, objects):
+        """
+        Has the given objects number their changes here too. Rooms do so through their world.
+        Taking on new objects counts as a change.
+        :param objects: An iterable of DirtyTracker objects
+        """
+        for obj in objects:
+            obj.report_changes_to(self)
+        self.last = next_change()
+
+    def changed_since(self, change):
+        """
+        :param change: A number returned by next_change
+        :return: True if any of the tracked objects has changed since that number was taken
+        """
+        return self.last > change
+
+
+class DirtyTracker(object):
+    """
+    Mixin that remembers which of an object's saved fields have changed since it was last saved.
+
+    Assigning to any attribute named in TRACKED_FIELDS marks that field as dirty. Fields holding lists
+    that are changed in place must be marked by the method doing the change, using mark_dirty.
+
+    Every change is also numbered with next_change, so whether an object changed since some earlier moment
+    can be told without comparing its fields, and reported to the game's ChangeCounter once there is one.
+    Subclasses call mark_changed when an object is created.
+    """
+
+    __slots__ = ()
+
+    TRACKED_FIELDS = frozenset()
+
+    def __setattr__(self, name, value):
+        if name in self.TRACKED_FIELDS:
+            self.mark_dirty(name)
+        object.__setattr__(self, name, value)
+
+    def mark_dirty(self, field):
+        """
+        Records that the given field has changed since the last save.
+        :param field: Name of the changed field
+        """
+        self.mark_changed()
+        try:
+            self._dirty.add(field)
+        except AttributeError:
+            object.__setattr__(self, "_dirty", set([field]))
+
+    def mark_changed(self):
+        """
+        Numbers the latest change to the object.
+        """
+        change = next_change()
+        object.__setattr__(self, "_changed", change)
+        counter = getattr(self, "_counter", None)
+        if counter is not None:
+            counter.last = change
+
+    def report_changes_to(self, counter):
+        """
+        Has the object number its changes in the given ChangeCounter as well.
+        :param counter: The ChangeCounter of the object's game
+        """
+        object.__setattr__(self, "_counter", counter)
+
+    def changed_since(self, change):
+        """
+        :param change: A number returned by next_change
+        :return: True if the object has changed, or was created, since that number was taken
+        """
+        return self._changed > change
+
+    def is_dirty(self):
+        """
+        :return: True if any saved field has changed since the last save
+        """
+        return bool(getattr(self, "_dirty", None))
+
+    def get_dirty_fields(self):
+        """
+        :return: A set with the names of every field changed since the last save
+        """
+        return set(getattr(self, "_dirty", None) or ())
+
+    def clear_dirty(self):
+        """
+        Marks the object as saved.
+        """
+        object.__setattr__(self, "_dirty", None)
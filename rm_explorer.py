@@ -0,0 +1,532 @@
+#!/usr/bin/env python
+
+import argparse
+import os
+import struct
+import sys
+from array import array
+from collections import Counter
+
+from rm_checkpoint import CheckpointHistory
+from rm_dirty import next_change
+from rm_player import PROCESSOR
+from rm_session import create_session, load_templates
+
+# Items the player carries before the game starts
+STARTING_INVENTORY = ("portal_gun",)
+
+# Codes for where an item is. Rooms use two codes each: ROOM_CODE + 2 * room index for an item lying in
+# the room, and one more than that for an item hidden in it.
+GONE_CODE = 0
+INVENTORY_CODE = 1
+ROOM_CODE = 2
+
+# Number of states searched between progress reports
+PROGRESS_INTERVAL = 10000
+
+
+def pack_bits(flags):
+    """
+    :param flags: list of booleans
+    :return: A string with one bit per flag
+    """
+    packed = bytearray((len(flags) + 7) // 8)
+    for index, flag in enumerate(flags):
+        if flag:
+            packed[index >> 3] |= 1 << (index & 7)
+    return str(packed)
+
+
+def unpack_bits(packed, count):
+    """
+    :param packed: A string returned by pack_bits
+    :param count: The number of flags that were packed
+    :return: A list of booleans
+    """
+    packed = bytearray(packed)
+    return [bool(packed[index >> 3] & (1 << (index & 7))) for index in range(count)]
+
+
+class StateCodec(object):
+    """
+    Packs everything that can change during a game into a fixed-width string, and unpacks it again.
+
+    Every copy of every item in the content is a token, and a state records where each token is: gone, in
+    the inventory, or lying or hidden in a room. Copies of the same item are interchangeable, so their
+    locations are sorted and two games that differ only in which copy was picked up pack the same way.
+    Only what can change is packed: the uses of items that have or can be given some, and visits if
+    they're tracked.
+    The number of processors carried isn't packed apart, as the processor tokens already hold it.
+    The width grows with the number of item copies, rooms and worlds, not with the number of states.
+    """
+
+    def __init__(self, world_templates, item_templates, track_visited=True):
+        """
+        Lays out the packed state for the given content.
+        :param world_templates: Dictionary with name --> WorldTemplate pairs
+        :param item_templates: Dictionary with name --> ItemTemplate pairs
+        :param track_visited: Pack which worlds and rooms were visited. They only change which descriptions
+                              are shown, so leaving them out merges states that play out the same way.
+        """
+        self.track_visited = track_visited
+        self.world_templates = world_templates
+        self.item_templates = item_templates
+        self.world_keys = sorted(world_templates)
+        self.item_keys = sorted(item_templates)
+        # Items whose number of uses can change, the only ones whose state isn't just where they are. Uses are
+        # only ever taken from an item that has some, or added by recharging it.
+        self.counted_keys = [key for key in self.item_keys
+                             if item_templates[key].num_uses != 0 or item_templates[key].is_rechargeable]
+
+        self.room_keys = []
+        self.room_index = {}
+        self.default_visited = []
+        self.default_items = []
+        self.stocked_rooms = []
+        self.world_rooms = {}
+        self.default_locations = {}
+        copies = Counter(STARTING_INVENTORY)
+        for world_key in self.world_keys:
+            world_template = world_templates[world_key]
+            locations = []
+            first_room = len(self.room_keys)
+            for room_key in sorted(world_template.rooms.keys()):
+                room_template = world_template.rooms[room_key]
+                index = len(self.room_keys)
+                self.room_keys.append((world_key, room_key))
+                self.room_index[(world_key, room_key)] = index
+                self.default_visited.append(room_template.is_visited)
+                self.default_items.append((sorted(room_template.items), sorted(room_template.hidden_items)))
+                if room_template.items or room_template.hidden_items:
+                    self.stocked_rooms.append(index)
+                locations.extend((item_key, ROOM_CODE + 2 * index) for item_key in room_template.items)
+                locations.extend((item_key, ROOM_CODE + 2 * index + 1) for item_key in room_template.hidden_items)
+                copies.update(room_template.items)
+                copies.update(room_template.hidden_items)
+            self.world_rooms[world_key] = range(first_room, len(self.room_keys))
+            self.default_locations[world_key] = locations
+
+        # (item key, number of copies) for every item that appears anywhere
+        self.token_kinds = [(item_key, copies[item_key]) for item_key in self.item_keys if copies[item_key]]
+        self.token_count = sum(count for item_key, count in self.token_kinds)
+        # Item key --> position in token_kinds, and where each kind's tokens start and end
+        self.kind_index = dict((item_key, kind) for kind, (item_key, count) in enumerate(self.token_kinds))
+        self.kind_ends = []
+        for item_key, count in self.token_kinds:
+            self.kind_ends.append(count + (self.kind_ends[-1] if self.kind_ends else 0))
+        self.kind_starts = [end - count for end, (item_key, count) in zip(self.kind_ends, self.token_kinds)]
+        # Locations are kept as (kind, location code) pairs, which sort into the order tokens are packed in
+        for world_key, locations in self.default_locations.items():
+            self.default_locations[world_key] = [(self.kind_index[item_key], code) for item_key, code in locations]
+
+        self.header = struct.Struct(">H%dh" % len(self.counted_keys))
+        # One byte per token when every location code fits in one
+        token_format = "B" if ROOM_CODE + 2 * len(self.room_keys) <= 0xFF else "H"
+        self.tokens = struct.Struct(">%d%s" % (self.token_count, token_format))
+        self.world_bytes = (len(self.world_keys) + 7) // 8
+        self.visited_bytes = self.world_bytes + (len(self.room_keys) + 7) // 8 if track_visited else 0
+        self.width = self.header.size + self.world_bytes + self.visited_bytes + self.tokens.size
+        # World key --> Tuple of length 3 (World object, rm_dirty change number, locate_items of the world),
+        # so only worlds with a room changed since they were last looked at are looked at again
+        self.world_items = {}
+
+    def encode(self, parser):
+        """
+        Packs the state of a game.
+        :param parser: The CommandParser of the game
+        :return: A string of self.width bytes
+        """
+        player = parser.player
+        kind_index = self.kind_index
+        locations = [(kind_index[item_key], INVENTORY_CODE) for item_key in player.inventory]
+        room_visited = self.default_visited[:] if self.track_visited else None
+
+        for world_key in self.world_keys:
+            world = parser.worlds[world_key]
+            cached = self.world_items.get(world_key)
+            if cached is None or cached[0] is not world or world.room_changed_since(cached[1]):
+                cached = self.world_items[world_key] = (world, next_change(), self.locate_items(world_key, world))
+            world_locations, world_visits = cached[2]
+            locations.extend(world_locations)
+            if room_visited is not None:
+                for index, is_visited in world_visits:
+                    room_visited[index] = is_visited
+
+        # Each kind's copies take the last of its tokens in sorted order, and the ones before are gone
+        locations.sort()
+        token_codes = [GONE_CODE] * self.token_count
+        free = self.kind_ends[:]
+        for kind, code in reversed(locations):
+            free[kind] -= 1
+            if free[kind] < self.kind_starts[kind]:
+                item_key, count = self.token_kinds[kind]
+                raise ValueError("The game holds more than the %d copies of %s the content has" % (count, item_key))
+            token_codes[free[kind]] = code
+
+        uses = [parser.items[item_key].num_uses for item_key in self.counted_keys]
+        # The engine's location, since the player's is left half-updated when an ending stops a portal jump
+        current_room = self.room_index[(parser.current_world.key, parser.current_room.key)]
+        state = self.header.pack(current_room, *uses) + \
+            pack_bits([world_key in player.unlocked_worlds for world_key in self.world_keys])
+        if self.track_visited:
+            state += pack_bits([parser.worlds[world_key].is_visited for world_key in self.world_keys]) + \
+                pack_bits(room_visited)
+        return state + self.tokens.pack(*token_codes)
+
+    def locate_items(self, world_key, world):
+        """
+        :param world_key: The key of a world
+        :param world: The World object
+        :return: A Tuple of length 2 (list of (kind, location code) pairs for the items in the world's rooms,
+                 list of (room index, is_visited) pairs for its rooms, empty if the rooms were never built)
+        """
+        if not world.has_loaded_rooms():
+            return self.default_locations[world_key], []
+        kind_index = self.kind_index
+        locations = []
+        visits = []
+        for room_key, room in world.rooms.items():
+            index = self.room_index[(world_key, room_key)]
+            locations.extend((kind_index[item_key], ROOM_CODE + 2 * index) for item_key in room.items)
+            locations.extend((kind_index[item_key], ROOM_CODE + 2 * index + 1) for item_key in room.hidden_items)
+            visits.append((index, room.is_visited))
+        return locations, visits
+
+    def unpack_rooms(self, token_codes):
+        """
+        :param token_codes: The unpacked token locations of a state
+        :return: A Tuple of length 2 (list of carried item keys,
+                 dictionary of room index --> Tuple of length 2 (sorted item keys, sorted hidden item keys))
+        """
+        inventory = []
+        room_items = {}
+        code_iterator = iter(token_codes)
+        for item_key, count in self.token_kinds:
+            for code in [next(code_iterator) for i in range(count)]:
+                if code == INVENTORY_CODE:
+                    inventory.append(item_key)
+                elif code != GONE_CODE:
+                    index = (code - ROOM_CODE) // 2
+                    room_items.setdefault(index, ([], []))[(code - ROOM_CODE) % 2].append(item_key)
+        return inventory, room_items
+
+    def apply(self, state, parser, current=None):
+        """
+        Puts the game a parser is running into a packed state. The game's objects are updated in place and
+        only where they differ from the state, and rooms are only built in worlds that need changing.
+
+        :param state: A string returned by encode
+        :param parser: The CommandParser to update
+        :param current: The packed state the game is in now, if known, so only the rooms that differ
+                        between the two states are looked at
+        """
+        offset = self.header.size
+        fields = self.header.unpack(state[:offset])
+        worlds = parser.worlds
+        items = parser.items
+        player = parser.player
+        for item_key, num_uses in zip(self.counted_keys, fields[1:]):
+            if num_uses != items[item_key].num_uses:
+                items[item_key].num_uses = num_uses
+
+        unlocked_bits = state[offset:offset + self.world_bytes]
+        if current is None or current[offset:offset + self.world_bytes] != unlocked_bits:
+            unlocked = unpack_bits(unlocked_bits, len(self.world_keys))
+            player.unlocked_worlds = [key for key, flag in zip(self.world_keys, unlocked) if flag]
+        offset += self.world_bytes
+
+        # Most commands only move the player or use up a charge, leaving the rest of the state as it was, and
+        # with it the item counts the ending checks keep
+        if current is None or current[offset:] != state[offset:]:
+            self.apply_rooms(state, parser, current, offset)
+            parser.endings.reset()
+
+        world_key, room_key = self.room_keys[fields[0]]
+        player.current_world = worlds[world_key]
+        player.current_room = worlds[world_key].rooms[room_key]
+
+        parser.current_world = player.current_world
+        parser.current_room = player.current_room
+        parser.ending = ''
+
+    def apply_rooms(self, state, parser, current, offset):
+        """
+        Puts the visits, the items in rooms and the inventory of a packed state into a game, see apply.
+        :param state: A string returned by encode
+        :param parser: The CommandParser to update
+        :param current: The packed state the game is in now, or None
+        :param offset: Where the visits begin in the packed state
+        """
+        visited_offset = offset
+        if self.track_visited:
+            world_visited = unpack_bits(state[offset:offset + self.world_bytes], len(self.world_keys))
+            room_visited = unpack_bits(state[offset + self.world_bytes:offset + self.visited_bytes],
+                                       len(self.room_keys))
+        offset += self.visited_bytes
+        token_codes = self.tokens.unpack(state[offset:])
+        worlds = parser.worlds
+
+        inventory, room_items = self.unpack_rooms(token_codes)
+        # Token codes are sorted, so each room's lists come out sorted and can be compared directly
+        if current is not None:
+            # Rooms whose contents differ between the current state and the new one
+            current_items = self.unpack_rooms(self.tokens.unpack(current[offset:]))[1]
+            rooms_to_check = set(index for index, lists in room_items.items() if current_items.get(index) != lists)
+            rooms_to_check.update(index for index in current_items if index not in room_items)
+            if self.track_visited and current[visited_offset:offset] != state[visited_offset:offset]:
+                rooms_to_check.update(range(len(self.room_keys)))
+        else:
+            # Rooms that differ from the content, plus every room that has been built and may have changed
+            rooms_to_check = set(index for index, lists in room_items.items() if lists != self.default_items[index])
+            rooms_to_check.update(index for index in self.stocked_rooms if index not in room_items)
+            if self.track_visited:
+                rooms_to_check.update(index for index, is_visited in enumerate(room_visited)
+                                      if is_visited != self.default_visited[index])
+            for world_key in self.world_keys:
+                if worlds[world_key].has_loaded_rooms():
+                    rooms_to_check.update(self.world_rooms[world_key])
+
+        if self.track_visited:
+            for world_key, is_visited in zip(self.world_keys, world_visited):
+                if is_visited != worlds[world_key].is_visited:
+                    worlds[world_key].is_visited = is_visited
+
+        for index in rooms_to_check:
+            world_key, room_key = self.room_keys[index]
+            room = worlds[world_key].rooms[room_key]
+            visible, hidden = room_items.get(index, ([], []))
+            if sorted(room.items) != visible:
+                room.items = visible
+            if sorted(room.hidden_items) != hidden:
+                room.hidden_items = hidden
+            if self.track_visited and room.is_visited != room_visited[index]:
+                room.is_visited = room_visited[index]
+
+        parser.player.inventory = inventory
+
+
+class StateTable(object):
+    """
+    A transposition table of packed states, stored back to back in one bytearray. Each state remembers the
+    state it was first reached from and the command that reached it, so the shortest path to any state
+    can be rebuilt. States are numbered in the order they were added.
+    """
+
+    def __init__(self, width, capacity=1 << 12):
+        """
+        Initializes an empty table.
+        :param width: The length of every state
+        :param capacity: Starting number of hash slots, a power of two
+        """
+        self.width = width
+        self.states = bytearray()
+        self.hashes = array('l')
+        self.parents = array('i')
+        self.moves = array('i')
+        self.slots = array('i', [-1]) * capacity
+        self.mask = capacity - 1
+
+    def __len__(self):
+        return len(self.parents)
+
+    def get(self, state_id):
+        """
+        :param state_id: The number of a state in the table
+        :return: The packed state
+        """
+        start = state_id * self.width
+        return str(self.states[start:start + self.width])
+
+    def add(self, state, parent, move):
+        """
+        Adds a state unless it is already in the table.
+        :param state: A packed state
+        :param parent: Number of the state this one was reached from, or -1
+        :param move: Number of the command that reached it, or -1
+        :return: The number of the new state, or -1 if the state was already in the table
+        """
+        state_hash = hash(state)
+        slot = state_hash & self.mask
+        while self.slots[slot] != -1:
+            other = self.slots[slot]
+            if self.hashes[other] == state_hash and self.get(other) == state:
+                return -1
+            slot = (slot + 1) & self.mask
+
+        state_id = len(self.parents)
+        self.states.extend(state)
+        self.hashes.append(state_hash)
+        self.parents.append(parent)
+        self.moves.append(move)
+        self.slots[slot] = state_id
+        if 2 * len(self.parents) > len(self.slots):
+            self.grow()
+        return state_id
+
+    def grow(self):
+        """
+        Doubles the number of hash slots.
+        """
+        self.slots = array('i', [-1]) * (2 * len(self.slots))
+        self.mask = len(self.slots) - 1
+        for state_id, state_hash in enumerate(self.hashes):
+            slot = state_hash & self.mask
+            while self.slots[slot] != -1:
+                slot = (slot + 1) & self.mask
+            self.slots[slot] = state_id
+
+    def path(self, state_id):
+        """
+        :param state_id: The number of a state in the table
+        :return: A list with the number of every move from the first state to the given one
+        """
+        moves = []
+        while self.parents[state_id] != -1:
+            moves.append(self.moves[state_id])
+            state_id = self.parents[state_id]
+        moves.reverse()
+        return moves
+
+
+def candidate_commands(parser, drops=False):
+    """
+    Lists the commands that can change the state of a game from where the player is. Feature actions,
+    looking around and the other commands that only print text are left out, and so is using an item where
+    it has nothing left to reveal, which only uses up its charge. Names are lowercased, as a player types
+    them, since some endings look for the exact command.
+
+    :param parser: The CommandParser of the game
+    :param drops: Include dropping each carried item
+    :return: A list of command lines
+    """
+    player = parser.player
+    current_world = parser.current_world
+    current_room = parser.current_room
+    commands = []
+    for room in current_world.rooms.values():
+        if room is not current_room:
+            commands.append("go " + room.name.lower())
+    if "portal_gun" in player.inventory:
+        for world_key in player.unlocked_worlds:
+            if world_key != current_world.key:
+                commands.append("go " + parser.worlds[world_key].name.lower())
+
+    for item_key in sorted(set(current_room.items)):
+        commands.append("take " + parser.items[item_key].name.lower())
+    for item_key in sorted(player.inventory.keys()):
+        if item_key == PROCESSOR:
+            continue
+        item = parser.items[item_key]
+        item_name = item.name.lower()
+        if current_room.hidden_items or item.usable_room != current_room.key or \
+                item.usable_world != current_world.key:
+            commands.append("use " + item_name)
+        if drops:
+            commands.append("drop " + item_name)
+        if item.is_rechargeable and "multiverse_battery" in player.inventory:
+            commands.append("recharge " + item_name)
+    return commands
+
+
+def explore(templates=None, max_states=None, track_visited=False, drops=False, progress=None):
+    """
+    Searches every state the game can reach, breadth first, so the first time an ending is reached is by
+    the shortest command sequence.
+
+    :param templates: Tuple returned by rm_session.load_templates, loaded if not given
+    :param max_states: Stop after this many distinct states, or None to search them all
+    :param track_visited: Tell states apart by which worlds and rooms were visited. This doesn't change the
+                          endings found or their shortest paths, since visits only change the descriptions shown.
+    :param drops: Try dropping items. Dropping only leaves an item somewhere it has to be fetched back from,
+                  and every place an item can be left in multiplies the number of states.
+    :param progress: Function called with the number of states found and searched, every PROGRESS_INTERVAL
+                     searched states
+    :return: A dictionary with the number of states, bytes per state, whether the search finished, and
+             the shortest command sequence reaching each ending
+    """
+    if templates is None:
+        templates = load_templates()
+    codec = StateCodec(templates[0], templates[1], track_visited)
+    session = create_session(templates)
+    session.start(show_intro=False)
+    parser = session.parser
+    # States are put back by the codec, so there's no need for undo checkpoints
+    parser.checkpoints = CheckpointHistory(0)
+    # Commands are run straight through the parser, and nothing they write is read
+    parser.stdout = open(os.devnull, "w")
+
+    table = StateTable(codec.width)
+    table.add(codec.encode(parser), -1, -1)
+    commands = []
+    command_numbers = {}
+    # Ending name --> (number of the state it was reached from, number of the command that reached it).
+    # A game that has ended isn't added to the table: it is never searched from, and the command that ends
+    # it can leave everything as it was, as firing a gun does.
+    endings = {}
+
+    # The packed state the game is in, so each apply only has to undo what the last command changed
+    live = table.get(0)
+    state_id = 0
+    while state_id < len(table):
+        if max_states is not None and len(table) >= max_states:
+            break
+        state = table.get(state_id)
+        codec.apply(state, parser, live)
+        live = state
+        for command in candidate_commands(parser, drops):
+            codec.apply(state, parser, live)
+            line = parser.precmd(command)
+            parser.postcmd(parser.onecmd(line), line)
+            live = codec.encode(parser)
+
+            move = command_numbers.get(command)
+            if move is None:
+                move = command_numbers[command] = len(commands)
+                commands.append(command)
+            if parser.ending:
+                endings.setdefault(parser.ending, (state_id, move))
+            else:
+                table.add(live, state_id, move)
+        state_id += 1
+        if progress is not None and state_id % PROGRESS_INTERVAL == 0:
+            progress(len(table), state_id)
+    parser.stdout.close()
+
+    return {"states": len(table),
+            "bytes_per_state": codec.width,
+            "complete": state_id >= len(table),
+            "endings": dict((ending, [commands[move] for move in table.path(parent) + [last_move]])
+                            for ending, (parent, last_move) in endings.items())}
+
+
+def print_progress(found, searched):
+    """
+    Writes search progress to stderr.
+    :param found: Number of distinct states found
+    :param searched: Number of states searched
+    """
+    print >>sys.stderr, "%d states found, %d searched" % (found, searched)
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Find every ending the game can reach, and the shortest way there.")
+    arg_parser.add_argument("--max-states", type=int, default=None, help="stop searching after this many states")
+    arg_parser.add_argument("--track-visited", action="store_true",
+                            help="tell states apart by the worlds and rooms visited, to count every distinct state")
+    arg_parser.add_argument("--drops", action="store_true", help="also try dropping items, which takes far longer")
+    arg_parser.add_argument("--quiet", action="store_true", help="don't report progress")
+    arguments = arg_parser.parse_args()
+
+    result = explore(max_states=arguments.max_states, track_visited=arguments.track_visited,
+                     drops=arguments.drops, progress=None if arguments.quiet else print_progress)
+    print "%d states of %d bytes%s" % (result["states"], result["bytes_per_state"],
+                                       "" if result["complete"] else " (search stopped early)")
+    for ending_name, path in sorted(result["endings"].items()):
+        print
+        print "%s in %d commands:" % (ending_name, len(path))
+        for path_command in path:
+            print "  " + path_command
+    if "win" not in result["endings"]:
+        print
+        print "The game can't be won." if result["complete"] else "No win found yet."
+        sys.exit(1)
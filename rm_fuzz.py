@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import multiprocessing
+import random
+import sys
+import timeit
+import traceback
+from collections import Counter
+
+from parser import CommandParser
+from parser_grammar import COMMAND_ALIASES
+from rm_session import create_session, load_templates
+
+# Commands that touch files on disk or end the game on purpose, so they are never generated
+EXCLUDED_COMMANDS = frozenset(['savegame', 'loadgame', 'journal', 'quit'])
+
+DEFAULT_SESSIONS = 2000
+DEFAULT_MAX_COMMANDS = 200
+
+# Filled in once per worker process by init_worker
+_worker_templates = None
+_worker_vocabulary = None
+
+
+def build_vocabulary(templates):
+    """
+    Collects every word the game understands from the loaded content and the parser.
+    :param templates: Tuple returned by rm_session.load_templates
+    :return: A dictionary of word lists: verbs, aliases, action_verbs, features, items, rooms and worlds
+    """
+    world_templates, item_templates = templates
+    verbs = sorted(name[3:] for name in dir(CommandParser)
+                   if name.startswith('do_') and name[3:] not in EXCLUDED_COMMANDS)
+    aliases = sorted(alias for alias, command in COMMAND_ALIASES.items() if command not in EXCLUDED_COMMANDS)
+
+    action_verbs = set()
+    features = set()
+    rooms = set()
+    for world_template in world_templates.values():
+        for room_template in world_template.rooms.values():
+            rooms.add(room_template.name)
+            for verb, feature_key in room_template.action_index:
+                action_verbs.add(verb)
+                features.add(feature_key.replace("_", " "))
+
+    return {"verbs": verbs,
+            "aliases": aliases,
+            "action_verbs": sorted(action_verbs),
+            "features": sorted(features),
+            "items": sorted(item_template.name for item_template in item_templates.values()),
+            "rooms": sorted(rooms),
+            "worlds": sorted(world_template.name for world_template in world_templates.values())}
+
+
+def generate_command(rng, vocabulary, parser):
+    """
+    Makes up the next command for a session. Most commands are built from what is around the player,
+    so sessions get deep into the game; the rest are any combination of known words.
+
+    :param rng: random.Random used for every choice
+    :param vocabulary: Dictionary returned by build_vocabulary
+    :param parser: The session's CommandParser
+    :return: A command line
+    """
+    room = parser.current_room
+    roll = rng.random()
+    if roll < 0.25:
+        destinations = [other.name for other in parser.current_world.rooms.values()] + vocabulary["worlds"]
+        return rng.choice(["go ", "portal to ", "go to the "]) + rng.choice(destinations)
+    if roll < 0.40:
+        items = [parser.items[key].name for key in room.items] or vocabulary["items"]
+        return rng.choice(["take ", "grab ", "pick up the "]) + rng.choice(items)
+    if roll < 0.60 and room.template.action_index:
+        verb, feature_key = rng.choice(sorted(room.template.action_index))
+        return verb + " " + rng.choice(["", "the "]) + feature_key.replace("_", " ")
+    if roll < 0.75:
+        items = [parser.items[key].name for key in parser.player.inventory if key in parser.items]
+        return rng.choice(["use ", "look ", "drop ", "recharge "]) + rng.choice(items or vocabulary["items"])
+    if roll < 0.80:
+        return rng.choice(vocabulary["verbs"])
+
+    verb = rng.choice(vocabulary["verbs"] + vocabulary["aliases"] + vocabulary["action_verbs"])
+    noun = rng.choice(vocabulary[rng.choice(["features", "items", "rooms", "worlds"])])
+    return verb + " " + noun
+
+
+def fuzz_session(seed, templates, vocabulary, max_commands=DEFAULT_MAX_COMMANDS):
+    """
+    Plays one game of random commands.
+
+    :param seed: Seed for the session's command choices, so a failing session can be replayed
+    :param templates: Tuple returned by rm_session.load_templates
+    :param vocabulary: Dictionary returned by build_vocabulary
+    :param max_commands: Most commands to run before giving up on reaching an ending
+    :return: A dictionary with the seed, commands run, ending, crash (if any), rooms visited and items found
+    """
+    rng = random.Random(seed)
+    session = create_session(templates, seed)
+    parser = session.parser
+    result = {"seed": seed, "commands": [], "ending": "", "crash": None, "rooms": set(), "items": set()}
+
+    try:
+        session.start(show_intro=False)
+        while not session.is_over and len(result["commands"]) < max_commands:
+            result["rooms"].add(parser.current_world.key + "/" + parser.current_room.key)
+            result["items"].update(parser.current_room.items)
+            result["items"].update(parser.player.inventory)
+
+            command = generate_command(rng, vocabulary, parser)
+            result["commands"].append(command)
+            session.execute(command)
+    except Exception as error:
+        file_name, line_number, function_name, text = traceback.extract_tb(sys.exc_info()[2])[-1]
+        result["crash"] = {"type": type(error).__name__,
+                           "location": "%s:%d in %s" % (file_name, line_number, function_name),
+                           "message": str(error),
+                           "traceback": traceback.format_exc()}
+
+    result["ending"] = parser.ending
+    return result
+
+
+def init_worker():
+    """
+    Loads the game content once in each worker process.
+    """
+    global _worker_templates, _worker_vocabulary
+    _worker_templates = load_templates()
+    _worker_vocabulary = build_vocabulary(_worker_templates)
+
+
+def run_worker_session(job):
+    """
+    Runs one session in a worker process.
+    :param job: A Tuple of length 2 (seed, max_commands)
+    :return: The session result, with sets turned into lists so it pickles compactly
+    """
+    seed, max_commands = job
+    result = fuzz_session(seed, _worker_templates, _worker_vocabulary, max_commands)
+    result["rooms"] = list(result["rooms"])
+    result["items"] = list(result["items"])
+    return result
+
+
+def fuzz(sessions=DEFAULT_SESSIONS, max_commands=DEFAULT_MAX_COMMANDS, processes=None, seed=0):
+    """
+    Plays many random games across a pool of processes and summarizes what went wrong.
+
+    :param sessions: Number of games to play
+    :param max_commands: Most commands in each game
+    :param processes: Number of worker processes, one per core if not given
+    :param seed: Seed of the first game; the others follow on from it
+    :return: A report dictionary
+    """
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    templates = load_templates()
+    vocabulary = build_vocabulary(templates)
+
+    crashes = {}
+    endings = Counter()
+    rooms_visited = set()
+    items_found = set()
+    commands_run = 0
+
+    start = timeit.default_timer()
+    pool = multiprocessing.Pool(processes, initializer=init_worker)
+    try:
+        jobs = [(seed + offset, max_commands) for offset in range(sessions)]
+        for result in pool.imap_unordered(run_worker_session, jobs, chunksize=max(1, sessions // (processes * 8))):
+            commands_run += len(result["commands"])
+            endings[result["ending"] or "none"] += 1
+            rooms_visited.update(result["rooms"])
+            items_found.update(result["items"])
+            crash = result["crash"]
+            if crash is not None:
+                signature = crash["type"] + " at " + crash["location"]
+                if signature not in crashes:
+                    crashes[signature] = dict(crash, seed=result["seed"], commands=result["commands"], count=0)
+                crashes[signature]["count"] += 1
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+    elapsed = timeit.default_timer() - start
+
+    world_templates, item_templates = templates
+    all_rooms = set(world_key + "/" + room_key for world_key, world_template in world_templates.items()
+                    for room_key in world_template.rooms.keys())
+
+    return {"sessions": sessions,
+            "processes": processes,
+            "commands": commands_run,
+            "seconds": elapsed,
+            "sessions_per_second_per_core": sessions / elapsed / processes,
+            "endings": dict(endings),
+            "crashes": sorted(crashes.values(), key=lambda crash: -crash["count"]),
+            "unreached_rooms": sorted(all_rooms - rooms_visited),
+            "unfound_items": sorted(set(item_templates) - items_found)}
+
+
+def print_report(report):
+    """
+    Writes a readable summary of a fuzzing report to stdout.
+    :param report: Dictionary returned by fuzz
+    """
+    print "%d sessions, %d commands in %.1fs on %d processes (%.1f sessions/s per core)" % (
+        report["sessions"], report["commands"], report["seconds"], report["processes"],
+        report["sessions_per_second_per_core"])
+    print "Endings: " + ", ".join("%s %d" % pair for pair in sorted(report["endings"].items()))
+    print "Rooms never reached: " + (", ".join(report["unreached_rooms"]) or "none")
+    print "Items never found: " + (", ".join(report["unfound_items"]) or "none")
+
+    if not report["crashes"]:
+        print "No crashes."
+    for crash in report["crashes"]:
+        print
+        print "CRASH x%d: %s: %s" % (crash["count"], crash["type"] + " at " + crash["location"], crash["message"])
+        print "  seed %d, last command: %s" % (crash["seed"], crash["commands"][-1])
+        print crash["traceback"]
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Play random games on every core to find crashes and dead ends.")
+    arg_parser.add_argument("--sessions", type=int, default=DEFAULT_SESSIONS)
+    arg_parser.add_argument("--max-commands", type=int, default=DEFAULT_MAX_COMMANDS)
+    arg_parser.add_argument("--processes", type=int, default=None, help="defaults to one per core")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--output", help="also write the full report to this JSON file")
+    arguments = arg_parser.parse_args()
+
+    fuzz_report = fuzz(arguments.sessions, arguments.max_commands, arguments.processes, arguments.seed)
+    print_report(fuzz_report)
+    if arguments.output:
+        with open(arguments.output, "w") as report_file:
+            json.dump(fuzz_report, report_file, sort_keys=True, indent=4, separators=(',', ': '))
+    sys.exit(1 if fuzz_report["crashes"] else 0)
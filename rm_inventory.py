@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+from collections import OrderedDict
+
+
+class Inventory(object):
+    """
+    The items a player is carrying, stored as item key --> count. Copies of an item stack, and checking for,
+    counting, adding and removing an item take constant time however much is carried.
+
+    Iterating yields every copy of every item, in the order the items were first picked up, so an Inventory
+    can be used wherever a list of item keys was.
+    """
+
+    __slots__ = ("counts", "total")
+
+    def __init__(self, items=()):
+        """
+        Initializes the Inventory.
+        :param items: Iterable of item keys to start with, one per copy
+        """
+        self.counts = OrderedDict()
+        self.total = 0
+        for key in items:
+            self.add(key)
+
+    def add(self, key, count=1):
+        """
+        Adds copies of an item.
+        :param key: The key of the item
+        :param count: The number of copies to add
+        """
+        self.counts[key] = self.counts.get(key, 0) + count
+        self.total += count
+
+    def remove(self, key, count=1):
+        """
+        Removes copies of an item. An item that runs out is forgotten, so picking it up again puts it last.
+        :param key: The key of the item
+        :param count: The number of copies to remove
+        """
+        held = self.counts.get(key, 0)
+        if held < count:
+            raise ValueError("Inventory.remove(x): x not in inventory")
+        if held == count:
+            del self.counts[key]
+        else:
+            self.counts[key] = held - count
+        self.total -= count
+
+    def count(self, key):
+        """
+        :param key: The key of an item
+        :return: The number of copies of the item being carried
+        """
+        return self.counts.get(key, 0)
+
+    def set_count(self, key, count):
+        """
+        Changes the number of copies of an item being carried.
+        :param key: The key of the item
+        :param count: The new number of copies
+        """
+        held = self.counts.get(key, 0)
+        if count > held:
+            self.add(key, count - held)
+        elif count < held:
+            self.remove(key, held - count)
+
+    def keys(self):
+        """
+        :return: A list of the item keys carried, without repeats, in the order they were picked up
+        """
+        return self.counts.keys()
+
+    def items(self):
+        """
+        :return: A list of (item key, count) pairs, in the order the items were picked up
+        """
+        return self.counts.items()
+
+    def to_list(self, exclude=()):
+        """
+        :param exclude: Item keys to leave out
+        :return: A list with one entry per copy of each item, as stored in save files
+        """
+        return [key for key in self if key not in exclude]
+
+    def __contains__(self, key):
+        return key in self.counts
+
+    def __iter__(self):
+        for key, count in self.counts.items():
+            for i in range(count):
+                yield key
+
+    def __len__(self):
+        return self.total
+
+    def __repr__(self):
+        return "Inventory(%r)" % self.to_list()
@@ -1,18 +1,24 @@
 #!/usr/bin/env python
 import random
 from text_helpers import *
+from rm_dirty import DirtyTracker
+from parser_grammar import format_string_plurality
 
 OBJECTS_PATH = './data/objects/'
 
 
-class Item(object):
+class ItemTemplate(object):
+    """
+    The unchanging content of an Item, shared by the Item of every game in progress.
+    num_uses holds the number of uses an Item starts with.
+    """
 
     def __init__(self):
         """
-        Initializes the Item object
+        Initializes the ItemTemplate object
         """
-        # self.num_uses = num_uses
         self.name = ""
+        self.description = ""
         self.actions = []
         self.success_message = ""
         self.failure_messages = []
@@ -20,6 +26,47 @@ class Item(object):
         self.usable_room = ""
         self.num_uses = 0
         self.is_rechargeable = False
+        self.room_phrase = ""
+        # WorldTemplate of usable_world, set by structure_builder.link_content
+        self.usable_world_template = None
+
+    def build_room_phrase(self):
+        """
+        Works out how the item is named when a room lists what is in it, article included, e.g. "a plumbus".
+        """
+        self.room_phrase = format_string_plurality(self.name, None)
+
+
+class Item(DirtyTracker):
+    """
+    An Item only stores its remaining uses; everything else is read from its ItemTemplate.
+    """
+
+    __slots__ = ("template", "num_uses", "_dirty", "_changed", "_counter")
+
+    TRACKED_FIELDS = frozenset(["num_uses"])
+
+    def __init__(self, template=None):
+        """
+        Initializes the Item object
+        :param template: The ItemTemplate holding the content of this Item
+        """
+        if template is None:
+            template = ItemTemplate()
+        object.__setattr__(self, "template", template)
+        object.__setattr__(self, "num_uses", template.num_uses)
+        object.__setattr__(self, "_dirty", None)
+        self.mark_changed()
+
+    name = property(lambda self: self.template.name)
+    description = property(lambda self: self.template.description)
+    actions = property(lambda self: self.template.actions)
+    success_message = property(lambda self: self.template.success_message)
+    failure_messages = property(lambda self: self.template.failure_messages)
+    usable_world = property(lambda self: self.template.usable_world)
+    usable_room = property(lambda self: self.template.usable_room)
+    is_rechargeable = property(lambda self: self.template.is_rechargeable)
+    room_phrase = property(lambda self: self.template.room_phrase)
 
     def get_name(self):
         """
@@ -27,22 +74,24 @@ class Item(object):
         """
         return self.name
 
-    def use(self, world, room):
+    def use(self, world, room, out=None, rng=random):
         """
         A player uses the item. Results may vary.
 
         :param world: The world the player is exploring.
         :param room: The room the player is currently in.
+        :param out: File-like object to write to, defaults to sys.stdout
+        :param rng: random.Random the failure message is picked with, defaults to the random module
         """
-        if self.usable_world == convert_to_key(world.name) and self.usable_room == convert_to_key(room.name) \
+        if world.template is self.template.usable_world_template and self.usable_room == room.key \
                 and self.num_uses > 0:
             if room.reveal_hidden_items() is True:
-                print self.get_usable_description()
+                print >>out, self.get_usable_description()
             else:
-                print "Morty, we've already done that. We can't be wasting time!"
+                print >>out, "Morty, we've already done that. We can't be wasting time!"
             self.num_uses -= 1
         else:
-            print self.get_cannot_use_description()
+            print >>out, self.get_cannot_use_description(rng)
 
     def get_usable_description(self):
         """
@@ -51,9 +100,10 @@ class Item(object):
         """
         return self.success_message
 
-    def get_cannot_use_description(self):
+    def get_cannot_use_description(self, rng=random):
         """
         When this item is not usable, the player will receive this message.
+        :param rng: random.Random to pick the message with, defaults to the random module
         :return: A string with the description.
         """
-        return random.choice(self.failure_messages)
+        return rng.choice(self.failure_messages)
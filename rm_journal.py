@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+
+import json
+import os
+
+JOURNAL_FILE_NAME = "journal.log"
+SNAPSHOT_FILE_NAME = "snapshot.json"
+
+# Number of journaled commands between full state snapshots
+DEFAULT_SNAPSHOT_INTERVAL = 25
+
+
+class CommandJournal(object):
+    """
+    An append-only log of the commands entered during a game, plus a periodic snapshot of the game state.
+
+    Every command is appended to the log as "<sequence number>\\t<command>" and synced to disk, so a crash
+    loses at most the command being entered. Every snapshot_interval commands the whole state is written to
+    the snapshot file and the log is started over. Restoring loads the snapshot and replays the log entries
+    with a higher sequence number.
+    """
+
+    def __init__(self, path, snapshot_interval=DEFAULT_SNAPSHOT_INTERVAL, sync=True, on_snapshot=None):
+        """
+        Initializes the journal.
+        :param path: Directory holding the journal and snapshot files
+        :param snapshot_interval: Number of commands to journal between snapshots
+        :param sync: Force every appended command to disk before returning
+        :param on_snapshot: A callable run after each snapshot is written, if given, with path and the number
+            of bytes the snapshot grew by (as rm_catalog.record_slot takes them). The first snapshot the
+            journal writes passes None instead, since it can't know what else was in the directory before.
+        """
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+        self.sync = sync
+        self.on_snapshot = on_snapshot
+        self.sequence = 0
+        self.snapshot_sequence = 0
+        self.log_file = None
+        # Size of the snapshot file, once this journal has written it
+        self.snapshot_size = None
+
+    def start(self, state, sequence=0):
+        """
+        Writes the first snapshot and opens the log for appending.
+        :param state: The current game state, as returned by rm_state.capture_state
+        :param sequence: Number of commands already applied to the given state
+        """
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        self.sequence = sequence
+        self.write_snapshot(state)
+
+    def resume(self, sequence, snapshot_sequence):
+        """
+        Continues appending to an existing journal after it has been replayed.
+        :param sequence: Sequence number of the last command in the log
+        :param snapshot_sequence: Sequence number stored with the latest snapshot
+        """
+        self.sequence = sequence
+        self.snapshot_sequence = snapshot_sequence
+        self.log_file = open(os.path.join(self.path, JOURNAL_FILE_NAME), "a")
+
+    def record(self, command, state_function):
+        """
+        Appends a command to the log, writing a new snapshot if enough commands have built up.
+        :param command: The command line entered by the player
+        :param state_function: A callable returning the current game state, only called when a snapshot is due
+        """
+        self.sequence += 1
+        self.log_file.write("%d\t%s\n" % (self.sequence, command))
+        self.log_file.flush()
+        if self.sync:
+            os.fsync(self.log_file.fileno())
+
+        if self.sequence - self.snapshot_sequence >= self.snapshot_interval:
+            self.write_snapshot(state_function())
+
+    def write_snapshot(self, state):
+        """
+        Atomically replaces the snapshot with the given state and starts a new, empty log.
+        :param state: The current game state, as returned by rm_state.capture_state
+        """
+        snapshot = {"sequence": self.sequence, "state": state}
+        snapshot_path = os.path.join(self.path, SNAPSHOT_FILE_NAME)
+        snapshot_content = json.dumps(snapshot, separators=(',', ':'))
+        size_change = None
+        if self.snapshot_size is not None:
+            size_change = len(snapshot_content) - self.snapshot_size
+        self.snapshot_size = len(snapshot_content)
+
+        with open(snapshot_path + ".tmp", "w") as snapshot_file:
+            snapshot_file.write(snapshot_content)
+            snapshot_file.flush()
+            if self.sync:
+                os.fsync(snapshot_file.fileno())
+        os.rename(snapshot_path + ".tmp", snapshot_path)
+        self.snapshot_sequence = self.sequence
+
+        # Entries up to the snapshot are no longer needed. If we crash before truncating, replay skips them.
+        if self.log_file is not None:
+            self.log_file.close()
+        self.log_file = open(os.path.join(self.path, JOURNAL_FILE_NAME), "w")
+        if self.on_snapshot is not None:
+            self.on_snapshot(self.path, size_change)
+
+    def close(self):
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+
+
+def is_journal(path):
+    """
+    :param path: A save file directory
+    :return: True if the directory holds a journaled save
+    """
+    return os.path.isfile(os.path.join(path, SNAPSHOT_FILE_NAME))
+
+
+def read_journal(path):
+    """
+    Reads the latest snapshot and the commands journaled after it.
+    A partially written last line (from a crash mid-append) is ignored.
+
+    :param path: Directory holding the journal and snapshot files
+    :return: A Tuple of length 3 (snapshot sequence number, snapshot state, list of (sequence, command) pairs)
+    """
+    with open(os.path.join(path, SNAPSHOT_FILE_NAME)) as snapshot_file:
+        snapshot = json.load(snapshot_file)
+
+    commands = []
+    journal_path = os.path.join(path, JOURNAL_FILE_NAME)
+    if os.path.isfile(journal_path):
+        with open(journal_path) as log_file:
+            for line in log_file:
+                if not line.endswith("\n") or "\t" not in line:
+                    break
+                sequence, command = line[:-1].split("\t", 1)
+                if int(sequence) > snapshot["sequence"]:
+                    commands.append((int(sequence), command))
+
+    return snapshot["sequence"], snapshot["state"], commands
@@ -1,26 +1,108 @@
+import json
+import os
 from structure_builder import *
+from rm_journal import CommandJournal, read_journal
+from rm_catalog import record_slot
+from rm_state import apply_state, mark_saved
 
 
 def loadgame(save_directory, command_parser):
     """
     Updates the current state of the game to that of the desired game file.
 
+    The game content is already in memory, shared by the current game's objects through their templates,
+    so fresh objects are built from those templates and only the save's files, which hold what can change
+    during play, are read and applied on top. Worlds, rooms and items the save has no file for still match
+    the content.
+
     :param save_directory: Save file to use.
     :param command_parser: Command Parser instance being run.
     """
-    # Update worlds/rooms
-    updated_worlds = construct_worlds(save_directory + "/worlds/")
-    command_parser.worlds = updated_worlds
+    updated_worlds, updated_items = instantiate_like(command_parser.worlds, command_parser.items)
+    apply_world_files(save_directory + "/worlds", updated_worlds)
+    apply_item_files(save_directory + "/items", updated_items)
+    updated_player = build_player(save_directory + "/player.json", updated_worlds)
 
-    # Update Items
-    updated_items = construct_items(save_directory + "/items/")
-    command_parser.items = updated_items
+    # The objects now match the save, so saving back to it can stay incremental
+    mark_saved(updated_worlds, updated_items, updated_player)
 
-    # Update Player
-    updated_player = build_player(save_directory + "/player.json", updated_worlds)
-    command_parser.player = updated_player
+    command_parser.set_game(updated_worlds, updated_items, updated_player)
+    command_parser.endings.reset()
+
+
+def read_json_file(file_path):
+    """
+    :param file_path: A json file in a save
+    :return: The decoded contents of the file
+    """
+    with open(file_path) as json_data:
+        return json.load(json_data)
+
+
+def apply_world_files(worlds_path, worlds):
+    """
+    Applies the saved world and room files onto freshly built worlds.
+    :param worlds_path: The worlds directory of the save
+    :param worlds: the dictionary of key-->world objects to update
+    """
+    if not os.path.isdir(worlds_path):
+        return
+    for key in os.listdir(worlds_path):
+        world_obj = worlds[key]
+        world_directory_path = worlds_path + "/" + key
+        world_file_path = world_directory_path + "/" + key + ".json"
+        # Saves from before worlds kept track of visits have world files without is_visited
+        if os.path.isfile(world_file_path):
+            world_obj.is_visited = read_json_file(world_file_path).get("is_visited", world_obj.is_visited)
+
+        world_rooms_path = world_directory_path + "/rooms"
+        if os.path.isdir(world_rooms_path):
+            for room_file_name in os.listdir(world_rooms_path):
+                if room_file_name.endswith(".json"):
+                    data = read_json_file(world_rooms_path + "/" + room_file_name)
+                    room = world_obj.rooms[room_file_name[:-5]]
+                    room.items = data["items"]
+                    room.hidden_items = data["hidden_items"]
+                    room.is_visited = data["is_visited"]
+
+
+def apply_item_files(items_path, items):
+    """
+    Applies the saved item files onto freshly built items.
+    :param items_path: The items directory of the save
+    :param items: the dictionary of key-->item objects to update
+    """
+    if not os.path.isdir(items_path):
+        return
+    for item_file_name in os.listdir(items_path):
+        if item_file_name.endswith(".json"):
+            items[item_file_name[:-5]].num_uses = read_json_file(items_path + "/" + item_file_name)["num_uses"]
+
+
+def loadjournal(save_directory, command_parser):
+    """
+    Restores a journaled game by loading its latest snapshot and replaying the commands entered since.
+    The journal is then reopened so the restored game keeps appending to it.
+
+    :param save_directory: Journaled save file to use.
+    :param command_parser: Command Parser instance being run.
+    """
+    snapshot_sequence, state, commands = read_journal(save_directory)
+
+    # Start from the game content the running game already shares, then apply the snapshot on top of it
+    updated_worlds, updated_items = instantiate_like(command_parser.worlds, command_parser.items)
+    updated_player = Player()
+    apply_state(state, updated_worlds, updated_items, updated_player)
+
+    command_parser.set_game(updated_worlds, updated_items, updated_player)
 
-    # Update Current World and Room of parser
-    command_parser.current_world = updated_player.current_world
-    command_parser.current_room = updated_player.current_room
+    # Replay the tail of the journal
+    command_parser.replay_commands([command for sequence, command in commands])
+    command_parser.endings.reset()
 
+    journal = CommandJournal(save_directory, on_snapshot=record_slot)
+    if commands:
+        journal.resume(commands[-1][0], snapshot_sequence)
+    else:
+        journal.resume(snapshot_sequence, snapshot_sequence)
+    command_parser.journal = journal
@@ -2,9 +2,16 @@
 
 
 from rm_item import Item
+from rm_dirty import DirtyTracker
+from rm_inventory import Inventory
 
+# Processors are carried like any other item. Save files store them as num_chips rather than in the inventory.
+PROCESSOR = "processor"
 
-class Player(object):
+
+class Player(DirtyTracker):
+
+    TRACKED_FIELDS = frozenset(["current_world", "current_room", "inventory", "num_chips", "unlocked_worlds"])
 
     def __init__(self):
         """
@@ -16,12 +23,33 @@ class Player(object):
         self.unlocked_worlds = ["earth"]
         self.num_chips = 0
 
+    def _get_inventory(self):
+        return self._inventory
+
+    def _set_inventory(self, items):
+        object.__setattr__(self, "_inventory", Inventory(items))
+
+    # Assigning a list of item keys replaces the whole inventory, processors included
+    inventory = property(_get_inventory, _set_inventory)
+
+    def _get_num_chips(self):
+        return self._inventory.count(PROCESSOR)
+
+    def _set_num_chips(self, num_chips):
+        self._inventory.set_count(PROCESSOR, num_chips)
+
+    # The number of processors carried
+    num_chips = property(_get_num_chips, _set_num_chips)
+
     def add_to_inventory(self, item):
         """
         Adds the given Item object to the player's inventory.
         :param item: The Item object to be added to the inventory.
         """
-        self.inventory.append(item)
+        self.inventory.add(item)
+        self.mark_dirty("inventory")
+        if item == PROCESSOR:
+            self.mark_dirty("num_chips")
 
     def remove_from_inventory(self, item):
         """
@@ -29,10 +57,27 @@ class Player(object):
         :param item: The Item object to be removed from the inventory.
         """
         self.inventory.remove(item)
+        self.mark_dirty("inventory")
+        if item == PROCESSOR:
+            self.mark_dirty("num_chips")
+
+    def get_saved_inventory(self):
+        """
+        :return: A list of the carried items as save files store them: one entry per copy, without processors
+        """
+        return self.inventory.to_list(exclude=(PROCESSOR,))
+
+    def unlock_world(self, world_key):
+        """
+        Allows the player to travel to the given world.
+        :param world_key: The key of the World object in the worlds dictionary
+        """
+        self.unlocked_worlds.append(world_key)
+        self.mark_dirty("unlocked_worlds")
 
     def get_inventory(self):
         """
-        :return: The dictionary representing item name --> Item object pairs
+        :return: The Inventory of item key --> count pairs
         """
         return self.inventory
 
@@ -1,37 +1,179 @@
 #!/usr/bin/env python
 
+from rm_dirty import DirtyTracker
+from parser_grammar import format_string_plurality, build_sentence
 
-class Room(object):
-    """
-    A Room in the Rick and Morty text adventure game is an area that exists in a World object.
 
-    Rooms may have characters, features, items, and other secrets a player can find and
-    interact with.
+class RoomTemplate(object):
+    """
+    The unchanging content of a Room: its name, descriptions and features, plus the items it starts with.
+    A single RoomTemplate is shared by the Room of every game in progress.
     """
 
     def __init__(self, name):
         """
-        Initializes the Room.
+        Initializes the RoomTemplate.
         :param name: The name of the Room as a string
         """
         self.name = name
         self.key = ""
         self.features = []
-        self.items = []
-        self.hidden_items = []
+        self.items = ()
+        self.hidden_items = ()
         self.long_description = ""
         self.short_description = ""
         self.is_visited = False
-        self.features = {}
         self.long_description_exit = ""
         self.short_description_exit = ""
+        self.action_index = {}
+        self.feature_phrases = ()
+
+    def build_action_index(self):
+        """
+        Indexes the actions of every feature by (verb, feature key), so a command can be matched to its
+        action text without scanning the features. Earlier features win if two share a key and verb.
+        """
+        self.action_index = {}
+        for feature in self.features:
+            for action in feature["actions"]:
+                for verb, text in action.items():
+                    self.action_index.setdefault((verb, feature["key"].lower()), text)
+
+    def build_feature_phrases(self):
+        """
+        Works out how each feature is named when the room lists what is in it, article included.
+        """
+        self.feature_phrases = tuple(format_string_plurality(feature["key"], feature["description"])
+                                     for feature in self.features)
+
+    def find_action(self, verb, noun_phrase):
+        """
+        Finds the action text for a verb applied to any feature named in the noun phrase.
+        Every run of consecutive words is tried as a feature key, longest first, so "poke tiny rick" and
+        "touch the purple beakers" find the tiny_rick and beakers features.
+
+        :param verb: The verb the player used
+        :param noun_phrase: The rest of the command
+        :return: The action text, or None if no feature in this room responds to the verb
+        """
+        if not self.action_index:
+            return None
+        words = noun_phrase.lower().split()
+        for length in range(len(words), 0, -1):
+            for start in range(0, len(words) - length + 1):
+                text = self.action_index.get((verb, "_".join(words[start:start + length])))
+                if text is not None:
+                    return text
+        return None
+
+
+class Room(DirtyTracker):
+    """
+    A Room in the Rick and Morty text adventure game is an area that exists in a World object.
+
+    Rooms may have characters, features, items, and other secrets a player can find and
+    interact with.
+
+    A Room only stores what can change during a game. Everything else is read from its RoomTemplate, and
+    the template's item lists are used until the first time this room's items change.
+
+    The sentence listing the room's items and features is kept until the items change.
+    """
+
+    __slots__ = ("template", "world", "_items", "_hidden_items", "is_visited", "_dirty", "_listing", "_changed")
 
-    def print_description(self):
-        print "You are in the " + self.name + "."
+    TRACKED_FIELDS = frozenset(["items", "hidden_items", "is_visited"])
+
+    def __init__(self, template, world=None):
+        """
+        Initializes the Room.
+        :param template: The RoomTemplate holding the content of this Room
+        :param world: The World this Room is in, told whenever the Room changes
+        """
+        object.__setattr__(self, "template", template)
+        object.__setattr__(self, "world", world)
+        object.__setattr__(self, "_items", None)
+        object.__setattr__(self, "_hidden_items", None)
+        object.__setattr__(self, "is_visited", template.is_visited)
+        object.__setattr__(self, "_dirty", None)
+        self.mark_changed()
+        object.__setattr__(self, "_listing", None)
+
+    name = property(lambda self: self.template.name)
+    key = property(lambda self: self.template.key)
+    features = property(lambda self: self.template.features)
+    long_description = property(lambda self: self.template.long_description)
+    short_description = property(lambda self: self.template.short_description)
+    long_description_exit = property(lambda self: self.template.long_description_exit)
+    short_description_exit = property(lambda self: self.template.short_description_exit)
+
+    def mark_changed(self):
+        """
+        Numbers the latest change to the room, and tells its world, see DirtyTracker.mark_changed.
+        """
+        DirtyTracker.mark_changed(self)
+        if self.world is not None:
+            self.world.mark_room_changed(self._changed)
+
+    def find_action(self, verb, noun_phrase):
+        """
+        Finds the action text for a verb applied to any feature in this room, see RoomTemplate.find_action.
+        """
+        return self.template.find_action(verb, noun_phrase)
+
+    def _get_items(self):
+        if self._items is None:
+            return self.template.items
+        return self._items
+
+    def _set_items(self, items):
+        object.__setattr__(self, "_items", list(items))
+        object.__setattr__(self, "_listing", None)
+
+    items = property(_get_items, _set_items)
+
+    def _get_hidden_items(self):
+        if self._hidden_items is None:
+            return self.template.hidden_items
+        return self._hidden_items
+
+    def _set_hidden_items(self, hidden_items):
+        object.__setattr__(self, "_hidden_items", list(hidden_items))
+
+    hidden_items = property(_get_hidden_items, _set_hidden_items)
+
+    def own_items(self):
+        """
+        Copies the template's item lists into this room, so they can be changed without affecting other games.
+        :return: A Tuple of length 2 (list of items, list of hidden items)
+        """
+        if self._items is None:
+            object.__setattr__(self, "_items", list(self.template.items))
+        if self._hidden_items is None:
+            object.__setattr__(self, "_hidden_items", list(self.template.hidden_items))
+        return self._items, self._hidden_items
+
+    def get_listing(self, items):
+        """
+        :param items: Dictionary with name (string) --> Item object pairings of the game
+        :return: The sentence listing the items and features in this room, e.g. "There is a couch and some plates."
+        """
+        if self._listing is None:
+            phrases = [items[key].room_phrase for key in self.items]
+            phrases.extend(self.template.feature_phrases)
+            object.__setattr__(self, "_listing", build_sentence(phrases))
+        return self._listing
+
+    def print_description(self, out=None):
+        """
+        Writes the room's entrance description.
+        :param out: File-like object to write to, defaults to sys.stdout
+        """
+        print >>out, "You are in the " + self.name + "."
         if self.is_visited is False:
-            print self.long_description
+            print >>out, self.long_description
         else:
-            print self.short_description
+            print >>out, self.short_description
 
     def set_is_visited(self, is_visited):
         self.is_visited = is_visited
@@ -55,19 +197,24 @@ class Room(object):
         Helper method used to transfer all items in the hidden array to that of the public, items array.
         """
         if len(self.hidden_items) > 0:
-            while len(self.hidden_items) > 0:
-                self.items.append(self.hidden_items.pop())
+            items, hidden_items = self.own_items()
+            while len(hidden_items) > 0:
+                items.append(hidden_items.pop())
+            self.mark_dirty("items")
+            self.mark_dirty("hidden_items")
+            object.__setattr__(self, "_listing", None)
             return True
         return False
         
-    def print_exit_description(self):
+    def print_exit_description(self, out=None):
         """
         Prints exit description depending on if the room was previously visited or not
+        :param out: File-like object to write to, defaults to sys.stdout
         """
         if self.is_visited is False:
-            print self.get_exit_long()
+            print >>out, self.get_exit_long()
         else:
-            print self.get_exit_short()
+            print >>out, self.get_exit_short()
 
     def get_entrance_long(self):
         """
@@ -104,10 +251,14 @@ class Room(object):
         """
         Removes item from room.
         """
-        self.items.remove(item)
+        self.own_items()[0].remove(item)
+        self.mark_dirty("items")
+        object.__setattr__(self, "_listing", None)
 
     def add_item(self, item):
         """
-        Removes item from room.
+        Adds item to room.
         """
-        self.items.append(item)
+        self.own_items()[0].append(item)
+        self.mark_dirty("items")
+        object.__setattr__(self, "_listing", None)
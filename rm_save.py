@@ -1,51 +1,152 @@
 import os
 import json
 from text_helpers import convert_to_key
-from distutils.dir_util import copy_tree
+from rm_catalog import SaveCatalog, record_slot
 
 SAVE_FILE_DIRECTORY_PATH = "data/savegame"
-ITEMS_DIRECTORY_PATH = "data/items"
-TEXT_DIRECTORY_PATH = "data/text"
-WORLDS_DIRECTORY_PATH = "data/worlds"
 
 
-def savegame(directory_name, worlds, items, player):
+def savegame(directory_name, worlds, items, player, incremental=False, save_root=SAVE_FILE_DIRECTORY_PATH):
     """
-    Saves the game as a new set of files in the "data/savegame" directory
+    Saves the game as a set of files in the save directory, "data/savegame" unless another is given.
+
+    Only what can change during play is written: whether worlds and rooms were visited, which items lie in
+    each room, each item's uses left, and the player. The game content supplies everything else when the
+    save is loaded. A full save writes every item and every world that has been built, while an incremental
+    save only rewrites the objects that changed since this game was last saved to (or loaded from) the same
+    directory.
     :param directory_name: Name of the new save file
     :param worlds: the dictionary of key-->world objects used in game
     :param items: the dictionary of key-->world objects used in game
     :param player: the player object showing the current state of the game
+    :param incremental: True if directory_name already holds an earlier save of this game
+    :param save_root: The save directory to save into
     """
 
     # Create directory for new save file
-    path = SAVE_FILE_DIRECTORY_PATH + "/" + directory_name
-    items_directory_path = path + "/items"
-    if not os.path.exists(path):
+    path = save_root + "/" + directory_name
+    is_new = not os.path.exists(path)
+    if is_new:
         os.makedirs(path)
+        incremental = False
 
-        # Create items directory and copy contents
-        copy_directory(ITEMS_DIRECTORY_PATH, items_directory_path)
+    if incremental:
+        size_change = save_changes(path, worlds, items, player)
+    else:
+        size_change = save_everything(path, worlds, items, player)
 
-        # Create text directory and copy contents
-        text_directory_path = path + "/text"
-        copy_directory(TEXT_DIRECTORY_PATH, text_directory_path)
+    # The catalog works out the slot's new size from what was just written instead of walking the slot
+    if is_new:
+        record_slot(path, size=size_change)
+    else:
+        record_slot(path, size_change)
 
-        # Create worlds directory and copy contents
-        worlds_directory_path = path + "/worlds"
-        copy_directory(WORLDS_DIRECTORY_PATH, worlds_directory_path)
 
-    # Update contents of rooms
+def save_everything(path, worlds, items, player):
+    """
+    Writes the item and player files, and the world and room files of every world whose rooms were built.
+    Worlds that were never built still match the game content, so they are skipped without being built,
+    and any files an earlier save left for them are removed.
+    :param path: the save file directory
+    :param worlds: the dictionary of key-->world objects used in game
+    :param items: the dictionary of key-->item objects used in game
+    :param player: the player object showing the current state of the game
+    :return: The number of bytes the save directory grew by
+    """
+    items_directory_path = path + "/items"
+    size_change = 0
+
+    # Update contents of worlds and rooms
     for key in worlds.keys():
         world_obj = worlds[key]
-        world_directory_path = path + "/worlds/" + key + "/rooms"
-        update_room_files(world_obj, world_directory_path)
+        world_directory_path = path + "/worlds/" + key
+        if world_obj.has_loaded_rooms():
+            size_change += create_world_file(world_obj, key, world_directory_path)
+            size_change += update_room_files(world_obj, world_directory_path + "/rooms")
+        else:
+            size_change += remove_world_files(key, world_directory_path)
 
     # Update attributes of items
-    update_item_files(items, items_directory_path)
+    size_change += update_item_files(items, items_directory_path)
 
     # Update player file
-    create_player_file(player, path)
+    size_change += create_player_file(player, path)
+    return size_change
+
+
+def save_changes(path, worlds, items, player):
+    """
+    Rewrites only the world, room, item and player files whose objects changed since the last save.
+    Worlds whose rooms were never built cannot have changed, so they are skipped without being built.
+    :param path: the save file directory holding an earlier save of this game
+    :param worlds: the dictionary of key-->world objects used in game
+    :param items: the dictionary of key-->item objects used in game
+    :param player: the player object showing the current state of the game
+    :return: The number of bytes the save directory grew by
+    """
+    size_change = 0
+    for key in worlds.keys():
+        world_obj = worlds[key]
+        world_directory_path = path + "/worlds/" + key
+        if world_obj.is_dirty():
+            size_change += create_world_file(world_obj, key, world_directory_path)
+        if world_obj.has_loaded_rooms():
+            for room in world_obj.rooms.values():
+                if room.is_dirty():
+                    size_change += create_room_file(room, world_directory_path + "/rooms")
+
+    for key in items.keys():
+        if items[key].is_dirty():
+            size_change += create_item_file(items[key], path + "/items")
+
+    if player.is_dirty():
+        size_change += create_player_file(player, path)
+    return size_change
+
+
+def write_save_file(file_path, file_content):
+    """
+    Writes a file of a save, replacing any earlier one.
+    :param file_path: Path of the file
+    :param file_content: The string to write
+    :return: The number of bytes the save directory grew by (negative if a larger file was replaced)
+    """
+    size_change = len(file_content)
+    if os.path.exists(file_path):
+        size_change -= os.path.getsize(file_path)
+    with open(file_path, "w+") as json_data:
+        json_data.write(file_content)
+    return size_change
+
+
+def remove_save_file(file_path):
+    """
+    Removes a file of a save.
+    :param file_path: Path of the file
+    :return: The number of bytes the save directory grew by, i.e. minus the size of the file
+    """
+    size_change = -os.path.getsize(file_path)
+    os.remove(file_path)
+    return size_change
+
+
+def create_world_file(world_obj, world_key, file_path):
+    """
+    Creates a new json file with the attributes of the given world object that can change during play.
+    :param world_obj: The object we want to convert to a json file
+    :param world_key: The key of the world in the worlds dictionary, used as the file name
+    :param file_path: Where we want to store the new world file
+    :return: The number of bytes the save directory grew by
+    """
+    json_obj = dict()
+    json_obj["is_visited"] = world_obj.is_visited
+    file_content = json.dumps(json_obj, sort_keys=True, indent=4, separators=(',', ': '))
+
+    if not os.path.exists(file_path):
+        os.makedirs(file_path)
+    size_change = write_save_file(file_path + "/" + world_key + ".json", file_content)
+    world_obj.clear_dirty()
+    return size_change
 
 
 def create_player_file(player, path):
@@ -53,17 +154,39 @@ def create_player_file(player, path):
     Creates a new json file with the attributes of the given player object.
     :param player: The object we want to convert to a json file
     :param path: Where we want to store the new player file
+    :return: The number of bytes the save directory grew by
     """
     json_obj = dict()
-    json_obj["current_world"] = convert_to_key(player.current_world.name)
-    json_obj["current_room"] = convert_to_key(player.current_room.name)
-    json_obj["inventory"] = player.inventory
+    json_obj["current_world"] = player.current_world.key
+    json_obj["current_room"] = player.current_room.key
+    json_obj["inventory"] = player.get_saved_inventory()
     json_obj["num_chips"] = player.num_chips
     json_obj["unlocked_worlds"] = player.unlocked_worlds
     file_content = json.dumps(json_obj, sort_keys=True, indent=4, separators=(',', ': '))
 
-    with open(path + "/player.json", "w+") as json_data:
-        json_data.write(file_content)
+    size_change = write_save_file(path + "/player.json", file_content)
+    player.clear_dirty()
+    return size_change
+
+
+def remove_world_files(world_key, file_path):
+    """
+    Removes the world and room files an earlier save wrote for a world, if there are any.
+    :param world_key: The key of the world in the worlds dictionary, used as the file name
+    :param file_path: Where the world file would be stored
+    :return: The number of bytes the save directory grew by
+    """
+    size_change = 0
+    if not os.path.exists(file_path):
+        return size_change
+    world_rooms_path = file_path + "/rooms"
+    if os.path.exists(world_rooms_path):
+        for f in os.listdir(world_rooms_path):
+            if f.endswith(".json"):
+                size_change += remove_save_file(world_rooms_path + "/" + f)
+    if os.path.exists(file_path + "/" + world_key + ".json"):
+        size_change += remove_save_file(file_path + "/" + world_key + ".json")
+    return size_change
 
 
 def update_room_files(world_obj, world_rooms_path):
@@ -71,40 +194,45 @@ def update_room_files(world_obj, world_rooms_path):
     Updates the room files for the given world with their current state as seen in game.
     :param world_obj: object holding the rooms
     :param world_rooms_path: the path to room files
+    :return: The number of bytes the save directory grew by
     """
+    size_change = 0
+    if not os.path.exists(world_rooms_path):
+        os.makedirs(world_rooms_path)
     file_list = [f for f in os.listdir(world_rooms_path) if f.endswith(".json")]
 
     # Clear previous room files
     for f in file_list:
-        os.remove(world_rooms_path + "/" + f)
+        size_change += remove_save_file(world_rooms_path + "/" + f)
 
     # Create new room files
     for key in world_obj.rooms.keys():
         room = world_obj.rooms[key]
-        create_room_file(room, world_rooms_path)
+        size_change += create_room_file(room, world_rooms_path)
+    return size_change
 
 
 def create_room_file(room_obj, file_path):
     """
-    Creates a new json file with the attributes of the given room object.
+    Creates a new json file with the attributes of the given room object that can change during play.
     :param room_obj: The object we want to convert to a json file
     :param file_path: Where we want to store the new room file
+    :return: The number of bytes the save directory grew by
     """
     json_obj = dict()
-    json_obj["name"] = room_obj.name
-    json_obj["features"] = room_obj.features
     json_obj["items"] = room_obj.items
     json_obj["hidden_items"] = room_obj.hidden_items
-    json_obj["longform"] = room_obj.long_description
-    json_obj["shortform"] = room_obj.short_description
     json_obj["is_visited"] = room_obj.is_visited
-    json_obj["long_description_exit"] = room_obj.long_description_exit
-    json_obj["short_description_exit"] = room_obj.short_description_exit
     file_content = json.dumps(json_obj, sort_keys=True, indent=4, separators=(',', ': '))
 
+    # An incremental save can reach a world that was first built after the earlier save
+    if not os.path.exists(file_path):
+        os.makedirs(file_path)
+
     file_name = convert_to_key(room_obj.name)
-    with open(file_path + "/" + file_name + ".json", "w+") as json_data:
-        json_data.write(file_content)
+    size_change = write_save_file(file_path + "/" + file_name + ".json", file_content)
+    room_obj.clear_dirty()
+    return size_change
 
 
 def update_item_files(items, items_path):
@@ -112,55 +240,46 @@ def update_item_files(items, items_path):
     Updates the item files with their current state as seen in game.
     :param items: dictionary holding the items
     :param items_path: the path to item files
+    :return: The number of bytes the save directory grew by
     """
+    size_change = 0
+    if not os.path.exists(items_path):
+        os.makedirs(items_path)
     file_list = [f for f in os.listdir(items_path) if f.endswith(".json")]
 
-    # Clear previous room files
+    # Clear previous item files
     for f in file_list:
-        os.remove(items_path + "/" + f)
+        size_change += remove_save_file(items_path + "/" + f)
 
-    # Create new room files
+    # Create new item files
     for key in items.keys():
         item = items[key]
-        create_item_file(item, items_path)
+        size_change += create_item_file(item, items_path)
+    return size_change
 
 
 def create_item_file(item, file_path):
     """
-    Creates a new json file with the attributes of the given item object.
+    Creates a new json file with the attributes of the given item object that can change during play.
     :param item: The object we want to convert to a json file
     :param file_path: Where we want to store the new item file
+    :return: The number of bytes the save directory grew by
     """
     json_obj = dict()
-    json_obj["name"] = item.name
-    json_obj["description"] = item.description
-    json_obj["actions"] = item.actions
-    json_obj["success_message"] = item.success_message
-    json_obj["failure_messages"] = item.failure_messages
-    json_obj["usable_world"] = item.usable_world
-    json_obj["usable_room"] = item.usable_room
     json_obj["num_uses"] = item.num_uses
-    json_obj["is_rechargeable"] = item.is_rechargeable
     file_content = json.dumps(json_obj, sort_keys=True, indent=4, separators=(',', ': '))
 
     file_name = convert_to_key(item.name)
-    with open(file_path + "/" + file_name + ".json", "w+") as json_data:
-        json_data.write(file_content)
-
-
-def copy_directory(source_path, destination_path):
-    """
-    Copies the directory from the source path to the destination path.
-    :param source_path: The directory we want to copy.
-    :param destination_path: Where we want to copy the source.
-    """
-    copy_tree(source_path, destination_path)
+    size_change = write_save_file(file_path + "/" + file_name + ".json", file_content)
+    item.clear_dirty()
+    return size_change
 
 
-def get_save_files():
+def get_save_files(save_root=SAVE_FILE_DIRECTORY_PATH):
     """
-    Creates a list of all the save files for Keep Summer Safe
+    Creates a list of all the save files for Keep Summer Safe, from the save catalog
+    :param save_root: The save directory to list
     :return: a list of directory names
     """
-    return os.listdir(SAVE_FILE_DIRECTORY_PATH)
+    return SaveCatalog(save_root).names()
 
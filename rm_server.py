@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+
+import argparse
+import asynchat
+import asyncore
+import os
+import socket
+
+from rm_session import create_session, load_templates
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 4000
+
+# Each player saves into their own directory in here, named after them, so players never see or overwrite
+# each other's saves and find their own again when they reconnect
+SERVER_SAVE_DIRECTORY_PATH = "data/serversaves"
+
+# Asked when a player connects, before their game starts
+NAME_QUESTION = "Who's there? Tell me your name, so I can find your saves."
+# Longest player name kept for the save directory
+MAX_NAME_LENGTH = 32
+
+PROMPT = ">> "
+# Sent instead of PROMPT when the game has asked a question, such as a save file name, and waits for the answer
+ANSWER_PROMPT = "?> "
+
+# Longest command we'll buffer from a client before dropping the connection
+MAX_LINE_LENGTH = 1024
+
+
+def player_directory_name(name):
+    """
+    :param name: The name a player gave when connecting
+    :return: The name of the player's save directory, safe to use as a path, or an empty string if the name
+             has nothing in it to name a directory after
+    """
+    name = name.strip().lower()[:MAX_NAME_LENGTH]
+    if not any(character.isalnum() for character in name):
+        return ""
+    return "".join(character if character.isalnum() or character in "-_" else "_" for character in name)
+
+
+class GameChannel(asynchat.async_chat):
+    """
+    One connected player. The first line the client sends is the player's name, which picks their save
+    directory; after that each line is run as a command in the player's own GameSession and the output is
+    queued back to the client without ever blocking the other players.
+
+    A command that asks a question is held at the question, and the client's next line is taken as the
+    answer, so nothing waits on the socket in the middle of a command.
+    """
+
+    def __init__(self, sock, session_factory):
+        """
+        Initializes the channel and asks the player's name.
+        :param sock: The accepted client socket
+        :param session_factory: A callable taking the player's save directory name and returning the
+                                GameSession they will play in
+        """
+        asynchat.async_chat.__init__(self, sock)
+        self.set_terminator("\n")
+        self.incoming = []
+        self.incoming_length = 0
+        self.session_factory = session_factory
+        self.session = None
+
+        self.send_lines([NAME_QUESTION])
+        self.push(ANSWER_PROMPT)
+
+    def collect_incoming_data(self, data):
+        self.incoming.append(data)
+        self.incoming_length += len(data)
+        if self.incoming_length > MAX_LINE_LENGTH:
+            self.close()
+
+    def found_terminator(self):
+        line = "".join(self.incoming).rstrip("\r")
+        self.incoming = []
+        self.incoming_length = 0
+
+        if self.session is None:
+            self.start_session(line)
+            return
+
+        if self.session.waiting is not None:
+            self.send_lines(self.session.answer(line))
+        else:
+            self.send_lines(self.session.execute(line, wait_for_answers=True))
+        if self.session.is_over:
+            self.close_when_done()
+        elif self.session.waiting is not None:
+            self.push(ANSWER_PROMPT)
+        else:
+            self.push(PROMPT)
+
+    def start_session(self, name):
+        """
+        Starts the player's game once they have given their name, or asks again.
+        :param name: The name the player gave
+        """
+        directory_name = player_directory_name(name)
+        if not directory_name:
+            self.send_lines([NAME_QUESTION])
+            self.push(ANSWER_PROMPT)
+            return
+        self.session = self.session_factory(directory_name)
+        self.send_lines(self.session.start())
+        self.push(PROMPT)
+
+    def send_lines(self, lines):
+        """
+        Queues output lines to be sent to the client.
+        :param lines: list of output lines
+        """
+        if lines:
+            text = "\r\n".join(lines) + "\r\n"
+            if isinstance(text, unicode):
+                text = text.encode("utf-8")
+            self.push(text)
+
+
+class GameServer(asyncore.dispatcher):
+    """
+    Accepts line-oriented (e.g. telnet) connections and starts a new game for each of them.
+    All players are served from a single thread by the asyncore event loop.
+    """
+
+    def __init__(self, host, port, session_factory):
+        """
+        Initializes the server and starts listening.
+        :param host: Address to listen on
+        :param port: Port to listen on, or 0 to pick any free port
+        :param session_factory: A callable taking a player's save directory name and returning a new
+                                GameSession for them
+        """
+        asyncore.dispatcher.__init__(self)
+        self.session_factory = session_factory
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.set_reuse_addr()
+        self.bind((host, port))
+        self.listen(128)
+
+    def get_port(self):
+        """
+        :return: The port the server is listening on
+        """
+        return self.socket.getsockname()[1]
+
+    def handle_accept(self):
+        pair = self.accept()
+        if pair is not None:
+            sock, address = pair
+            GameChannel(sock, self.session_factory)
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, save_root=SERVER_SAVE_DIRECTORY_PATH):
+    """
+    Loads the game content once and serves games until interrupted.
+    :param host: Address to listen on
+    :param port: Port to listen on
+    :param save_root: Directory holding a save directory for each player
+    """
+    templates = load_templates()
+    server = GameServer(host, port,
+                        lambda directory_name: create_session(templates,
+                                                              save_root=os.path.join(save_root, directory_name)))
+    print "Serving Rick and Morty on %s:%d" % (host, server.get_port())
+
+    # poll() has no limit on the number of open sockets, unlike select()
+    asyncore.loop(use_poll=True)
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Serve the game to many players over TCP.")
+    arg_parser.add_argument("--host", default=DEFAULT_HOST)
+    arg_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    arg_parser.add_argument("--save-root", default=SERVER_SAVE_DIRECTORY_PATH,
+                            help="directory to keep each player's save files in")
+    arguments = arg_parser.parse_args()
+    try:
+        serve(arguments.host, arguments.port, arguments.save_root)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+
+import text_helpers
+from parser import CommandParser
+from rm_bundle import ensure_bundle
+from rm_checkpoint import take_checkpoint, restore_checkpoint
+from rm_save import SAVE_FILE_DIRECTORY_PATH
+from structure_builder import construct_world_templates_from_bundle, construct_item_templates_from_bundle, \
+    instantiate_worlds, instantiate_items, link_content
+
+
+class OutputBuffer(object):
+    """
+    A file-like object that collects everything a session writes until it is read back as lines.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, text):
+        self.chunks.append(text)
+
+    def flush(self):
+        pass
+
+    def take_lines(self):
+        """
+        Empties the buffer.
+        :return: A list of every line written since the last call
+        """
+        return self.take_text().splitlines()
+
+    def take_text(self):
+        """
+        Empties the buffer.
+        :return: Everything written since the last call
+        """
+        text = "".join(self.chunks)
+        self.chunks = []
+        return text
+
+
+class AnswerNeeded(Exception):
+    """
+    Raised by a strict InputQueue when the parser asks a question no response was prepared for.
+    """
+    pass
+
+
+class InputQueue(object):
+    """
+    A file-like object that answers the parser's questions (file names, confirmations, "Press ENTER")
+    from a queue of prepared responses. An empty queue answers with an empty line, or raises AnswerNeeded
+    while strict is set.
+    """
+
+    def __init__(self):
+        self.responses = []
+        self.strict = False
+
+    def push(self, responses):
+        self.responses.extend(responses)
+
+    def clear(self):
+        self.responses = []
+
+    def readline(self):
+        if self.responses:
+            return self.responses.pop(0) + "\n"
+        if self.strict:
+            raise AnswerNeeded()
+        return "\n"
+
+
+class GameSession(object):
+    """
+    A single game that is driven one command at a time and returns its output, instead of reading
+    from and writing to the terminal. Sessions share nothing, so any number can run in one process.
+    """
+
+    def __init__(self, worlds, items, seed=None, save_root=SAVE_FILE_DIRECTORY_PATH):
+        """
+        Initializes the session with its own copy of the game content.
+        :param worlds: Dictionary with name (string) --> World object pairings, owned by this session
+        :param items: Dictionary with name (string) --> Item object pairings, owned by this session
+        :param seed: Seed for the game's random choices, picked at random if not given
+        :param save_root: Directory the game's save files and journals are kept in
+        """
+        self.output = OutputBuffer()
+        self.input = InputQueue()
+        self.parser = CommandParser(worlds, items, stdin=self.input, stdout=self.output, seed=seed,
+                                    save_root=save_root)
+        self.parser.use_rawinput = False
+        self.is_over = False
+        # The command and answers so far of a command waiting for another answer, see execute
+        self.waiting = None
+
+        # initializing player state
+        self.parser.player.set_current_world(worlds["earth"])
+        self.parser.player.add_to_inventory('portal_gun')
+
+    def start(self, show_intro=True):
+        """
+        Puts the player in their starting location.
+        :param show_intro: Write the intro text before the starting location
+        :return: A list of output lines
+        """
+        if show_intro:
+            text_helpers.get_intro(self.output)
+        self.parser.sync_location()
+        return self.output.take_lines()
+
+    def execute(self, line, responses=(), wait_for_answers=False):
+        """
+        Runs a single command.
+
+        With wait_for_answers, a command that asks more questions than there are responses is stopped at the
+        question instead of getting an empty answer, and waiting is set until answer supplies the rest. Every
+        command that asks something does so before changing the game, so nothing is lost by stopping it.
+
+        :param line: The command, as the player would type it
+        :param responses: Answers to any questions the command asks, such as a save file name
+        :param wait_for_answers: Stop at an unanswered question rather than answering it with an empty line
+        :return: A list of output lines
+        """
+        return self.run_command(line, list(responses), wait_for_answers).splitlines()
+
+    def answer(self, response):
+        """
+        Answers the question the waiting command stopped at, by running the command again with every answer
+        given so far. The output already returned up to the question isn't returned again.
+        :param response: The answer, as the player would type it
+        :return: A list of output lines
+        """
+        line, responses, shown = self.waiting
+        self.waiting = None
+        text = self.run_command(line, responses + [response], True)
+        if text.startswith(shown):
+            text = text[len(shown):]
+        return text.splitlines()
+
+    def run_command(self, line, responses, wait_for_answers):
+        """
+        Runs a single command, see execute.
+        :param line: The command, as the player would type it
+        :param responses: list of answers to any questions the command asks
+        :param wait_for_answers: Stop at an unanswered question rather than answering it with an empty line
+        :return: Everything the command wrote
+        """
+        if self.is_over:
+            return ""
+        # Commands need a location, so a session that was never started begins without the intro
+        if self.parser.current_room is None:
+            self.parser.sync_location()
+
+        self.input.push(responses)
+        try:
+            line = self.parser.precmd(line)
+            # "Press ENTER" after an ending is asked by postcmd, once the command has run, so it never waits
+            self.input.strict = wait_for_answers
+            try:
+                stop = self.parser.onecmd(line)
+            finally:
+                self.input.strict = False
+            stop = self.parser.postcmd(stop, line)
+        except AnswerNeeded:
+            text = self.output.take_text()
+            self.waiting = (line, responses, text)
+            return text
+        except SystemExit:
+            stop = True
+        finally:
+            self.input.clear()
+
+        if stop:
+            self.is_over = True
+        return self.output.take_text()
+
+    def checkpoint(self, previous=None):
+        """
+        Copies the state of the game, so play can be branched from it with restore.
+        :param previous: An earlier Checkpoint of this session to share unchanged state with, if any
+        :return: An rm_checkpoint.Checkpoint
+        """
+        if self.parser.current_room is None:
+            self.parser.sync_location()
+        return take_checkpoint(self.parser.worlds, self.parser.items, self.parser.player, previous,
+                               self.parser.changes)
+
+    def restore(self, checkpoint):
+        """
+        Puts the game into the state of a checkpoint taken from this session or any other sharing its
+        templates, even if the game has finished. The undo history starts over from there.
+        :param checkpoint: An rm_checkpoint.Checkpoint
+        """
+        restore_checkpoint(checkpoint, self.parser)
+        self.parser.checkpoints.clear()
+        self.parser.ending = ''
+        self.is_over = False
+
+
+def load_templates(bundle=None):
+    """
+    Reads the game content that every session shares.
+    :param bundle: ContentBundle to read the content from, loaded if not given
+    :return: A Tuple of length 2 (dictionary of WorldTemplate objects, dictionary of ItemTemplate objects)
+    """
+    if bundle is None:
+        bundle = ensure_bundle()
+    # The intro and endings are shared too, so read them now rather than in the middle of a game
+    text_helpers.use_bundle(bundle)
+    text_helpers.preload_text()
+    world_templates = construct_world_templates_from_bundle(bundle)
+    item_templates = construct_item_templates_from_bundle(bundle)
+    link_content(world_templates, item_templates)
+    return world_templates, item_templates
+
+
+def create_session(templates=None, seed=None, save_root=SAVE_FILE_DIRECTORY_PATH):
+    """
+    Creates a new game session. The session only holds its own game state; the content itself is shared.
+    :param templates: Tuple returned by load_templates, loaded if not given
+    :param seed: Seed for the game's random choices, picked at random if not given
+    :param save_root: Directory the game's save files and journals are kept in
+    :return: A new GameSession
+    """
+    if templates is None:
+        templates = load_templates()
+    world_templates, item_templates = templates
+    return GameSession(instantiate_worlds(world_templates), instantiate_items(item_templates), seed, save_root)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+
+def capture_state(worlds, items, player):
+    """
+    Collects everything that can change during play into a plain dictionary that can be stored as JSON.
+    Static content such as descriptions and features is left out, as are the rooms of worlds that were
+    never built, since those still match the game content.
+
+    :param worlds: the dictionary of key-->world objects used in game
+    :param items: the dictionary of key-->item objects used in game
+    :param player: the player object showing the current state of the game
+    :return: A dictionary describing the mutable state of the game
+    """
+    state = dict()
+
+    worlds_state = dict()
+    for key in worlds.keys():
+        world_obj = worlds[key]
+        world_state = {"is_visited": world_obj.is_visited, "rooms": {}}
+        if world_obj.has_loaded_rooms():
+            for room_key in world_obj.rooms.keys():
+                room = world_obj.rooms[room_key]
+                world_state["rooms"][room_key] = {"items": list(room.items),
+                                                  "hidden_items": list(room.hidden_items),
+                                                  "is_visited": room.is_visited}
+        worlds_state[key] = world_state
+    state["worlds"] = worlds_state
+
+    state["items"] = dict((key, items[key].num_uses) for key in items.keys())
+
+    player_state = dict()
+    player_state["current_world"] = player.current_world.key
+    player_state["current_room"] = player.current_room.key
+    player_state["inventory"] = player.get_saved_inventory()
+    player_state["num_chips"] = player.num_chips
+    player_state["unlocked_worlds"] = list(player.unlocked_worlds)
+    state["player"] = player_state
+
+    return state
+
+
+def apply_state(state, worlds, items, player):
+    """
+    Overwrites the mutable parts of freshly built game objects with a state from capture_state.
+
+    :param state: A dictionary returned by capture_state
+    :param worlds: the dictionary of key-->world objects to update
+    :param items: the dictionary of key-->item objects to update
+    :param player: the player object to update
+    """
+    for key, world_state in state["worlds"].items():
+        world_obj = worlds[key]
+        world_obj.is_visited = world_state["is_visited"]
+        for room_key, room_state in world_state["rooms"].items():
+            room = world_obj.rooms[room_key]
+            room.items = room_state["items"][:]
+            room.hidden_items = room_state["hidden_items"][:]
+            room.is_visited = room_state["is_visited"]
+
+    for key, num_uses in state["items"].items():
+        items[key].num_uses = num_uses
+
+    player_state = state["player"]
+    player.current_world = worlds[player_state["current_world"]]
+    player.current_room = player.current_world.rooms[player_state["current_room"]]
+    player.inventory = player_state["inventory"][:]
+    player.num_chips = player_state["num_chips"]
+    player.unlocked_worlds = player_state["unlocked_worlds"][:]
+
+
+def mark_saved(worlds, items, player):
+    """
+    Marks every built game object as matching what was just saved or loaded, so an incremental save only
+    writes what changes from here on.
+
+    :param worlds: the dictionary of key-->world objects used in game
+    :param items: the dictionary of key-->item objects used in game
+    :param player: the player object showing the current state of the game
+    """
+    for world_obj in worlds.values():
+        world_obj.clear_dirty()
+        if world_obj.has_loaded_rooms():
+            for room in world_obj.rooms.values():
+                room.clear_dirty()
+    for item in items.values():
+        item.clear_dirty()
+    player.clear_dirty()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+
+import csv
+import json
+import os
+import timeit
+from collections import Counter
+
+from parser_grammar import parse_command
+
+# Environment variable that turns stats on. Its value is the file the stats are exported to when the game
+# ends: JSON, or CSV if the name ends in ".csv".
+STATS_ENVIRONMENT_VARIABLE = "RM_STATS"
+
+# Parts of the game loop that are timed, by the name they are reported under, and the parser method timed
+TIMED_PHASES = (("postcmd", "postcmd"),
+                ("sync_location", "sync_location"),
+                ("checkpoint", "checkpoint_command"),
+                ("save", "do_savegame"),
+                ("load", "do_loadgame"))
+CHECK_ENDINGS_PHASE = "check_endings"
+
+CSV_COLUMNS = ["kind", "name", "calls", "total_ms", "mean_ms", "p50_ms", "p95_ms", "max_ms"]
+
+
+class LatencyHistogram(object):
+    """
+    Counts of timings in buckets that double in size, starting at one microsecond. Percentiles are reported
+    as the upper edge of the bucket they fall in, so they are at most twice the real value.
+    """
+
+    __slots__ = ("buckets", "calls", "total", "max")
+
+    def __init__(self):
+        self.buckets = Counter()
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        """
+        Adds a timing.
+        :param seconds: How long the call took
+        """
+        self.buckets[int(seconds * 1e6).bit_length()] += 1
+        self.calls += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, percent):
+        """
+        :param percent: The percentile wanted, from 0 to 100
+        :return: The upper edge in seconds of the bucket holding that percentile, or 0 if nothing was recorded
+        """
+        if self.calls == 0:
+            return 0.0
+        needed = self.calls * percent / 100.0
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= needed:
+                return min((1 << bucket) / 1e6, self.max)
+        return self.max
+
+    def to_dict(self):
+        """
+        :return: The histogram as a dictionary of milliseconds that can be written as JSON or CSV
+        """
+        return {"calls": self.calls,
+                "total_ms": self.total * 1000,
+                "mean_ms": self.total * 1000 / self.calls if self.calls else 0.0,
+                "p50_ms": self.percentile(50) * 1000,
+                "p95_ms": self.percentile(95) * 1000,
+                "max_ms": self.max * 1000,
+                "buckets_us": dict(((1 << bucket), count) for bucket, count in self.buckets.items())}
+
+
+class _TimedInput(object):
+    """
+    Wraps the parser's stdin to add up the time spent waiting for the player, which isn't counted against
+    the command that asked.
+    """
+
+    def __init__(self, stats, stream):
+        self.stats = stats
+        self.stream = stream
+
+    def readline(self):
+        start = timeit.default_timer()
+        try:
+            return self.stream.readline()
+        finally:
+            self.stats.waiting += timeit.default_timer() - start
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class CommandStats(object):
+    """
+    How long each command and each part of the game loop took in a session, plus the commands the game
+    didn't understand.
+
+    Nothing is timed until instrument is called. It replaces the timed methods on that one parser
+    with timed wrappers, so a game without stats runs exactly the code it always did. Commands the game
+    replays to restore a journal are neither timed nor counted, see paused.
+    """
+
+    def __init__(self, export_path=None):
+        """
+        Initializes the stats.
+        :param export_path: File export writes to, if any
+        """
+        self.export_path = export_path
+        self.commands = {}
+        self.phases = {}
+        self.unknown = Counter()
+        self.waiting = 0.0
+        # Number of commands being run, so a command run from inside another, as an empty line repeats the
+        # last command by calling onecmd again, is only timed once
+        self.depth = 0
+        # Set while the game fast forwards through commands the player ran before, which aren't recorded
+        self.paused = False
+
+    def record(self, table, name, seconds):
+        """
+        Adds a timing.
+        :param table: self.commands or self.phases
+        :param name: The verb or phase the timing is for
+        :param seconds: How long it took
+        """
+        histogram = table.get(name)
+        if histogram is None:
+            histogram = table[name] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def count_unknown(self, verb):
+        """
+        Counts a command the game didn't understand.
+        :param verb: The command's verb
+        """
+        if not self.paused:
+            self.unknown[verb] += 1
+
+    def timed(self, table, name, function):
+        """
+        :param table: self.commands or self.phases
+        :param name: The verb or phase to record calls under
+        :param function: The function to time
+        :return: A function recording how long each call to the given one takes, less time spent waiting
+            for input
+        """
+        def timed_function(*args, **kwargs):
+            if self.paused:
+                return function(*args, **kwargs)
+            waited = self.waiting
+            start = timeit.default_timer()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(table, name, timeit.default_timer() - start - (self.waiting - waited))
+        return timed_function
+
+    def instrument(self, parser):
+        """
+        Starts timing the given parser.
+        :param parser: The CommandParser of the game
+        """
+        parser.stats = self
+        parser.stdin = _TimedInput(self, parser.stdin)
+
+        onecmd = parser.onecmd
+
+        def timed_onecmd(line):
+            if self.depth > 0 or self.paused:
+                return onecmd(line)
+            # An empty line repeats the last command
+            verb = parse_command(line if line.strip() else parser.lastcmd).verb
+            self.depth += 1
+            try:
+                return self.timed(self.commands, verb, onecmd)(line)
+            finally:
+                self.depth -= 1
+
+        parser.onecmd = timed_onecmd
+        for phase, method_name in TIMED_PHASES:
+            setattr(parser, method_name, self.timed(self.phases, phase, getattr(parser, method_name)))
+        # The tracker outlives loading a game, so this only has to be done once
+        parser.endings.check = self.timed(self.phases, CHECK_ENDINGS_PHASE, parser.endings.check)
+
+    def summary_lines(self):
+        """
+        :return: A list of lines summarizing the stats, for the stats command
+        """
+        row = "%-16s %6s %9s %9s %9s %9s"
+        lines = [row % ("Command", "calls", "mean ms", "p50 ms", "p95 ms", "max ms")]
+        for title, table in (("", self.commands), ("Game loop:", self.phases)):
+            if title:
+                lines.append(title)
+            for name in sorted(table):
+                values = table[name].to_dict()
+                lines.append(row % (name or '""', values["calls"], "%.2f" % values["mean_ms"],
+                                    "%.2f" % values["p50_ms"], "%.2f" % values["p95_ms"], "%.2f" % values["max_ms"]))
+        if self.unknown:
+            lines.append("Not understood: " + ", ".join("%s x%d" % (verb, count)
+                                                        for verb, count in self.unknown.most_common()))
+        return lines
+
+    def to_dict(self):
+        """
+        :return: The stats as a dictionary that can be written as JSON
+        """
+        return {"commands": dict((name, histogram.to_dict()) for name, histogram in self.commands.items()),
+                "phases": dict((name, histogram.to_dict()) for name, histogram in self.phases.items()),
+                "unknown": dict(self.unknown)}
+
+    def export(self, path=None):
+        """
+        Writes the stats to a file, as CSV if the name ends in ".csv" and JSON otherwise.
+        :param path: The file to write, defaults to export_path
+        """
+        if path is None:
+            path = self.export_path
+        if os.path.splitext(path)[1].lower() == ".csv":
+            with open(path, "wb") as stats_file:
+                writer = csv.writer(stats_file)
+                writer.writerow(CSV_COLUMNS)
+                for kind, table in (("command", self.commands), ("phase", self.phases)):
+                    for name in sorted(table):
+                        values = table[name].to_dict()
+                        writer.writerow([kind, name] + ["%.3f" % values[column] if column.endswith("_ms")
+                                                        else values[column] for column in CSV_COLUMNS[2:]])
+                for verb, count in self.unknown.most_common():
+                    writer.writerow(["unknown", verb, count, "", "", "", "", ""])
+        else:
+            with open(path, "w") as stats_file:
+                json.dump(self.to_dict(), stats_file, sort_keys=True, indent=4, separators=(',', ': '))
+
+
+def enable_from_environment(parser, environment=os.environ):
+    """
+    Turns on stats for the given parser if STATS_ENVIRONMENT_VARIABLE is set.
+    :param parser: The CommandParser of the game
+    :param environment: Mapping of environment variables
+    :return: The CommandStats timing the parser, or None if stats are off
+    """
+    export_path = environment.get(STATS_ENVIRONMENT_VARIABLE)
+    if not export_path:
+        return None
+    stats = CommandStats(export_path)
+    stats.instrument(parser)
+    return stats
@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+
+from rm_session import create_session, load_templates
+
+# Environment variable that turns recording on in the curses game. Its value is the transcript file to write.
+TRANSCRIPT_ENVIRONMENT_VARIABLE = "RM_TRANSCRIPT"
+
+TRANSCRIPT_FORMAT = "rm-transcript"
+TRANSCRIPT_VERSION = 1
+
+# Filled in once per worker process by init_worker
+_worker_templates = None
+
+
+class TranscriptError(Exception):
+    """
+    Raised when a transcript file can't be read.
+    """
+    pass
+
+
+def output_hash(lines):
+    """
+    :param lines: list of output lines, as GameSession.execute returns them
+    :return: A short hash of the output, used to tell whether a replayed command wrote the same thing
+    """
+    return hashlib.sha1("\n".join(lines).encode("utf-8")).hexdigest()[:16]
+
+
+class _RecordedInput(object):
+    """
+    Wraps the parser's stdin to record the answers given to a command's questions.
+    """
+
+    def __init__(self, recorder, stream):
+        self.recorder = recorder
+        self.stream = stream
+
+    def readline(self):
+        line = self.stream.readline()
+        if self.recorder.entry is not None:
+            self.recorder.entry[2].append(line.rstrip("\r\n"))
+        return line
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class _RecordedOutput(object):
+    """
+    Wraps the parser's stdout to collect what each command writes, for its output hash.
+    """
+
+    def __init__(self, recorder, stream):
+        self.recorder = recorder
+        self.stream = stream
+
+    def write(self, text):
+        if self.recorder.entry is not None:
+            self.recorder.output.append(text)
+        self.stream.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class TranscriptRecorder(object):
+    """
+    Writes every command of a game to a transcript file, so the game can be replayed exactly.
+
+    The first line of a transcript is a JSON header holding the game's random seed and start time. Each
+    command then takes one line: "<milliseconds since start>\\t<command>\\t<answers>\\t<output hash>", with
+    the answers to the command's questions as a JSON list and the output hash left empty if not recorded.
+    """
+
+    def __init__(self, path, hash_output=True):
+        """
+        Initializes the recorder.
+        :param path: The transcript file to write
+        :param hash_output: Record a hash of each command's output, so replays can check it
+        """
+        self.path = path
+        self.hash_output = hash_output
+        self.transcript_file = None
+        self.started = None
+        # [milliseconds, command, answers] of the command being run
+        self.entry = None
+        self.output = []
+
+    def instrument(self, parser):
+        """
+        Starts recording the given parser's game.
+        :param parser: The CommandParser of the game
+        """
+        self.started = timeit.default_timer()
+        self.transcript_file = open(self.path, "w")
+        header = {"format": TRANSCRIPT_FORMAT, "version": TRANSCRIPT_VERSION, "seed": parser.seed,
+                  "started": time.time()}
+        self.transcript_file.write(json.dumps(header, sort_keys=True) + "\n")
+
+        parser.stdin = _RecordedInput(self, parser.stdin)
+        if self.hash_output:
+            parser.stdout = _RecordedOutput(self, parser.stdout)
+
+        precmd = parser.precmd
+        postcmd = parser.postcmd
+
+        def recorded_precmd(line):
+            self.finish_entry()
+            self.entry = [int((timeit.default_timer() - self.started) * 1000), line, []]
+            return precmd(line)
+
+        def recorded_postcmd(stop, line):
+            stop = postcmd(stop, line)
+            self.finish_entry()
+            return stop
+
+        parser.precmd = recorded_precmd
+        parser.postcmd = recorded_postcmd
+
+    def finish_entry(self):
+        """
+        Writes out the command being run, if there is one.
+        """
+        if self.entry is None:
+            return
+        milliseconds, line, answers = self.entry
+        digest = output_hash("".join(self.output).splitlines()) if self.hash_output else ""
+        self.transcript_file.write("%d\t%s\t%s\t%s\n" % (milliseconds, line.replace("\t", " "),
+                                                         json.dumps(answers) if answers else "", digest))
+        self.transcript_file.flush()
+        self.entry = None
+        self.output = []
+
+    def close(self):
+        """
+        Writes out the last command, such as a quit that never reached postcmd, and closes the transcript.
+        """
+        if self.transcript_file is not None:
+            self.finish_entry()
+            self.transcript_file.close()
+            self.transcript_file = None
+
+
+def record_from_environment(parser, environment=os.environ):
+    """
+    Starts recording the given parser's game if TRANSCRIPT_ENVIRONMENT_VARIABLE is set.
+    :param parser: The CommandParser of the game
+    :param environment: Mapping of environment variables
+    :return: The TranscriptRecorder recording the game, or None if recording is off
+    """
+    path = environment.get(TRANSCRIPT_ENVIRONMENT_VARIABLE)
+    if not path:
+        return None
+    recorder = TranscriptRecorder(path)
+    recorder.instrument(parser)
+    return recorder
+
+
+def read_transcript(path):
+    """
+    :param path: A transcript file
+    :return: A Tuple of length 2 (header dictionary, list of (milliseconds, command, answers, output hash))
+    """
+    with open(path) as transcript_file:
+        try:
+            header = json.loads(transcript_file.readline())
+        except ValueError:
+            raise TranscriptError("%s has no transcript header" % path)
+        if header.get("format") != TRANSCRIPT_FORMAT or header.get("version") != TRANSCRIPT_VERSION:
+            raise TranscriptError("%s is not a version %d transcript" % (path, TRANSCRIPT_VERSION))
+
+        entries = []
+        for line in transcript_file:
+            fields = line.rstrip("\r\n").split("\t")
+            if len(fields) != 4:
+                raise TranscriptError("%s has a malformed line: %r" % (path, line))
+            milliseconds, command, answers, digest = fields
+            entries.append((int(milliseconds), command, json.loads(answers) if answers else [], digest))
+    return header, entries
+
+
+def replay_transcript(path, templates, check_output=True):
+    """
+    Plays a transcript back headlessly, as fast as it will go. Saves and loads in the transcript use a
+    temporary save directory, so a replay never touches the player's own saves and replays can run side by
+    side.
+
+    :param path: The transcript file
+    :param templates: Tuple returned by rm_session.load_templates
+    :param check_output: Compare each command's output with its recorded hash, where there is one
+    :return: A dictionary with the path, commands run, seconds taken, ending, number of commands whose output
+        differed and the first of them
+    """
+    header, entries = read_transcript(path)
+    save_root = tempfile.mkdtemp()
+    try:
+        session = create_session(templates, header["seed"], save_root)
+        session.start(show_intro=False)
+
+        result = {"path": path, "commands": 0, "seconds": 0.0, "ending": "", "mismatches": 0, "divergence": None}
+        start = timeit.default_timer()
+        for index, (milliseconds, command, answers, digest) in enumerate(entries):
+            if session.is_over:
+                break
+            lines = session.execute(command, answers)
+            result["commands"] += 1
+            if check_output and digest and output_hash(lines) != digest:
+                result["mismatches"] += 1
+                if result["divergence"] is None:
+                    result["divergence"] = {"index": index, "command": command, "output": lines}
+        result["seconds"] = timeit.default_timer() - start
+        result["ending"] = session.parser.ending
+    finally:
+        shutil.rmtree(save_root, True)
+    return result
+
+
+def init_worker():
+    """
+    Loads the game content once in each worker process.
+    """
+    global _worker_templates
+    _worker_templates = load_templates()
+
+
+def run_worker_replay(job):
+    """
+    Replays one transcript in a worker process.
+    :param job: A Tuple of length 2 (path, check_output)
+    :return: The replay result
+    """
+    path, check_output = job
+    try:
+        return replay_transcript(path, _worker_templates, check_output)
+    except TranscriptError as error:
+        return {"path": path, "commands": 0, "seconds": 0.0, "ending": "", "mismatches": 0,
+                "divergence": None, "error": str(error)}
+
+
+def replay_all(paths, processes=None, check_output=True):
+    """
+    Replays transcripts across a pool of processes.
+
+    :param paths: The transcript files
+    :param processes: Number of worker processes, one per core if not given
+    :param check_output: Compare each command's output with its recorded hash
+    :return: A list of replay results, in the order of paths
+    """
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(processes, initializer=init_worker)
+    try:
+        results = pool.map(run_worker_replay, [(path, check_output) for path in paths])
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+    return results
+
+
+def print_results(results, elapsed):
+    """
+    Writes a readable summary of the replays to stdout.
+    :param results: List returned by replay_all
+    :param elapsed: Wall clock seconds the replays took
+    """
+    commands = sum(result["commands"] for result in results)
+    print "%d transcripts, %d commands in %.2fs (%.0f commands/s)" % (
+        len(results), commands, elapsed, commands / elapsed if elapsed else 0.0)
+    for result in results:
+        if result.get("error"):
+            print "ERROR %s: %s" % (result["path"], result["error"])
+        elif result["divergence"] is not None:
+            divergence = result["divergence"]
+            print "DIVERGED %s: %d commands differ, first at command %d (%s)" % (
+                result["path"], result["mismatches"], divergence["index"] + 1, divergence["command"])
+            for line in divergence["output"]:
+                print "    " + line
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Replay recorded games headlessly and check their output.")
+    arg_parser.add_argument("transcripts", nargs="+")
+    arg_parser.add_argument("--processes", type=int, default=None, help="defaults to one per core")
+    arg_parser.add_argument("--no-check", action="store_true", help="don't compare output hashes")
+    arguments = arg_parser.parse_args()
+
+    replay_start = timeit.default_timer()
+    replay_results = replay_all(arguments.transcripts, arguments.processes, not arguments.no_check)
+    print_results(replay_results, timeit.default_timer() - replay_start)
+    sys.exit(1 if any(result["divergence"] is not None or result.get("error") for result in replay_results) else 0)
@@ -1,13 +1,133 @@
 #!/usr/bin/env python
 
-class World(object):
+from rm_dirty import DirtyTracker
+from rm_room import Room
+
+
+class LazyRoomMap(object):
     """
-    A World in the Rick and Morty text adventure game is a container of different Room objects.
+    A dictionary of room key --> Room object pairs that is only built the first time it is used.
+
+    Worlds are created with their name, description and unlock requirements, but their rooms are
+    not parsed until the player (or the engine) actually needs them.
+    """
+
+    __slots__ = ("loader", "rooms", "load_hooks")
+
+    def __init__(self, loader):
+        """
+        Initializes the map.
+        :param loader: A callable that builds and returns the dictionary of room key --> Room object pairs
+        """
+        self.loader = loader
+        self.rooms = None
+        self.load_hooks = []
+
+    def is_loaded(self):
+        """
+        :return: True if the rooms of this world have been built
+        """
+        return self.rooms is not None
+
+    def load(self):
+        """
+        Builds the rooms if they have not been built yet.
+        :return: The dictionary of room key --> Room object pairs
+        """
+        if self.rooms is None:
+            rooms = self.loader()
+            for hook in self.load_hooks:
+                hook(rooms)
+            self.rooms = rooms
+            self.loader = None
+            self.load_hooks = None
+        return self.rooms
+
+    def after_load(self, hook):
+        """
+        Has a function run on the rooms once they are built, or right away if they already are.
+        :param hook: A callable taking the dictionary of room key --> Room object pairs
+        """
+        if self.rooms is None:
+            self.load_hooks.append(hook)
+        else:
+            hook(self.rooms)
+
+    def __getitem__(self, key):
+        return self.load()[key]
+
+    def __setitem__(self, key, room):
+        self.load()[key] = room
+
+    def __delitem__(self, key):
+        del self.load()[key]
+
+    def __contains__(self, key):
+        return key in self.load()
+
+    def __iter__(self):
+        return iter(self.load())
+
+    def __len__(self):
+        return len(self.load())
+
+    def get(self, key, default=None):
+        return self.load().get(key, default)
+
+    def keys(self):
+        return self.load().keys()
+
+    def values(self):
+        return self.load().values()
+
+    def items(self):
+        return self.load().items()
+
+
+class NavigationIndex(object):
+    """
+    The rooms a player can go to from each room of a world, worked out once when the world's rooms are read.
+
+    The names of all the rooms are kept as one block of text, one name per line, along with where each
+    room's own line is, so the exits from a room are that block with one line cut out.
+    """
+
+    __slots__ = ("room_count", "room_names", "line_spans")
+
+    def __init__(self, rooms):
+        """
+        Initializes the index.
+        :param rooms: Dictionary of room key --> RoomTemplate pairs, in the order the rooms are listed
+        """
+        self.room_count = len(rooms)
+        lines = []
+        self.line_spans = {}
+        offset = 0
+        for key, room in rooms.items():
+            line = room.name + "\n"
+            lines.append(line)
+            self.line_spans[key] = (offset, offset + len(line))
+            offset += len(line)
+        self.room_names = "".join(lines)
+
+    def exits_from(self, room_key):
+        """
+        :param room_key: The key of a room in this world
+        :return: The names of every other room in the world, one per line
+        """
+        start, end = self.line_spans[room_key]
+        return self.room_names[:start] + self.room_names[end:]
+
+
+class WorldTemplate(object):
+    """
+    The unchanging content of a World, shared by the World of every game in progress.
+    Its rooms dictionary holds RoomTemplate objects.
     """
 
     def __init__(self):
         """
-        Initializes the Room.
+        Initializes the WorldTemplate.
         """
         self.name = ""
         self.key = ""
@@ -16,6 +136,46 @@ class World(object):
         self.description = ""
         self.is_visited = False
         self.chips_needed = None
+        # Key of the starting room, set by structure_builder.link_content
+        self.starting_room_key = ""
+        # NavigationIndex of the rooms, set by structure_builder.link_content when the rooms are read
+        self.navigation = None
+
+
+class World(DirtyTracker):
+    """
+    A World in the Rick and Morty text adventure game is a container of different Room objects.
+
+    A World only stores what can change during a game; everything else is read from its WorldTemplate.
+    Its Room objects are created from the template's RoomTemplate objects the first time they are used.
+    """
+
+    __slots__ = ("template", "is_visited", "rooms", "_dirty", "_changed", "_room_changed", "_counter")
+
+    TRACKED_FIELDS = frozenset(["is_visited"])
+
+    def __init__(self, template=None):
+        """
+        Initializes the World.
+        :param template: The WorldTemplate holding the content of this World
+        """
+        if template is None:
+            template = WorldTemplate()
+        object.__setattr__(self, "template", template)
+        object.__setattr__(self, "is_visited", template.is_visited)
+        object.__setattr__(self, "rooms", LazyRoomMap(make_room_instantiator(template, self)))
+        object.__setattr__(self, "_dirty", None)
+        object.__setattr__(self, "_room_changed", 0)
+        object.__setattr__(self, "_counter", None)
+        self.mark_changed()
+
+    name = property(lambda self: self.template.name)
+    key = property(lambda self: self.template.key)
+    starting_room = property(lambda self: self.template.starting_room)
+    starting_room_key = property(lambda self: self.template.starting_room_key)
+    navigation = property(lambda self: self.template.navigation)
+    description = property(lambda self: self.template.description)
+    chips_needed = property(lambda self: self.template.chips_needed)
 
     def get_rooms(self):
         """
@@ -24,12 +184,16 @@ class World(object):
         """
         return self.rooms
 
-    def print_description(self):
-        print "Planet: " + self.name
+    def print_description(self, out=None):
+        """
+        Writes the world's name, and its description on the first visit.
+        :param out: File-like object to write to, defaults to sys.stdout
+        """
+        print >>out, "Planet: " + self.name
         if self.is_visited is False:
-            print self.description
+            print >>out, self.description
             self.set_is_visited(True)
-        print
+        print >>out
 
     def set_is_visited(self, is_visited):
         self.is_visited = is_visited
@@ -39,3 +203,55 @@ class World(object):
         :return: A string with the world's description.
         """
         return self.description
+
+    def mark_room_changed(self, change):
+        """
+        Records that one of this world's rooms changed.
+        :param change: The number of the room's change
+        """
+        object.__setattr__(self, "_room_changed", change)
+        if self._counter is not None:
+            self._counter.last = change
+
+    def room_changed_since(self, change):
+        """
+        :param change: A number returned by rm_dirty.next_change
+        :return: True if any of this world's rooms has changed, or been built, since that number was taken
+        """
+        return self._room_changed > change
+
+    def has_loaded_rooms(self):
+        """
+        :return: True if this world's rooms have been built
+        """
+        if isinstance(self.rooms, LazyRoomMap):
+            return self.rooms.is_loaded()
+        return True
+
+
+def make_room_instantiator(template, world=None):
+    """
+    Creates a function that builds a new Room object for each RoomTemplate in the given world.
+    :param template: The WorldTemplate holding the RoomTemplate objects
+    :param world: The World the rooms are in
+    :return: A callable returning a dictionary with room key --> Room object pairs
+    """
+    def instantiate_rooms():
+        return dict((key, Room(room_template, world)) for key, room_template in template.rooms.items())
+
+    return instantiate_rooms
+
+
+def count_resident(worlds):
+    """
+    Counts how much of the multiverse has actually been built.
+    :param worlds: Dictionary with name (string) --> World object pairings
+    :return: A Tuple of length 2 (number of worlds with built rooms, number of built rooms)
+    """
+    num_worlds = 0
+    num_rooms = 0
+    for world in worlds.values():
+        if world.has_loaded_rooms():
+            num_worlds += 1
+            num_rooms += len(world.rooms)
+    return num_worlds, num_rooms
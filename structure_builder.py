@@ -2,19 +2,37 @@
 
 import json
 import os
-from rm_room import Room
-from rm_world import World
-from rm_item import Item
+from rm_room import Room, RoomTemplate
+from rm_world import World, WorldTemplate, LazyRoomMap, NavigationIndex
+from rm_item import Item, ItemTemplate
 from rm_player import Player
-from text_helpers import convert_to_key
+from text_helpers import convert_to_key, SYMBOLS
 
 
-def construct_worlds(worlds_directory_path):
+class ContentLinkError(Exception):
+    """
+    Raised when game content refers to a world, room or item that doesn't exist.
+    """
+    pass
+
+
+def construct_worlds(worlds_directory_path, lazy=True):
     """
     Populates World objects with JSON data from the "data/worlds" directory.
 
+    :param lazy: Only build each world's rooms the first time they are used
     :return: A dictionary with name(lower case, underscore-separated) --> world object pairs
     """
+    return instantiate_worlds(construct_world_templates(worlds_directory_path, lazy))
+
+
+def construct_world_templates(worlds_directory_path, lazy=True):
+    """
+    Populates WorldTemplate objects with JSON data from the "data/worlds" directory.
+
+    :param lazy: Only read each world's rooms the first time they are used
+    :return: A dictionary with name(lower case, underscore-separated) --> world template pairs
+    """
     # Dictionary to populate with key value pairs
     my_worlds = {}
 
@@ -28,24 +46,131 @@ def construct_worlds(worlds_directory_path):
             # Create string representing the path to the world JSON file
             world_file_path = worlds_directory_path + directory + '/' + directory + '.json'
 
-            # Create world object and add to dictionary
-            world_obj = build_world(world_file_path)
-            my_worlds[str_key] = world_obj
-
-            # Get names of all corresponding room JSON files
-            room_directory = os.listdir(worlds_directory_path + directory + '/rooms')
+            # Create world template and add to dictionary
+            world_template = build_world_template(world_file_path)
+            my_worlds[str_key] = world_template
 
-            # Create each Room object and append it to our list of rooms in the corresponding World object
-            for room in room_directory:
-                if room != ".DS_Store":
-                    room_obj = build_room(worlds_directory_path + directory + '/rooms/' + room)
-                    room_key = convert_to_key(room_obj.name)
-                    world_obj.rooms[room_key] = room_obj
+            # Create the RoomTemplate objects now, or when the world's rooms are first used
+            room_loader = make_room_directory_loader(worlds_directory_path + directory + '/rooms')
+            if lazy:
+                world_template.rooms = LazyRoomMap(room_loader)
+            else:
+                world_template.rooms = room_loader()
 
     # Return our completed dictionary
     return my_worlds
 
 
+def make_room_directory_loader(rooms_directory_path):
+    """
+    Creates a function that reads every room in the given directory.
+
+    :param rooms_directory_path: path to the directory of room JSON files
+    :return: A callable returning a dictionary with room key --> room template pairs
+    """
+    def load_rooms():
+        rooms = {}
+
+        # Get names of all corresponding room JSON files
+        room_directory = os.listdir(rooms_directory_path)
+
+        # Create each RoomTemplate object and add it to the dictionary of rooms
+        for room in room_directory:
+            if room != ".DS_Store":
+                room_template = build_room_template(rooms_directory_path + '/' + room)
+                rooms[room_template.key] = room_template
+        return rooms
+
+    return load_rooms
+
+
+def construct_worlds_from_bundle(bundle, lazy=True):
+    """
+    Populates World objects with the JSON data packed into a content bundle.
+
+    :param bundle: ContentBundle compiled from the "data" directory
+    :param lazy: Only build each world's rooms the first time they are used
+    :return: A dictionary with name(lower case, underscore-separated) --> world object pairs
+    """
+    return instantiate_worlds(construct_world_templates_from_bundle(bundle, lazy))
+
+
+def construct_world_templates_from_bundle(bundle, lazy=True):
+    """
+    Populates WorldTemplate objects with the JSON data packed into a content bundle.
+
+    :param bundle: ContentBundle compiled from the "data" directory
+    :param lazy: Only read each world's rooms the first time they are used
+    :return: A dictionary with name(lower case, underscore-separated) --> world template pairs
+    """
+    my_worlds = {}
+
+    for directory in bundle.list_directory("worlds"):
+        world_entry = "worlds/" + directory + "/" + directory + ".json"
+        if bundle.has_entry(world_entry):
+            world_template = world_template_from_data(bundle.load_json(world_entry))
+            my_worlds[directory] = world_template
+
+            room_loader = make_room_bundle_loader(bundle, "worlds/" + directory + "/rooms")
+            if lazy:
+                world_template.rooms = LazyRoomMap(room_loader)
+            else:
+                world_template.rooms = room_loader()
+
+    return my_worlds
+
+
+def make_room_bundle_loader(bundle, rooms_directory):
+    """
+    Creates a function that reads every room in the given bundle directory.
+
+    :param bundle: ContentBundle compiled from the "data" directory
+    :param rooms_directory: bundle directory holding the room JSON entries
+    :return: A callable returning a dictionary with room key --> room template pairs
+    """
+    def load_rooms():
+        rooms = {}
+        for room in bundle.list_directory(rooms_directory):
+            room_template = room_template_from_data(bundle.load_json(rooms_directory + "/" + room))
+            rooms[room_template.key] = room_template
+        return rooms
+
+    return load_rooms
+
+
+def instantiate_worlds(world_templates):
+    """
+    Creates a new set of World objects for one game, sharing the given templates.
+
+    :param world_templates: Dictionary with name --> WorldTemplate pairs
+    :return: A dictionary with name(lower case, underscore-separated) --> world object pairs
+    """
+    return dict((key, World(template)) for key, template in world_templates.items())
+
+
+def instantiate_items(item_templates):
+    """
+    Creates a new set of Item objects for one game, sharing the given templates.
+
+    :param item_templates: Dictionary with name --> ItemTemplate pairs
+    :return: A dictionary with name(lower case, underscore-separated) --> item object pairs
+    """
+    return dict((key, Item(template)) for key, template in item_templates.items())
+
+
+def instantiate_like(worlds, items):
+    """
+    Builds a fresh game from the templates shared by an existing game's objects, so the content is never
+    read again.
+    :param worlds: the dictionary of key-->world objects of the existing game
+    :param items: the dictionary of key-->item objects of the existing game
+    :return: A Tuple of length 2 (worlds, items)
+    """
+    world_templates = dict((key, world.template) for key, world in worlds.items())
+    item_templates = dict((key, item.template) for key, item in items.items())
+    return instantiate_worlds(world_templates), instantiate_items(item_templates)
+
+
 def print_worlds(my_worlds):
     """
     Writes the contents of our my_worlds dictionary to standard out.
@@ -85,46 +210,91 @@ def build_room(file_path_str):
     :param file_path_str: path to the desired room file.
     :return: A new Room object with the content of the passed file
     """
+    return Room(build_room_template(file_path_str))
+
+
+def build_room_template(file_path_str):
+    """
+    Loads a room's data from the given file, places it into a new RoomTemplate object.
+
+    :param file_path_str: path to the desired room file.
+    :return: A new RoomTemplate object with the content of the passed file
+    """
 
     # Open the file if possible
     with open(file_path_str) as json_data:
         data = json.load(json_data)
-        new_room = Room(data["name"])
-        new_room.long_description = data["longform"]
-        new_room.short_description = data["shortform"]
-        new_room.features = data["features"][:]
-        if data.get("items") is not None:
-            new_room.items = data["items"][:]
-        if data.get("hidden_items") is not None:
-            new_room.hidden_items = data["hidden_items"][:]
-        if data.get("is_visited") is not None:
-            new_room.is_visited = data["is_visited"]
-        if data.get("long_description_exit") is not None:
-            new_room.long_description_exit = data["long_description_exit"]
-        if data.get("short_description_exit") is not None:
-            new_room.short_description_exit = data["short_description_exit"]
-        return new_room
+        return room_template_from_data(data)
+
+
+def room_template_from_data(data):
+    """
+    Places the given room data into a new RoomTemplate object.
+
+    :param data: dictionary decoded from a room JSON file
+    :return: A new RoomTemplate object with the given content
+    """
+    new_room = RoomTemplate(data["name"])
+    new_room.key = convert_to_key(data["name"])
+    new_room.long_description = data["longform"]
+    new_room.short_description = data["shortform"]
+    new_room.features = data["features"][:]
+    if data.get("items") is not None:
+        new_room.items = tuple(data["items"])
+    if data.get("hidden_items") is not None:
+        new_room.hidden_items = tuple(data["hidden_items"])
+    if data.get("is_visited") is not None:
+        new_room.is_visited = data["is_visited"]
+    if data.get("long_description_exit") is not None:
+        new_room.long_description_exit = data["long_description_exit"]
+    if data.get("short_description_exit") is not None:
+        new_room.short_description_exit = data["short_description_exit"]
+    new_room.build_action_index()
+    new_room.build_feature_phrases()
+    return new_room
 
 
 def build_world(file_path_str):
     """
-    Loads a room's data from the given file, places it into a new Room object.
+    Loads a world's data from the given file, places it into a new World object.
 
-    :param file_path_str: path to the desired room file.
-    :return: A new Room object with the content of the passed file
+    :param file_path_str: path to the desired world file.
+    :return: A new World object with the content of the passed file
+    """
+    return World(build_world_template(file_path_str))
+
+
+def build_world_template(file_path_str):
+    """
+    Loads a world's data from the given file, places it into a new WorldTemplate object.
+
+    :param file_path_str: path to the desired world file.
+    :return: A new WorldTemplate object with the content of the passed file
     """
 
     # Open the file if possible
     with open(file_path_str) as json_data:
         data = json.load(json_data)
-        new_world = World()
-        new_world.name = data["name"]
-        new_world.starting_room = data["starting_room"]
-        new_world.description = data["description"]
-        new_world.chips_needed = data["chips_needed"]
-        if data.get("key") is not None:
-            new_world.key = data["key"]
-        return new_world
+        return world_template_from_data(data)
+
+
+def world_template_from_data(data):
+    """
+    Places the given world data into a new WorldTemplate object.
+
+    :param data: dictionary decoded from a world JSON file
+    :return: A new WorldTemplate object with the given content
+    """
+    new_world = WorldTemplate()
+    new_world.name = data["name"]
+    new_world.starting_room = data["starting_room"]
+    new_world.description = data["description"]
+    new_world.chips_needed = data["chips_needed"]
+    if data.get("key") is not None:
+        new_world.key = data["key"]
+    if data.get("is_visited") is not None:
+        new_world.is_visited = data["is_visited"]
+    return new_world
 
 
 def build_item(file_path_str):
@@ -134,28 +304,49 @@ def build_item(file_path_str):
     :param file_path_str: path to the desired item file.
     :return: A new Item object with the content of the passed file
     """
+    return Item(build_item_template(file_path_str))
+
+
+def build_item_template(file_path_str):
+    """
+    Loads a item's data from the given file, places it into a new ItemTemplate object.
+
+    :param file_path_str: path to the desired item file.
+    :return: A new ItemTemplate object with the content of the passed file
+    """
 
     # Open the file if possible
     with open(file_path_str) as json_data:
         data = json.load(json_data)
-        new_item = Item()
-        new_item.name = data["name"]
-        new_item.description = data["description"]
-        if data.get("actions") is not None:
-            new_item.actions = data["actions"]
-        if data.get("success_message") is not None:
-            new_item.success_message = data["success_message"]
-        if data.get("failure_messages") is not None:
-            new_item.failure_messages = data["failure_messages"][:]
-        if data.get("usable_world") is not None:
-            new_item.usable_world = data["usable_world"]
-        if data.get("usable_room") is not None:
-            new_item.usable_room = data["usable_room"]
-        if data.get("num_uses") is not None:
-            new_item.num_uses = data["num_uses"]
-        if data.get("is_rechargeable") is not None:
-            new_item.is_rechargeable = data["is_rechargeable"]
-        return new_item
+        return item_template_from_data(data)
+
+
+def item_template_from_data(data):
+    """
+    Places the given item data into a new ItemTemplate object.
+
+    :param data: dictionary decoded from an item JSON file
+    :return: A new ItemTemplate object with the given content
+    """
+    new_item = ItemTemplate()
+    new_item.name = data["name"]
+    new_item.description = data["description"]
+    if data.get("actions") is not None:
+        new_item.actions = data["actions"]
+    if data.get("success_message") is not None:
+        new_item.success_message = data["success_message"]
+    if data.get("failure_messages") is not None:
+        new_item.failure_messages = data["failure_messages"][:]
+    if data.get("usable_world") is not None:
+        new_item.usable_world = data["usable_world"]
+    if data.get("usable_room") is not None:
+        new_item.usable_room = data["usable_room"]
+    if data.get("num_uses") is not None:
+        new_item.num_uses = data["num_uses"]
+    if data.get("is_rechargeable") is not None:
+        new_item.is_rechargeable = data["is_rechargeable"]
+    new_item.build_room_phrase()
+    return new_item
 
 
 def construct_items(items_directory_path):
@@ -164,6 +355,15 @@ def construct_items(items_directory_path):
 
     :return: A dictionary with name(lower case, underscore-separated) --> item object pairs
     """
+    return instantiate_items(construct_item_templates(items_directory_path))
+
+
+def construct_item_templates(items_directory_path):
+    """
+    Populates ItemTemplate objects with JSON data from the "data/items" directory.
+
+    :return: A dictionary with name(lower case, underscore-separated) --> item template pairs
+    """
     # Dictionary to populate with key value pairs
     my_items = {}
 
@@ -177,16 +377,110 @@ def construct_items(items_directory_path):
             # Create string representing the path to the world JSON file
             item_file_path = items_directory_path + '/' + item
 
-            # Create the Item object given the file path
-            item_obj = build_item(item_file_path)
+            # Create the ItemTemplate object given the file path
+            item_template = build_item_template(item_file_path)
 
-            # Place the new item object into our dictionary
-            my_items[str_key] = item_obj
+            # Place the new item template into our dictionary
+            my_items[str_key] = item_template
 
     # Return our completed dictionary
     return my_items
 
 
+def construct_items_from_bundle(bundle):
+    """
+    Populates Item objects with the JSON data packed into a content bundle.
+
+    :param bundle: ContentBundle compiled from the "data" directory
+    :return: A dictionary with name(lower case, underscore-separated) --> item object pairs
+    """
+    return instantiate_items(construct_item_templates_from_bundle(bundle))
+
+
+def construct_item_templates_from_bundle(bundle):
+    """
+    Populates ItemTemplate objects with the JSON data packed into a content bundle.
+
+    :param bundle: ContentBundle compiled from the "data" directory
+    :return: A dictionary with name(lower case, underscore-separated) --> item template pairs
+    """
+    my_items = {}
+
+    for item in bundle.list_directory("items"):
+        if item.endswith(".json"):
+            my_items[item[:-5]] = item_template_from_data(bundle.load_json("items/" + item))
+
+    return my_items
+
+
+def link_content(worlds, items):
+    """
+    Resolves the references between worlds, rooms and items once they are loaded, so the game can follow
+    them instead of converting names to keys while it is being played, and adds their names to
+    text_helpers.SYMBOLS. A world's rooms are linked when they are read, so lazily loaded worlds stay unread
+    until they are needed.
+
+    :param worlds: Dictionary with name --> WorldTemplate (or World) pairs
+    :param items: Dictionary with name --> ItemTemplate (or Item) pairs
+    :raises ContentLinkError: if anything refers to content that doesn't exist
+    """
+    world_templates = dict((key, getattr(world, "template", world)) for key, world in worlds.items())
+    item_templates = dict((key, getattr(item, "template", item)) for key, item in items.items())
+
+    for key, item_template in item_templates.items():
+        if item_template.usable_world:
+            usable_world = world_templates.get(item_template.usable_world)
+            if usable_world is None:
+                raise ContentLinkError("Item %s is usable in world %s, which doesn't exist" %
+                                       (key, item_template.usable_world))
+            item_template.usable_world_template = usable_world
+        SYMBOLS.add(item_template.name, "item", key)
+
+    for key, world_template in world_templates.items():
+        world_template.key = SYMBOLS.add(world_template.name, "world", key)
+        chips_needed = world_template.chips_needed
+        if chips_needed is not None and (not isinstance(chips_needed, int) or chips_needed < 0):
+            raise ContentLinkError("World %s needs %r processors, which isn't a number of processors" %
+                                   (key, chips_needed))
+        world_template.starting_room_key = convert_to_key(world_template.starting_room)
+
+        link_rooms = make_room_linker(world_template, item_templates)
+        if isinstance(world_template.rooms, LazyRoomMap):
+            world_template.rooms.after_load(link_rooms)
+        else:
+            link_rooms(world_template.rooms)
+
+
+def make_room_linker(world_template, item_templates):
+    """
+    Creates a function that checks the references into and out of the given world's rooms, and indexes
+    where each room leads.
+
+    :param world_template: The WorldTemplate whose rooms will be checked
+    :param item_templates: Dictionary with name --> ItemTemplate pairs
+    :return: A callable taking the dictionary of room key --> room template pairs
+    """
+    def link_rooms(rooms):
+        if world_template.starting_room_key not in rooms:
+            raise ContentLinkError("World %s starts in room %s, which doesn't exist" %
+                                   (world_template.key, world_template.starting_room))
+        for room_key, room_template in rooms.items():
+            SYMBOLS.add(room_template.name, "room", room_key)
+            for feature in room_template.features:
+                SYMBOLS.add(feature["key"], "feature")
+            for item_key in tuple(room_template.items) + tuple(room_template.hidden_items):
+                if item_key not in item_templates:
+                    raise ContentLinkError("Room %s in world %s holds item %s, which doesn't exist" %
+                                           (room_key, world_template.key, item_key))
+        for item_key, item_template in item_templates.items():
+            if item_template.usable_world_template is world_template and item_template.usable_room not in rooms:
+                raise ContentLinkError("Item %s is usable in room %s of world %s, which doesn't exist" %
+                                       (item_key, item_template.usable_room, world_template.key))
+        world_template.navigation = NavigationIndex(rooms)
+
+    return link_rooms
+
+
 def print_items(my_items):
     """
     Writes the contents of our my_items dictionary to standard out.
@@ -225,13 +519,16 @@ def build_player(file_path_str, worlds):
         if data.get("current_world") is not None:
             new_player.current_world = worlds[data["current_world"]]
         if data.get("current_room") is not None:
-            key = convert_to_key(data["current_room"])
-            new_player.current_room = new_player.current_world.rooms[key]
+            new_player.current_room = new_player.current_world.rooms.get(data["current_room"])
+            if new_player.current_room is None:
+                raise ContentLinkError("The player is in room %s, which doesn't exist" % data["current_room"])
+        # the inventory replaces any processors carried, so it is read before num_chips
+        if data.get("inventory") is not None:
+            new_player.inventory = data["inventory"]
         if data.get("num_chips") is not None:
             new_player.num_chips = data["num_chips"]
         if data.get("unlocked_worlds") is not None:
             new_player.unlocked_worlds = data["unlocked_worlds"][:]
-        if data.get("inventory") is not None:
-            new_player.inventory = data["inventory"][:]
+        new_player.clear_dirty()
         return new_player
 
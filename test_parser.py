@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+
+import shutil
+import tempfile
+import unittest
+
+from rm_session import create_session, load_templates
+
+# Loaded once, since every test plays on the same content
+TEMPLATES = load_templates()
+
+
+class ProcessorMessagesTest(unittest.TestCase):
+    """
+    Processors are kept in the inventory as a count, but players should see the same messages as when they
+    were kept apart from it.
+    """
+
+    def setUp(self):
+        self.save_root = tempfile.mkdtemp()
+        self.session = create_session(TEMPLATES, seed=1, save_root=self.save_root)
+        self.session.start(show_intro=False)
+        self.session.execute("go garage")
+        self.session.execute("take processor")
+        # Leave the room, so a processor is only ever found in the inventory
+        self.session.execute("go living room")
+
+    def tearDown(self):
+        shutil.rmtree(self.save_root, True)
+
+    def test_look_at_carried_processor(self):
+        self.assertEqual(self.session.execute("look processor"),
+                         ["What... what should I look at? Be specific, Morty."])
+
+    def test_recharge_processor(self):
+        self.assertEqual(self.session.execute("recharge processor"),
+                         ["What the hell are you talking about, Morty?  We don't have that."])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,28 +1,130 @@
 #!/usr/bin/env python
 
+import os
+
 TEXT_PATH = "data/text/"
+TEXT_EXTENSION = ".txt"
+
+
+class TextStore(object):
+    """
+    The game's narrative text (intro, endings and command help), kept in memory as lines ready to be written
+    out. Each text is addressed by its asset name, the name of its file in the text directory without the
+    extension, e.g. "ending_win".
+
+    A text is read the first time it is asked for, or all of them at once by preload.
+    """
+
+    def __init__(self, bundle=None, text_path=TEXT_PATH):
+        """
+        Initializes the store.
+        :param bundle: ContentBundle to read the text from, or None to read the files in text_path
+        :param text_path: Directory holding the text files
+        """
+        self.bundle = bundle
+        self.text_path = text_path
+        self.assets = {}
+
+    def asset_names(self):
+        """
+        :return: A sorted list of the names of every text asset
+        """
+        if self.bundle is not None:
+            file_names = self.bundle.list_directory("text")
+        else:
+            file_names = os.listdir(self.text_path)
+        return sorted(file_name[:-len(TEXT_EXTENSION)] for file_name in file_names
+                      if file_name.endswith(TEXT_EXTENSION))
+
+    def read(self, name):
+        """
+        :param name: The name of a text asset
+        :return: The contents of its file
+        """
+        file_name = name + TEXT_EXTENSION
+        if self.bundle is not None and self.bundle.has_entry("text/" + file_name):
+            return self.bundle.read("text/" + file_name)
+        with open(self.text_path + file_name, "r") as inFile:
+            return inFile.read()
+
+    def get_lines(self, name):
+        """
+        :param name: The name of a text asset
+        :return: A Tuple of the lines of the text, without newlines
+        """
+        lines = self.assets.get(name)
+        if lines is None:
+            lines = tuple(self.read(name).splitlines())
+            self.assets[name] = lines
+        return lines
+
+    def preload(self):
+        """
+        Reads every text asset, so none of them has to be read while the game is being played.
+        """
+        for name in self.asset_names():
+            self.get_lines(name)
 
 
-def get_text(file_name):
-    file_path = TEXT_PATH + file_name
-    with open(file_path, "r") as inFile:
-        text = inFile.read().splitlines()
-        for line in text:
-            print line
-        print
+# Store all text is written from, see use_bundle
+TEXT_STORE = TextStore()
 
 
-def get_intro():
-    get_text("intro.txt")
+def use_bundle(bundle):
+    """
+    Reads intro, ending and help text from the given content bundle rather than opening files in TEXT_PATH.
+    :param bundle: ContentBundle compiled from the "data" directory, or None to read from disk
+    """
+    global TEXT_STORE
+    TEXT_STORE = TextStore(bundle)
+
+
+def preload_text():
+    """
+    Reads all the game's text into memory now rather than when it is first shown.
+    """
+    TEXT_STORE.preload()
 
 
-def get_ending(ending_type):
+def write_lines(lines, out=None):
+    """
+    Writes out the given lines.
+    :param lines: Iterable of lines, without newlines
+    :param out: File-like object to write to, defaults to sys.stdout
+    """
+    for line in lines:
+        print >>out, line
+
+
+def get_text(name, out=None):
+    """
+    Writes out the given text asset followed by a blank line.
+    :param name: Name of the text asset
+    :param out: File-like object to write to, defaults to sys.stdout
+    """
+    write_lines(TEXT_STORE.get_lines(name), out)
+    print >>out
+
+
+def get_intro(out=None):
+    get_text("intro", out)
+
+
+def get_ending(ending_type, out=None):
     """
         Takes in the name of the desired ending (e.g. "death_plumbus" or "death"),
         and runs the corresponding ending.
     """
-    ending_file_name = "ending_" + ending_type + ".txt"
-    get_text(ending_file_name)
+    get_text("ending_" + ending_type, out)
+
+
+def get_help(command, out=None):
+    """
+    Writes out the usage and advice for a command.
+    :param command: The name of the command, e.g. "go"
+    :param out: File-like object to write to, defaults to sys.stdout
+    """
+    write_lines(TEXT_STORE.get_lines("help_" + command), out)
 
 
 def convert_to_key(object_name):
@@ -34,3 +136,71 @@ def convert_to_key(object_name):
     lower_case = object_name.lower()
     key = lower_case.replace(" ", "_")
     return key
+
+
+class SymbolTable(object):
+    """
+    Maps every spelling of the names in the game (worlds, rooms, items and features) to a single canonical
+    key object. A name is known by its display name, its key, and both of those in lower case and with
+    spaces or underscores, so resolving any of them is one dictionary lookup.
+
+    Names are added as the content is loaded, see structure_builder.link_content.
+    """
+
+    def __init__(self):
+        self.symbols = {}
+        self.kinds = {}
+        # Counts the changes to the table, so anything derived from it knows when it is out of date
+        self.version = 0
+
+    def add(self, name, kind, key=None):
+        """
+        Adds a name and its spellings.
+        :param name: The display name, e.g. "Cob World"
+        :param kind: What the name belongs to: "world", "room", "item" or "feature"
+        :param key: The key the name stands for, defaults to convert_to_key(name)
+        :return: The canonical key object
+        """
+        if key is None:
+            key = convert_to_key(name)
+        # The first object added for a key is the one every spelling resolves to
+        size = len(self.symbols)
+        key = self.symbols.setdefault(key, key)
+        for spelling in (name, name.lower(), key.replace("_", " ")):
+            self.symbols.setdefault(spelling, key)
+        if len(self.symbols) != size:
+            self.version += 1
+        self.kinds.setdefault(key, set()).add(kind)
+        return key
+
+    def lookup(self, text):
+        """
+        :param text: A name as typed or stored
+        :return: The canonical key it stands for, or None if it isn't the name of anything
+        """
+        key = self.symbols.get(text)
+        if key is None:
+            key = self.symbols.get(convert_to_key(text))
+        return key
+
+    def to_key(self, text):
+        """
+        :param text: A name as typed or stored
+        :return: The canonical key if the name is known, else the text converted with convert_to_key
+        """
+        key = self.symbols.get(text)
+        if key is None:
+            key = convert_to_key(text)
+            key = self.symbols.get(key, key)
+        return key
+
+    def kinds_of(self, key):
+        """
+        :param key: A canonical key
+        :return: The set of kinds of thing with that key, empty if there are none
+        """
+        return self.kinds.get(key, frozenset())
+
+
+# Names of everything in the game, filled in as content is loaded
+SYMBOLS = SymbolTable()